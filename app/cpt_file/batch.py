@@ -0,0 +1,199 @@
+"""Command-line entry point to classify a batch of GEF files outside the VIKTOR UI.
+
+Example usage::
+
+    python -m app.cpt_file.batch path/to/gef_folder "more/*.GEF" --method table --output results.json
+
+Every file is classified with `Classification.classify_cpt_file`, in a pool of worker processes. Errors are captured
+per file, and the results are written in the (sorted) order of the input files. With `--database` and `--site`, the
+classified files are stored in a site database (see `site_database.py`), with the file name as name of the CPT.
+
+The GEF parser of the SDK runs on the VIKTOR platform, so `classify_cpt_file` needs a VIKTOR development environment
+(`VIKTOR_DEV` is set by `viktor-cli`). With `--native`, the files are read with `gef_reader.read_gef` and classified
+in-process with the native Robertson and Table method classifiers, which runs anywhere.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from munch import munchify
+from viktor import UserError
+from viktor.geo import GEFFile, SoilLayout
+
+from .constants import DEFAULT_CLASSIFICATION_TABLE, DEFAULT_ROBERTSON_TABLE
+from .gef_reader import read_gef
+from .measurement_data import MeasurementData
+from .site_database import SiteDatabase
+from .soil_layout_conversion_functions import Classification, compare_soil_layouts
+
+DEFAULT_TABLES = {"robertson": DEFAULT_ROBERTSON_TABLE, "table": DEFAULT_CLASSIFICATION_TABLE}
+GEF_SUFFIX = ".gef"
+PLATFORM_ENVIRONMENT_VARIABLE = "VIKTOR_DEV"
+
+
+def is_platform_available() -> bool:
+    """Whether the GEF parser of the SDK can reach the VIKTOR platform"""
+    return PLATFORM_ENVIRONMENT_VARIABLE in os.environ
+
+
+def collect_gef_files(inputs: Sequence[str]) -> List[Path]:
+    """Returns the sorted, unique GEF files in the given files, directories (recursively) and glob patterns."""
+    paths = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.update(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() == GEF_SUFFIX)
+        elif path.is_file():
+            paths.add(path)
+        else:
+            paths.update(Path(p) for p in glob.glob(item, recursive=True) if Path(p).is_file())
+    return sorted(paths)
+
+
+def classify_file(
+    path: Path, method: str, table: List[dict], verify_native: bool = False, native: bool = False
+) -> dict:
+    """Classifies a single GEF file; errors are returned in the result instead of raised.
+
+    With `verify_native`, the stored measurements are classified in-process as well, and the agreement with the
+    result of `classify_cpt_file` is added to the result. With `native`, the file is read and classified in-process
+    only (see `Classification.classify_streamed_gef`).
+    """
+    start = time.perf_counter()
+    result = {"file": str(path), "status": "ok", "error": None, "number_of_samples": 0, "result": None}
+    try:
+        classification = Classification(munchify({"method": method, method: table}))
+        if native:
+            cpt_dict = classification.classify_streamed_gef(read_gef(path))
+        else:
+            cpt_dict = classification.classify_cpt_file(GEFFile(path.read_text(encoding="ISO-8859-1")))
+        result["result"] = cpt_dict
+        result["number_of_samples"] = cpt_dict["measurement_data"]["length"]
+        if verify_native:
+            measurement_data = MeasurementData.from_stored(cpt_dict["measurement_data"]).drop_incomplete_rows()
+            native_soil_layout = classification.classify_measurement_data(
+                measurement_data, cpt_dict["ground_water_level"]
+            )
+            result["native_agreement"] = compare_soil_layouts(
+                native_soil_layout, SoilLayout.from_dict(cpt_dict["soil_layout_original"])
+            )
+    except UserError as e:
+        result.update(status="error", error=str(e))
+    except Exception as e:  # capture any failure, so that one corrupt file does not abort the batch
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["duration"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(
+    paths: Sequence[Path],
+    method: str,
+    table: List[dict],
+    workers: int = 1,
+    verify_native: bool = False,
+    native: bool = False,
+) -> List[dict]:
+    """Classifies all files and returns the results in the same order as `paths`."""
+    classify = partial(classify_file, method=method, table=table, verify_native=verify_native, native=native)
+    if workers <= 1 or len(paths) <= 1:
+        return [classify(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(classify, paths, chunksize=max(1, len(paths) // (4 * workers))))
+
+
+def summarize(results: Sequence[dict], elapsed: float) -> dict:
+    """Returns the counts and throughput of a batch run."""
+    succeeded = [result for result in results if result["status"] == "ok"]
+    number_of_samples = sum(result["number_of_samples"] for result in succeeded)
+    return {
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "elapsed_s": elapsed,
+        "files_per_s": len(results) / elapsed if elapsed else 0.0,
+        "samples_per_s": number_of_samples / elapsed if elapsed else 0.0,
+    }
+
+
+def _load_table(method: str, table_path: Optional[str]) -> List[dict]:
+    if table_path is None:
+        return DEFAULT_TABLES[method]
+    with open(table_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Classify a batch of GEF files.")
+    parser.add_argument("inputs", nargs="+", help="GEF files, directories or glob patterns")
+    parser.add_argument("--method", choices=sorted(DEFAULT_TABLES), default="robertson", help="classification method")
+    parser.add_argument("--table", help="JSON file with the classification table (default: the table of the app)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument(
+        "--verify-native",
+        action="store_true",
+        help="also classify in-process and report the agreement with the platform classification",
+    )
+    parser.add_argument(
+        "--native",
+        action="store_true",
+        help="read and classify the files in-process, without the GEF parser of the SDK and the VIKTOR platform",
+    )
+    parser.add_argument("--database", help="site database (SQLite) to store the classified files in")
+    parser.add_argument("--site", help="name of the site of the files in the site database")
+    args = parser.parse_args(argv)
+    if (args.database is None) != (args.site is None):
+        parser.error("--database and --site are required together")
+    if args.native and args.verify_native:
+        parser.error("--verify-native compares with the GEF parser of the SDK, and cannot be combined with --native")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Runs the batch classification; returns 1 if one or more files failed, and 2 if the files cannot be parsed."""
+    args = _parse_args(argv)
+    paths = collect_gef_files(args.inputs)
+    if not paths:
+        print("No GEF files found", file=sys.stderr)
+        return 1
+    if not args.native and not is_platform_available():
+        print(
+            f"The GEF parser of the SDK needs the VIKTOR platform, but {PLATFORM_ENVIRONMENT_VARIABLE} is not set. "
+            "Run the batch in a VIKTOR development environment, or use --native to classify the files in-process.",
+            file=sys.stderr,
+        )
+        return 2
+    table = _load_table(args.method, args.table)
+
+    start = time.perf_counter()
+    results = run_batch(
+        paths, args.method, table, workers=args.workers, verify_native=args.verify_native, native=args.native
+    )
+    summary = summarize(results, time.perf_counter() - start)
+
+    for result in results:
+        if result["status"] == "error":
+            print(f"{result['file']}: {result['error']}", file=sys.stderr)
+    print(
+        f"{summary['succeeded']}/{summary['files']} files classified in {summary['elapsed_s']:.1f} s "
+        f"({summary['files_per_s']:.1f} files/s, {summary['samples_per_s']:.0f} samples/s)",
+        file=sys.stderr,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f)
+    if args.database:
+        stored = SiteDatabase(args.database).add_batch_results(args.site, results)
+        print(f"{len(stored)} files stored in site '{args.site}' of {args.database}", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Process-level cache for objects that are derived from the params, such as parsed measurement data and soil layouts.
+
+Entries are keyed on a content hash of the params they are derived from, so a view call with unchanged measurement
+data or classification table reuses the objects of a previous call. The least recently used entries are evicted once
+the (estimated) size of the cache exceeds its memory bound, or the number of entries exceeds its entry bound.
+"""
+import hashlib
+import json
+import logging
+import sys
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024**2
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def content_hash(*parts: Any) -> str:
+    """Returns a stable hash of JSON-serializable objects (e.g. params or parts of it)."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(json.dumps(part, sort_keys=True, separators=(",", ":"), default=str).encode())
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def estimate_size(value: Any, _seen: Optional[Set[int]] = None) -> int:
+    """Estimate of the memory used by a cached value in bytes.
+
+    Objects can provide their own estimate with a `nbytes` attribute (as NumPy arrays do). Other objects, such as a
+    SoilLayout, are estimated from their attributes, where objects that are referenced more than once (e.g. the soils
+    of the layers) are counted once.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key, seen) + estimate_size(item, seen) for key, item in value.items()
+        )
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return sys.getsizeof(value) + estimate_size(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a memory bound, an entry bound and hit/miss counters."""
+
+    def __init__(self, name: str, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    @property
+    def size(self) -> int:
+        """Estimated size of all cached values in bytes"""
+        return self._size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value, or `default` if the key is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """Adds a value to the cache and evicts the least recently used entries if the memory bound or the entry bound
+        is exceeded.
+
+        Values that are larger than the memory bound on their own are not cached.
+        """
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Returns the cached value for `key`, or creates and caches it with `factory()`."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Removes all entries and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Returns the counters of the cache, e.g. for logging"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def log_stats(self, level: int = logging.DEBUG) -> None:
+        """Logs the counters of the cache"""
+        logger.log(level, "cache %(name)s: %(hits)d hits, %(misses)d misses, %(entries)d entries", self.stats())
+
+
+PARAMS_CACHE = LRUCache("params")
@@ -0,0 +1,172 @@
+"""Vectorized classification with the rows of a classification table (Table method).
+
+Every row of the table defines a box of qc, qc_norm and Rf limits. The table is compiled once into the sorted
+breakpoints of each signal and a lookup array with the first matching row for every combination of intervals. A sample
+is then classified by locating its values between the breakpoints with `searchsorted` and indexing the lookup array.
+A row matches a value if min <= value < max, where a missing limit is unbounded.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .cache import LRUCache, content_hash
+from .stress_profile import StressProfile, get_sample_stress_profile
+
+NO_MATCH = -1
+SIGNALS = ("qc", "qc_norm", "rf")
+REFERENCE_STRESS = 100  # [kPa], effective vertical stress at which qc_norm equals qc
+MIN_EFFECTIVE_STRESS = 1  # [kPa], avoids division by zero at the surface
+MAX_ITERATIONS = 5
+
+COMPILED_TABLES = LRUCache("classification_tables", max_bytes=8 * 1024**2)
+
+
+@dataclass(frozen=True)
+class CompiledClassificationTable:
+    """Breakpoints per signal and the first matching row per combination of intervals.
+
+    `lookup[i, j, k]` is the row for a sample in interval i of qc, j of qc_norm and k of Rf, and `lookup_without_norm`
+    the row when the qc_norm limits are disregarded. NO_MATCH if none of the rows match.
+    """
+
+    qc_edges: np.ndarray
+    qc_norm_edges: np.ndarray
+    rf_edges: np.ndarray
+    lookup: np.ndarray
+    lookup_without_norm: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.lookup.nbytes + self.lookup_without_norm.nbytes
+
+    def classify(
+        self, qc: Sequence[float], rf: Sequence[float], qc_norm: Optional[Sequence[float]] = None
+    ) -> np.ndarray:
+        """Returns the index of the first matching table row for every sample, NO_MATCH if no row matches.
+
+        :param qc: Cone resistance in [MPa]
+        :param rf: Friction ratio in [%]
+        :param qc_norm: Normalised cone resistance in [MPa]; the qc_norm limits are disregarded if None
+        """
+        qc_bins = np.searchsorted(self.qc_edges, np.asarray(qc, dtype=np.float64), side="right")
+        rf_bins = np.searchsorted(self.rf_edges, np.asarray(rf, dtype=np.float64), side="right")
+        if qc_norm is None:
+            return self.lookup_without_norm[qc_bins, rf_bins]
+        qc_norm_bins = np.searchsorted(self.qc_norm_edges, np.asarray(qc_norm, dtype=np.float64), side="right")
+        return self.lookup[qc_bins, qc_norm_bins, rf_bins]
+
+
+def _get_limits(table: List[dict], signal: str) -> np.ndarray:
+    """Returns the (min, max) limits per row, with -inf and inf for missing limits."""
+    return np.array(
+        [
+            [
+                -np.inf if row.get(f"{signal}_min") is None else row[f"{signal}_min"],
+                np.inf if row.get(f"{signal}_max") is None else row[f"{signal}_max"],
+            ]
+            for row in table
+        ],
+        dtype=np.float64,
+    ).reshape(len(table), 2)
+
+
+def _get_interval_matches(limits: np.ndarray) -> tuple:
+    """Returns the sorted finite breakpoints, and for every row and interval between them whether the row matches."""
+    edges = np.unique(limits[np.isfinite(limits)])
+    # interval b spans [edges[b - 1], edges[b]), so the lower bound of interval b is edges[b - 1]
+    interval_lower = np.concatenate(([-np.inf], edges))
+    interval_upper = np.concatenate((edges, [np.inf]))
+    matches = (interval_lower[np.newaxis, :] >= limits[:, [0]]) & (interval_upper[np.newaxis, :] <= limits[:, [1]])
+    return edges, matches
+
+
+def _first_matching_row(matches: np.ndarray) -> np.ndarray:
+    """Reduces a (rows, ...) boolean array to the index of the first True row, NO_MATCH if there is none."""
+    if matches.shape[0] == 0:
+        return np.full(matches.shape[1:], NO_MATCH, dtype=np.intp)
+    return np.where(matches.any(axis=0), matches.argmax(axis=0), NO_MATCH)
+
+
+def compile_classification_table(table: List[dict]) -> CompiledClassificationTable:
+    """Compiles the rows of a classification table into interval indexes and a lookup array."""
+    qc_edges, qc_matches = _get_interval_matches(_get_limits(table, "qc"))
+    qc_norm_edges, qc_norm_matches = _get_interval_matches(_get_limits(table, "qc_norm"))
+    rf_edges, rf_matches = _get_interval_matches(_get_limits(table, "rf"))
+
+    matches = (
+        qc_matches[:, :, np.newaxis, np.newaxis]
+        & qc_norm_matches[:, np.newaxis, :, np.newaxis]
+        & rf_matches[:, np.newaxis, np.newaxis, :]
+    )
+    return CompiledClassificationTable(
+        qc_edges=qc_edges,
+        qc_norm_edges=qc_norm_edges,
+        rf_edges=rf_edges,
+        lookup=_first_matching_row(matches),
+        lookup_without_norm=_first_matching_row(qc_matches[:, :, np.newaxis] & rf_matches[:, np.newaxis, :]),
+    )
+
+
+def get_compiled_classification_table(table: List[dict]) -> CompiledClassificationTable:
+    """Returns the compiled table, which is cached on the content of the table."""
+    limits = [{signal: (row.get(f"{signal}_min"), row.get(f"{signal}_max")) for signal in SIGNALS} for row in table]
+    return COMPILED_TABLES.get_or_create(content_hash(limits), lambda: compile_classification_table(table))
+
+
+def fill_unmatched_samples(row_indices: np.ndarray) -> np.ndarray:
+    """Assigns the row of the nearest classified sample above (or below, at the top) to the unmatched samples."""
+    matched = row_indices != NO_MATCH
+    if matched.all() or not matched.any():
+        return row_indices
+    positions = np.where(matched, np.arange(row_indices.size), 0)
+    np.maximum.accumulate(positions, out=positions)
+    filled = row_indices[positions]
+    first_matched = np.argmax(matched)
+    filled[:first_matched] = row_indices[first_matched]
+    return filled
+
+
+def get_normalised_cone_resistance(qc: np.ndarray, elevation: np.ndarray, stress_profile: StressProfile) -> np.ndarray:
+    """Returns qc_norm = qc * (100 / sigma'v) ^ 0.67 for every sample.
+
+    :param qc: Cone resistance in [MPa]
+    :param elevation: Elevation of each sample in [m]
+    :param stress_profile: Stresses along the CPT
+    """
+    effective_stress = np.maximum(stress_profile.effective_stress_at(elevation), MIN_EFFECTIVE_STRESS)
+    return qc * (REFERENCE_STRESS / effective_stress) ** 0.67
+
+
+def classify_with_table(
+    table: List[dict], qc: np.ndarray, rf: np.ndarray, elevation: np.ndarray, ground_water_level: float
+) -> np.ndarray:
+    """Returns the index of the matching table row for every sample.
+
+    qc_norm depends on the unit weights of the soils above a sample, which depend on the classification. The samples
+    are therefore first classified without the qc_norm limits, after which the classification is repeated with the
+    qc_norm of the previous classification until it no longer changes. Unmatched samples get the row of the nearest
+    sample above.
+
+    :param table: Classification table, see `_update_classification_table`
+    :param qc: Cone resistance in [MPa]
+    :param rf: Friction ratio as fraction (as in GEFData)
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :param ground_water_level: Phreatic level in [m]
+    """
+    compiled_table = get_compiled_classification_table(table)
+    rf_percentage = np.asarray(rf, dtype=np.float64) * 100
+    gamma_dry = np.array([row["gamma_dry"] or 0 for row in table] + [0], dtype=np.float64)
+    gamma_wet = np.array([row["gamma_wet"] or 0 for row in table] + [0], dtype=np.float64)
+
+    row_indices = fill_unmatched_samples(compiled_table.classify(qc, rf_percentage))
+    for _ in range(MAX_ITERATIONS):
+        stress_profile = get_sample_stress_profile(
+            elevation, gamma_dry[row_indices], gamma_wet[row_indices], ground_water_level
+        )
+        qc_norm = get_normalised_cone_resistance(qc, elevation, stress_profile)
+        new_row_indices = fill_unmatched_samples(compiled_table.classify(qc, rf_percentage, qc_norm))
+        if np.array_equal(new_row_indices, row_indices):
+            break
+        row_indices = new_row_indices
+    return row_indices
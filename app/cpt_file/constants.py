@@ -73,10 +73,33 @@ Pile_Micro_piles_Category = [
     OptionListElement(label="Micropile IV high pressure)", value="TAM")
 ]
 
+Pile_Base_Method = [
+    OptionListElement(label="NF P94-262 (kc x qce)", value="lcpc"),
+    OptionListElement(label="Koppejan (4D/8D)", value="koppejan"),
+]
+
 DEFAULT_MIN_LAYER_THICKNESS = 200
+# (min, max, step) of the minimum layer thickness in [mm]; the soil layout is filtered in advance for every step
+MIN_LAYER_THICKNESS_LADDER = (0, 2000, 50)
+
+# (min, max, step) of the pile diameter and length sliders in [m], which is also the grid of the pile design sweep
+PILE_DIAMETER_RANGE = (0.5, 3, 0.5)
+PILE_LENGTH_RANGE = (3, 50, 0.2)
+
+# Clustering of the CPTs of a site on the map: the extent is divided in about this many cells per side
+MAP_CLUSTER_CELLS = 20
+MIN_MAP_CLUSTER_CELL_SIZE = 25  # [m]
+
+# Maximum number of points per axis of the heatmap of every step of a slider
+MAX_SLIDER_HEATMAP_POINTS = 150
 
 ADDITIONAL_COLUMNS = ["corrected_depth", "fs"]
 
+# Values used for missing measurements in GEF files (#COLUMNVOID). Only the measured signals are checked, as the
+# elevation and depth columns are in mm and can take these values legitimately.
+GEF_VOID_VALUES = [-9999.0, 999999.0]
+GEF_VOID_SIGNALS = ["qc", "Rf", "fs"]
+
 DEFAULT_ROBERTSON_TABLE = [
     {
         "name": "Robertson zone unknown",
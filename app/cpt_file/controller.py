@@ -1,15 +1,21 @@
 from pathlib import Path
+from typing import List, Optional, Tuple
 
+import numpy as np
 from munch import Munch, unmunchify
-from viktor import File, UserError
+from viktor import Color, File, UserError
 from viktor.core import ViktorController, progress_message
-from viktor.geo import GEFFile, SoilLayout
-from viktor.geometry import GeoPoint
+from viktor.geo import GEFFile
+from viktor.geometry import GeoPoint, GeoPolygon, GeoPolyline
 from viktor.result import DownloadResult, SetParametersResult
 from viktor.views import (
     DataGroup,
     DataItem,
+    DataStatus,
+    MapLegend,
     MapPoint,
+    MapPolygon,
+    MapPolyline,
     MapResult,
     MapView,
     PlotlyAndDataResult,
@@ -20,15 +26,41 @@ from viktor.views import (
     WebView,
 )
 
+from .cache import PARAMS_CACHE
+from .constants import MAP_CLUSTER_CELLS, MIN_MAP_CLUSTER_CELL_SIZE
+from .damage import DAMAGE_CATEGORIES, get_rd_coordinates
+from .figure_templates import figure_to_json
+from .instrumentation import StageMeasurement, get_instrumentation_data_group, record_stages, stage
+from .layer_statistics import get_layer_statistics_data_group
+from .measurement_data import MeasurementData
 from .parametrization import CPTFileParametrization
+from .soil_layout_arrays import convert_serialized_soil_layout_to_table_rows
+from .site_database import cluster_locations, get_cluster_cell_size, get_site_database
 from .soil_layout_conversion_functions import (
     Classification,
-    convert_input_table_field_to_soil_layout,
-    convert_soil_layout_from_mm_to_meter,
-    convert_soil_layout_to_input_table_field,
+    filter_input_table_field_on_thickness,
+    get_soil_layout_results,
 )
+from .pile_capacity import solve_required_tip_level
+from .visualisation import CPTKeys
+from .visualisation import get_damage_assessment, get_layer_statistics, get_pile_capacity, get_surface_level
+from .visualisation import get_user_stress_profile
 from .visualisation import visualise_cpt
 from .visualisation import visualise_pile
+from .visualisation import visualise_pile_design_sweep
+from .visualisation import visualise_longitudinal_settlement, visualise_tunnel_settlement
+
+
+SITE_CPT_COLOR = Color(0, 122, 204)
+SITE_CLUSTER_COLOR = Color(230, 126, 34)
+MAX_CLUSTER_NAMES = 10  # of the CPTs listed in the description of a cluster
+DAMAGE_CATEGORY_COLORS = [
+    Color(46, 204, 113),
+    Color(163, 217, 119),
+    Color(241, 196, 15),
+    Color(230, 126, 34),
+    Color(192, 57, 43),
+]
 
 
 class CPTFileController(ViktorController):
@@ -47,9 +79,25 @@ class CPTFileController(ViktorController):
             if not file_resource:
                 raise UserError("Upload and select a GEF file.")
             _file = file_resource.file
-        cpt_file = GEFFile(_file.getvalue("ISO-8859-1"))
-        classification = Classification(params["classification"])
-        results = classification.classify_cpt_file(cpt_file)
+        with stage("classify_soil_layout"):
+            cpt_file = GEFFile(_file.getvalue("ISO-8859-1"))
+            classification = Classification(params["classification"])
+            results = classification.classify_cpt_file(cpt_file)
+        return SetParametersResult(results)
+
+    def reclassify_soil_layout(self, params, **kwargs) -> SetParametersResult:
+        """Classify the stored measurement data again, e.g. after changing the classification table"""
+        if not params.get("measurement_data"):
+            raise UserError("Classify soil layout before reclassifying.")
+        progress_message("Reclassifying soil layout")
+        with stage("reclassify_soil_layout"):
+            classification = Classification(params.classification)
+            with stage("decode_measurement_data"):
+                measurement_data = MeasurementData.from_params(params).drop_incomplete_rows()
+            with stage("classification"):
+                soil_layout = classification.classify_measurement_data(measurement_data, params.ground_water_level)
+            with stage("layout_conversion"):
+                results = get_soil_layout_results(soil_layout)
         return SetParametersResult(results)
 
     @staticmethod
@@ -65,63 +113,65 @@ class CPTFileController(ViktorController):
     @PlotlyAndDataView("CPT interpretation", duration_guess=3)
     def visualize_cpt(self, params: Munch, **kwargs) -> PlotlyAndDataResult:
         """Visualizes the Qc and Rf line plots, the soil layout bar plots and the data of the cpt."""
-        # fig = visualise_cpt(cpt_params=params)
-        fig = visualise_cpt(params)
-
-        data_group = self.get_data_group(params)
-        return PlotlyAndDataResult(fig.to_json(), data=data_group)
-
-    @PlotlyView("Pile Design", duration_guess=1)
-    def visualize_pile(self, params: Munch, **kwargs) -> PlotlyResult:
-        # fig = visualise_pile(cpt_params=params)
-        fig = visualise_pile(params, params)
-
-        data_group = self.get_data_group(params)
-        return PlotlyResult(fig.to_json())
-        # cpt_entity = params.step_1.cpt.cpt_selection
-        # cpt_instance = CPT(cpt_params=cpt_entity.last_saved_params, soils=DEFAULT_ROBERTSON_TABLE,
-        #                    entity_id=cpt_entity.id)
-        # surface_level = cpt_instance.params['soil_layout'][0]["top_of_layer"]
-        # input_xml, input_def, input_esa, scia_model = generate_scia_input(params)
-        # input_xml_content = serialize_file_to_string(input_xml)
-        # input_def_content = serialize_file_to_string(input_def)
-        # input_esa_content = serialize_file_to_string(input_esa)
-        # scia_result = run_scia(input_xml_content, input_def_content, input_esa_content)
-        # scia_result = deserialize_string_to_file(scia_result)
-        # _, max_rz = scia_parser(scia_model, scia_result, params)
-        # foi_file = generate_dfoundations_input(params)
-        # fod_file_content = run_dfoundations(foi_file.getvalue())
-        # parsed_results = dfoundations_parser(fod_file_content)
-        # closest_bearing_strength = min(parsed_results["Bearing Strength GT1B"], key=lambda x: abs(x - max_rz))
-        # index_closest_bearing_strength = parsed_results["Bearing Strength GT1B"].index(closest_bearing_strength)
-        # required_pile_tip_level = parsed_results["Depth"][index_closest_bearing_strength]
-        # data_result = DataGroup(
-        #     DataItem('Max Reaction Force', max_rz, suffix='N', number_of_decimals=1),
-        #     DataItem('Required Pile Tip Level', required_pile_tip_level, suffix='m', number_of_decimals=1),
-        #     DataItem('Required Pile Length', required_pile_tip_level - surface_level, suffix='m',
-        #              number_of_decimals=1)
-        # )
-        #
-        # fig = go.Figure(
-        #     data=[
-        #         go.Line(x=parsed_results["Bearing Strength GT1B"], y=parsed_results["Depth"],
-        #                 name="Bearing Strength")],
-        #     layout=go.Layout(  # title=go.layout.Title(text="Intersection"),
-        #         xaxis=go.layout.XAxis(title="Force [N]"),
-        #         yaxis=go.layout.YAxis(title="Depth [m]"))
-        # )
-        # fig.add_trace(go.Line(name="Reaction Force",
-        #                       x=max_rz * np.ones(100),
-        #                       y=np.linspace(min(parsed_results["Depth"]), 0, 100)))
-        # fig.add_trace(go.Line(name="Required Pile Tip Level",
-        #                       x=np.linspace(min(parsed_results["Bearing Strength GT1B"]),
-        #                                     max(parsed_results["Bearing Strength GT1B"]), 100),
-        #                       y=np.ones(100) * required_pile_tip_level))
-        # return PlotlyAndDataResult(fig.to_json(), data_result)
+        with record_stages() as measurements:
+            with stage("visualize_cpt"):
+                # the figure and the data share the content hashes of the params
+                keys = CPTKeys(params)
+                with stage("figure_build"):
+                    fig = visualise_cpt(params, keys=keys)
+                with stage("to_json"):
+                    fig_json = figure_to_json(fig)
+        PARAMS_CACHE.log_stats()
+
+        data_group = self.get_data_group(params, measurements, keys)
+        return PlotlyAndDataResult(fig_json, data=data_group)
+
+    @PlotlyAndDataView("Pile Design", duration_guess=1)
+    def visualize_pile(self, params: Munch, **kwargs) -> PlotlyAndDataResult:
+        """Visualizes the resistances and bearing capacity of the pile, and the tip level required for the load."""
+        with record_stages() as measurements:
+            with stage("visualize_pile"):
+                keys = CPTKeys(params)
+                with stage("figure_build"):
+                    fig = visualise_pile(params, params.PILE, keys=keys)
+                with stage("to_json"):
+                    fig_json = figure_to_json(fig)
+        PARAMS_CACHE.log_stats()
+        return PlotlyAndDataResult(fig_json, data=self.get_pile_data_group(params, measurements, keys))
+
+    @PlotlyView("Pile Design Sweep", duration_guess=1)
+    def visualize_pile_design_sweep(self, params: Munch, **kwargs) -> PlotlyResult:
+        """Visualizes the capacity of all combinations of pile diameter and length, and which meet the load."""
+        with stage("visualize_pile_design_sweep"):
+            fig = visualise_pile_design_sweep(params, params.PILE)
+            with stage("to_json"):
+                fig_json = fig.to_json()
+        PARAMS_CACHE.log_stats()
+        return PlotlyResult(fig_json)
+
+    @PlotlyView("Tunnel Settlement", duration_guess=1)
+    def visualize_tunnel_settlement(self, params: Munch, **kwargs) -> PlotlyResult:
+        """Visualizes the greenfield transverse settlement trough above the tunnel."""
+        with stage("visualize_tunnel_settlement"):
+            fig = visualise_tunnel_settlement(params, params.tunnel)
+            with stage("to_json"):
+                fig_json = fig.to_json()
+        PARAMS_CACHE.log_stats()
+        return PlotlyResult(fig_json)
+
+    @PlotlyView("Longitudinal Settlement", duration_guess=2)
+    def visualize_longitudinal_settlement(self, params: Munch, **kwargs) -> PlotlyResult:
+        """Visualizes the surface settlement per face position of the advancing tunnel, with a slider."""
+        with stage("visualize_longitudinal_settlement"):
+            fig = visualise_longitudinal_settlement(params, params.tunnel)
+            with stage("to_json"):
+                fig_json = fig.to_json()
+        PARAMS_CACHE.log_stats()
+        return PlotlyResult(fig_json)
 
     @MapView("Map", duration_guess=2)
     def visualize_map(self, params: Munch, **kwargs) -> MapResult:
-        """Visualize the MapView with the CPT location."""
+        """Visualize the MapView with the CPT location, and the (clustered) CPTs of the site in the site database."""
         headers = params.get("headers")
         if not headers:
             raise UserError("GEF file has no headers")
@@ -130,14 +180,125 @@ class CPTFileController(ViktorController):
         except AttributeError:
             x_coordinate, y_coordinate = headers.x_y_coordinates
 
-        cpt_features = []
+        with stage("visualize_map"):
+            with stage("site_features"):
+                cpt_features = self.get_site_features(params.get("site"))
+            legend_entries = []
+            if cpt_features:
+                legend_entries += [
+                    (SITE_CPT_COLOR, "CPT of the site"),
+                    (SITE_CLUSTER_COLOR, "Cluster of CPTs of the site"),
+                ]
+            tunnel_params = params.get("tunnel")
+            if tunnel_params and tunnel_params.get("buildings"):
+                with stage("building_features"):
+                    cpt_features += self.get_building_features(params, (x_coordinate, y_coordinate))
+                legend_entries += [
+                    (color, f"Damage category {index}: {name}")
+                    for index, (name, color) in enumerate(zip(DAMAGE_CATEGORIES, DAMAGE_CATEGORY_COLORS))
+                ]
         if None not in (x_coordinate, y_coordinate):
-            cpt_features.append(MapPoint.from_geo_point(GeoPoint.from_rd((x_coordinate, y_coordinate))))
-        return MapResult(cpt_features)
+            cpt_features.append(
+                MapPoint.from_geo_point(GeoPoint.from_rd((x_coordinate, y_coordinate)), title="This CPT")
+            )
+        legend = MapLegend([(Color(39, 45, 51), "This CPT"), *legend_entries]) if legend_entries else None
+        return MapResult(cpt_features, legend=legend)
+
+    @staticmethod
+    def get_building_features(params: Munch, cpt_coordinates: Tuple[float, float]) -> list:
+        """Returns the tunnel alignment and the buildings of the tunnel step, coloured by their damage category.
+
+        The alignment starts at the entered RD coordinates, or at the CPT if they are not entered.
+        """
+        tunnel_params = params.tunnel
+        origin = (tunnel_params.get("origin_x"), tunnel_params.get("origin_y"))
+        if None in origin:
+            origin = cpt_coordinates
+        if None in origin:
+            return []
+        bearing = tunnel_params.get("bearing") or 0
+        buildings, assessment = get_damage_assessment(params, tunnel_params)
+
+        def to_geo_points(chainage, offset) -> List[GeoPoint]:
+            x, y = get_rd_coordinates(chainage, offset, origin, bearing)
+            return [GeoPoint.from_rd((float(x_i), float(y_i))) for x_i, y_i in zip(x, y)]
+
+        alignment = to_geo_points([tunnel_params["tunnel_start"], tunnel_params["face_end"]], [0, 0])
+        features = [MapPolyline.from_geo_polyline(GeoPolyline(*alignment), title="Tunnel axis", color=Color(0, 0, 0))]
+        for index, name in enumerate(buildings.names):
+            chainages = [buildings.chainage_start[index], buildings.chainage_end[index]]
+            offsets = [buildings.offset_start[index], buildings.offset_end[index]]
+            corners = to_geo_points(
+                [chainages[0], chainages[1], chainages[1], chainages[0]],
+                [offsets[0], offsets[0], offsets[1], offsets[1]],
+            )
+            category = int(assessment.category[index])
+            if assessment.evaluated[index]:
+                description = (
+                    f"Maximum settlement: {assessment.max_settlement[index] * 1e3:.1f} mm  \n"
+                    f"Maximum slope: 1:{1 / max(assessment.max_slope[index], 1e-9):.0f}  \n"
+                    f"Deflection ratio: {assessment.deflection_ratio[index] * 1e3:.3f} ‰ "
+                    f"({'hogging' if assessment.hogging[index] else 'sagging'})  \n"
+                    f"Horizontal strain: {assessment.horizontal_strain[index] * 1e2:.3f} %  \n"
+                    f"Tensile strain: {assessment.tensile_strain[index] * 1e2:.3f} %"
+                )
+            else:
+                description = "Outside the zone with a settlement of 1 mm or more"
+            features.append(
+                MapPolygon.from_geo_polygon(
+                    GeoPolygon(*corners),
+                    title=f"{name}: {DAMAGE_CATEGORIES[category]}",
+                    description=description,
+                    color=DAMAGE_CATEGORY_COLORS[category],
+                )
+            )
+        return features
+
+    @staticmethod
+    def get_site_features(site: str) -> List[MapPoint]:
+        """Returns a MapPoint per cluster of CPTs of the site in the site database; their results are not read."""
+        site_database = get_site_database()
+        if not site or site_database is None:
+            return []
+        with stage("site_locations"):
+            locations = site_database.get_locations(site)
+            cell_size = get_cluster_cell_size(locations, MAP_CLUSTER_CELLS, MIN_MAP_CLUSTER_CELL_SIZE)
+            clusters = cluster_locations(locations, cell_size)
+
+        features = []
+        for cluster in clusters:
+            geo_point = GeoPoint.from_rd((cluster.x, cluster.y))
+            if len(cluster.locations) == 1:
+                location = cluster.locations[0]
+                description = f"Ground level: {location.ground_level} m NAP  \nBottom: {location.bottom} m NAP"
+                features.append(
+                    MapPoint.from_geo_point(
+                        geo_point, title=location.name, description=description, color=SITE_CPT_COLOR
+                    )
+                )
+            else:
+                names = ", ".join(location.name for location in cluster.locations[:MAX_CLUSTER_NAMES])
+                if len(cluster.locations) > MAX_CLUSTER_NAMES:
+                    names += ", ..."
+                features.append(
+                    MapPoint.from_geo_point(
+                        geo_point,
+                        title=f"{len(cluster.locations)} CPTs",
+                        description=names,
+                        color=SITE_CLUSTER_COLOR,
+                    )
+                )
+        return features
 
     @staticmethod
-    def get_data_group(params: Munch) -> DataGroup:
-        """Collect the necessary information from the GEF headers and return a DataGroup with the data"""
+    def get_data_group(
+        params: Munch, measurements: List[StageMeasurement] = None, keys: Optional[CPTKeys] = None
+    ) -> DataGroup:
+        """Collect the necessary information from the GEF headers and return a DataGroup with the data
+
+        :param measurements: Stages measured by the instrumentation, which are added as summary if not empty
+        :param keys: Content hashes of the params, which are calculated if not given
+        """
         headers = params.get("headers")
         if not headers:
             raise UserError("GEF file has no headers")
@@ -145,12 +306,16 @@ class CPTFileController(ViktorController):
             x_coordinate, y_coordinate = params.x_rd, params.y_rd
         except AttributeError:
             x_coordinate, y_coordinate = headers.x_y_coordinates
+        elevation = MeasurementData.from_params(params).elevation
 
-        return DataGroup(
+        items = dict(
             ground_level_wrt_reference_m=DataItem(
                 "Ground level", headers.ground_level_wrt_reference_m or -999, suffix="m"
             ),
             ground_water_level=DataItem("Phreatic level", params.ground_water_level, suffix="m"),
+            bottom_of_cpt=DataItem(
+                "Bottom of CPT", float(np.nanmin(elevation)) / 1e3, suffix="m", number_of_decimals=2
+            ),
             height_system=DataItem("Height system", headers.height_system or "-"),
             coordinates=DataItem(
                 "Coordinates",
@@ -161,27 +326,76 @@ class CPTFileController(ViktorController):
                 ),
             ),
         )
+        if params.get("soil_layout"):
+            stress_profile = get_user_stress_profile(params, keys)
+            items["effective_stress_at_bottom"] = DataItem(
+                "Vertical effective stress at bottom of soil layout",
+                float(stress_profile.effective_stress_at(stress_profile.boundaries[-1])),
+                suffix="kPa",
+                number_of_decimals=1,
+            )
+            items["layer_statistics"] = DataItem(
+                "Layer statistics", "", subgroup=get_layer_statistics_data_group(get_layer_statistics(params, keys))
+            )
+        if measurements:
+            items["instrumentation"] = DataItem(
+                "Stage timings", "", subgroup=get_instrumentation_data_group(measurements)
+            )
+        return DataGroup(**items)
+
+    @staticmethod
+    def get_pile_data_group(
+        params: Munch, measurements: List[StageMeasurement] = None, keys: Optional[CPTKeys] = None
+    ) -> DataGroup:
+        """Returns a DataGroup with the shallowest pile tip level and the pile length at which the bearing capacity
+        reaches the required load.
+
+        :param measurements: Stages measured by the instrumentation, which are added as summary if not empty
+        :param keys: Content hashes of the params, which are calculated if not given
+        """
+        load = params.PILE.Load
+        _, profile = get_pile_capacity(params, params.PILE, keys)
+        required_pile_tip_level = float(solve_required_tip_level(profile, load))
+        items = dict(load=DataItem("Pile load", load, suffix="MN", number_of_decimals=1))
+        if np.isnan(required_pile_tip_level):
+            message = "The bearing capacity along the CPT does not reach the required load"
+            items["required_pile_tip_level"] = DataItem(
+                "Required pile tip level", "-", status=DataStatus.WARNING, status_message=message
+            )
+        else:
+            surface_level = get_surface_level(params, keys)
+            items["required_pile_tip_level"] = DataItem(
+                "Required pile tip level", required_pile_tip_level, suffix="m", number_of_decimals=2
+            )
+            items["required_pile_length"] = DataItem(
+                "Required pile length", surface_level - required_pile_tip_level, suffix="m", number_of_decimals=2
+            )
+            effective_stress = get_user_stress_profile(params, keys).effective_stress_at(required_pile_tip_level)
+            items["effective_stress_at_pile_tip"] = DataItem(
+                "Vertical effective stress at pile tip", float(effective_stress), suffix="kPa", number_of_decimals=1
+            )
+        if measurements:
+            items["instrumentation"] = DataItem(
+                "Stage timings", "", subgroup=get_instrumentation_data_group(measurements)
+            )
+        return DataGroup(**items)
 
     @staticmethod
     def filter_soil_layout_on_min_layer_thickness(params: Munch, **kwargs) -> SetParametersResult:
         """Remove all layers below the filter threshold."""
         progress_message("Filtering thin layers from soil layout")
 
-        # Create SoilLayout
-        bottom_of_soil_layout_user = params.get("bottom_of_soil_layout_user")
-        classification = Classification(params.classification)
-        soil_layout_user = convert_input_table_field_to_soil_layout(
-            bottom_of_soil_layout_user=params["bottom_of_soil_layout_user"],
-            soil_layers_from_table_input=params["soil_layout"],
-            soils=classification.soil_mapping,
-        )
-        # filter the layer thickness
-        soil_layout_user.filter_layers_on_thickness(
-            params.cpt.min_layer_thickness, merge_adjacent_same_soil_layers=True
-        )
-        # convert to meter, and to the format for the input table
-        soil_layout_user = convert_soil_layout_from_mm_to_meter(soil_layout_user)
-        table_input_soil_layers = convert_soil_layout_to_input_table_field(soil_layout_user)
+        with stage("filter_soil_layout_on_min_layer_thickness"):
+            classification = Classification(params.classification)
+            # filter the table rows on the layer thickness, in meter
+            with stage("filter"):
+                table_input_soil_layers = filter_input_table_field_on_thickness(
+                    bottom_of_soil_layout_user=params["bottom_of_soil_layout_user"],
+                    soil_layers_from_table_input=unmunchify(params["soil_layout"]),
+                    registry=classification.soil_registry,
+                    min_layer_thickness=params.cpt.min_layer_thickness or 0,
+                    soil_layout_original=unmunchify(params.get("soil_layout_original")) or None,
+                )
 
         # send it to the parametrisation
         return SetParametersResult({"soil_layout": table_input_soil_layers})
@@ -190,12 +404,10 @@ class CPTFileController(ViktorController):
     def reset_soil_layout_user(params: Munch, **kwargs) -> SetParametersResult:
         """Place the original soil layout (after parsing) in the table input."""
         progress_message("Resetting soil layout to original unfiltered result")
-        # get the original soil layout from the hidden field
-        soil_layout_original = SoilLayout.from_dict(unmunchify(params.soil_layout_original))
-
-        # convert it to a format for the input table
-        table_input_soil_layers = convert_soil_layout_to_input_table_field(
-            convert_soil_layout_from_mm_to_meter(soil_layout_original)
+        # convert the original soil layout of the hidden field to the format for the input table, without creating
+        # the SoilLayout
+        table_input_soil_layers = convert_serialized_soil_layout_to_table_rows(
+            unmunchify(params.soil_layout_original), unit="mm"
         )
         # send it to the parametrisation
         return SetParametersResult(
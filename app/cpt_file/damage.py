@@ -0,0 +1,212 @@
+"""Damage risk screening of buildings above the tunnel, with the strains of Burland and Wroth (1974).
+
+Every building is a rectangle in the coordinates of the alignment (chainage along the tunnel, offset from the tunnel
+axis), with its walls across the tunnel. The greenfield settlement and horizontal displacement are evaluated on a grid
+of points of every footprint: lines across the tunnel at several chainages of the building. Along each line:
+
+- the deflection ratio is the largest deviation of the settlement from the chord between the ends of the line,
+  divided by the length; the building hogs where the deviation is upwards, and sags where it is downwards;
+- the horizontal strain is the mean strain along the line, the difference of the horizontal displacements of the
+  ends divided by the length (only tension counts).
+
+The bending and shear strains of an elastic deep beam (E/G = 2.6) follow from the deflection ratio, and are combined
+with the horizontal strain into the maximum tensile strain, which gives the damage category of Boscardin and Cording
+(1989) and Burland (1995). The line with the largest tensile strain governs.
+
+All buildings are evaluated in one batched pass over arrays of shape (building, line, point). Buildings that lie
+completely outside the zone where the settlement exceeds 1 mm are screened out beforehand with a bounding box test.
+"""
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+from viktor import UserError
+
+from .settlement import TransverseTrough, normal_cdf
+
+DAMAGE_CATEGORIES = ["Negligible", "Very slight", "Slight", "Moderate", "Severe"]
+LIMITING_TENSILE_STRAINS = np.array([0.0005, 0.00075, 0.0015, 0.003])  # upper bounds of the categories [-]
+
+E_OVER_G = 2.6  # ratio of the Young's and shear modulus of the deep beam (Poisson's ratio 0.3)
+POISSON_RATIO = 0.3
+MIN_SETTLEMENT = 1e-3  # [m], buildings outside the contour of this settlement are not evaluated
+
+POINTS_PER_LINE = 41  # evaluation points along each line across the tunnel
+LINES_PER_BUILDING = 5  # lines across the tunnel, at equal distances along the chainage of the building
+
+
+@dataclass(frozen=True)
+class Buildings:
+    """Footprints of the buildings in alignment coordinates [m], and their heights [m]"""
+
+    names: List[str]
+    chainage_start: np.ndarray
+    chainage_end: np.ndarray
+    offset_start: np.ndarray
+    offset_end: np.ndarray
+    height: np.ndarray
+
+    @classmethod
+    def from_table(cls, rows: List[dict]) -> "Buildings":
+        """Builds the footprints from the rows of the buildings table, sorting the start and end of each rectangle."""
+        columns = {
+            name: np.array([row.get(name) for row in rows], dtype=np.float64)
+            for name in ("chainage_start", "chainage_end", "offset_start", "offset_end", "height")
+        }
+        if np.isnan(np.concatenate(list(columns.values()))).any():
+            raise UserError("Enter the footprint and height of every building")
+        if np.any(columns["height"] <= 0) or np.any(columns["offset_start"] == columns["offset_end"]):
+            raise UserError("The buildings need a positive height and width across the tunnel")
+        return cls(
+            names=[row.get("name") or f"Building {index + 1}" for index, row in enumerate(rows)],
+            chainage_start=np.minimum(columns["chainage_start"], columns["chainage_end"]),
+            chainage_end=np.maximum(columns["chainage_start"], columns["chainage_end"]),
+            offset_start=np.minimum(columns["offset_start"], columns["offset_end"]),
+            offset_end=np.maximum(columns["offset_start"], columns["offset_end"]),
+            height=columns["height"],
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+@dataclass(frozen=True)
+class DamageAssessment:
+    """Governing results per building; zero and category 0 for buildings outside the zone of influence"""
+
+    evaluated: np.ndarray  # whether the building is in the zone of influence
+    max_settlement: np.ndarray  # [m]
+    max_slope: np.ndarray  # [-]
+    deflection_ratio: np.ndarray  # [-], of the governing line
+    hogging: np.ndarray  # whether the governing line hogs
+    horizontal_strain: np.ndarray  # [-], of the governing line
+    tensile_strain: np.ndarray  # [-]
+    category: np.ndarray  # index in DAMAGE_CATEGORIES
+
+
+def get_rd_coordinates(
+    chainage: np.ndarray, offset: np.ndarray, origin: Tuple[float, float], bearing: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Converts alignment coordinates [m] to RD coordinates [m]; the offset is positive to the right of the tunnel.
+
+    :param origin: RD coordinates of chainage 0 on the tunnel axis
+    :param bearing: Direction of the alignment in degrees, clockwise from north
+    """
+    angle = np.radians(bearing)
+    direction, right = np.array([np.sin(angle), np.cos(angle)]), np.array([np.cos(angle), -np.sin(angle)])
+    chainage, offset = np.asarray(chainage, dtype=np.float64), np.asarray(offset, dtype=np.float64)
+    x = origin[0] + chainage * direction[0] + offset * right[0]
+    y = origin[1] + chainage * direction[1] + offset * right[1]
+    return x, y
+
+
+def get_influence_zone(trough: TransverseTrough, tunnel_start: float, face: float) -> tuple:
+    """Returns (min chainage, max chainage, max offset) [m] of a box around the settlement of at least 1 mm.
+
+    Across the tunnel, this is where the transverse trough is 1 mm. Before the start and beyond the face, the
+    longitudinal factor is below 0.0015 at 3 i, so the box is extended by 3 i.
+    """
+    trough_width = float(trough.trough_width)
+    max_settlement = float(trough.max_settlement)
+    if max_settlement <= MIN_SETTLEMENT:
+        return tunnel_start, face, 0.0
+    max_offset = trough_width * np.sqrt(2 * np.log(max_settlement / MIN_SETTLEMENT))
+    return tunnel_start - 3 * trough_width, face + 3 * trough_width, max_offset
+
+
+def get_tensile_strain(
+    deflection_ratio: np.ndarray, horizontal_strain: np.ndarray, length: np.ndarray, height: np.ndarray, hogging
+) -> np.ndarray:
+    """Maximum tensile strain [-] of a deep beam of the given length and height [m], from the bending and shear strain
+
+    In hogging the neutral axis is at the bottom of the beam, in sagging at the middle.
+    """
+    inertia = np.where(hogging, height**3 / 3, height**3 / 12)
+    extreme_fibre = np.where(hogging, height, height / 2)
+    bending_strain = deflection_ratio / (
+        length / (12 * extreme_fibre) + 3 * inertia * E_OVER_G / (2 * extreme_fibre * length * height)
+    )
+    shear_strain = deflection_ratio / (1 + height * length**2 / (18 * inertia * E_OVER_G))
+    combined_bending = horizontal_strain + bending_strain
+    combined_shear = horizontal_strain * (1 - POISSON_RATIO) / 2 + np.sqrt(
+        (horizontal_strain * (1 + POISSON_RATIO) / 2) ** 2 + shear_strain**2
+    )
+    return np.maximum(combined_bending, combined_shear)
+
+
+def screen_buildings(
+    buildings: Buildings, trough: TransverseTrough, tunnel_start: float, face: float
+) -> DamageAssessment:
+    """Assesses the damage category of all buildings for the tunnel from `tunnel_start` up to the face [m].
+
+    :param buildings: Footprints in alignment coordinates
+    :param trough: Transverse trough of the tunnel
+    :param tunnel_start: Chainage [m] where the tunnel starts
+    :param face: Chainage [m] of the face
+    """
+    number_of_buildings = len(buildings)
+    zeros = np.zeros(number_of_buildings)
+    assessment = dict(
+        evaluated=np.zeros(number_of_buildings, dtype=bool),
+        max_settlement=zeros.copy(),
+        max_slope=zeros.copy(),
+        deflection_ratio=zeros.copy(),
+        hogging=np.zeros(number_of_buildings, dtype=bool),
+        horizontal_strain=zeros.copy(),
+        tensile_strain=zeros.copy(),
+        category=np.zeros(number_of_buildings, dtype=np.intp),
+    )
+
+    # only the buildings that overlap the zone of influence are evaluated
+    min_chainage, max_chainage, max_offset = get_influence_zone(trough, tunnel_start, face)
+    evaluated = (
+        (buildings.chainage_end >= min_chainage)
+        & (buildings.chainage_start <= max_chainage)
+        & (buildings.offset_end >= -max_offset)
+        & (buildings.offset_start <= max_offset)
+    )
+    assessment["evaluated"] = evaluated
+    index = np.flatnonzero(evaluated)
+    if index.size == 0:
+        return DamageAssessment(**assessment)
+
+    # the footprint points, with shape (building, line, point)
+    fractions = np.linspace(0, 1, POINTS_PER_LINE)
+    offset_start, offset_end = buildings.offset_start[index, np.newaxis], buildings.offset_end[index, np.newaxis]
+    offsets = (offset_start + (offset_end - offset_start) * fractions)[:, np.newaxis, :]
+    line_fractions = np.linspace(0, 1, LINES_PER_BUILDING)
+    chainage_start = buildings.chainage_start[index, np.newaxis]
+    chainage_end = buildings.chainage_end[index, np.newaxis]
+    chainages = (chainage_start + (chainage_end - chainage_start) * line_fractions)[:, :, np.newaxis]
+
+    trough_width = float(trough.trough_width)
+    longitudinal = normal_cdf((chainages - tunnel_start) / trough_width) - normal_cdf((chainages - face) / trough_width)
+    settlement = trough.settlement(offsets) * longitudinal
+    slope = trough.slope(offsets) * longitudinal
+    horizontal_displacement = trough.horizontal_displacement(offsets) * longitudinal
+
+    length = offset_end - offset_start
+    chord = settlement[..., :1] + (settlement[..., -1:] - settlement[..., :1]) * fractions
+    deviation = chord - settlement  # positive where the building hogs
+    governing_point = np.abs(deviation).argmax(axis=-1)
+    max_deviation = np.take_along_axis(deviation, governing_point[..., np.newaxis], axis=-1)[..., 0]
+    deflection_ratio = np.abs(max_deviation) / length
+    hogging = max_deviation > 0
+    horizontal_strain = np.clip(
+        (horizontal_displacement[..., -1] - horizontal_displacement[..., 0]) / length, 0, None
+    )
+    tensile_strain = get_tensile_strain(
+        deflection_ratio, horizontal_strain, length, buildings.height[index, np.newaxis], hogging
+    )
+
+    governing_line = tensile_strain.argmax(axis=-1)[:, np.newaxis]
+    assessment["max_settlement"][index] = settlement.max(axis=(1, 2))
+    assessment["max_slope"][index] = np.abs(slope).max(axis=(1, 2))
+    assessment["deflection_ratio"][index] = np.take_along_axis(deflection_ratio, governing_line, axis=1)[:, 0]
+    assessment["hogging"][index] = np.take_along_axis(hogging, governing_line, axis=1)[:, 0]
+    assessment["horizontal_strain"][index] = np.take_along_axis(horizontal_strain, governing_line, axis=1)[:, 0]
+    assessment["tensile_strain"][index] = np.take_along_axis(tensile_strain, governing_line, axis=1)[:, 0]
+    assessment["category"][index] = np.searchsorted(
+        LIMITING_TENSILE_STRAINS, assessment["tensile_strain"][index], side="right"
+    )
+    return DamageAssessment(**assessment)
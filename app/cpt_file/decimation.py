@@ -0,0 +1,99 @@
+"""Decimation of depth series before they are sent to the browser.
+
+Both methods return the indices of the samples to keep, so that multiple signals that share the same depth can be
+decimated consistently:
+
+- `min_max_indices` keeps the minimum and maximum of every bucket of consecutive samples, so peaks (e.g. refusal
+  layers or thin sand lenses) are always preserved;
+- `lttb_indices` implements Largest-Triangle-Three-Buckets, which keeps the visual shape with one sample per bucket.
+"""
+from typing import Sequence
+
+import numpy as np
+
+DEFAULT_TARGET_POINTS = 2000
+
+
+def min_max_indices(values: Sequence[float], target_points: int = DEFAULT_TARGET_POINTS) -> np.ndarray:
+    """Returns the sorted indices of the minimum and maximum in each of `target_points / 2` buckets, plus the first
+    and last sample. NaN values are never selected as extreme, unless a bucket only contains NaN."""
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    if n <= target_points or target_points < 4:
+        return np.arange(n)
+
+    bucket_size = int(np.ceil(n / (target_points // 2)))
+    number_of_buckets = int(np.ceil(n / bucket_size))
+    padded = np.full(number_of_buckets * bucket_size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(number_of_buckets, bucket_size)
+    offsets = np.arange(number_of_buckets) * bucket_size
+
+    minima = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1) + offsets
+    maxima = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1) + offsets
+    indices = np.unique(np.concatenate(([0, n - 1], minima, maxima)))
+    return indices[indices < n]
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], target_points: int = DEFAULT_TARGET_POINTS) -> np.ndarray:
+    """Returns the indices selected by Largest-Triangle-Three-Buckets.
+
+    :param x: Position of each sample (e.g. the elevation), monotonic
+    :param y: Value of each sample
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = x.size
+    if n <= target_points or target_points < 3:
+        return np.arange(n)
+
+    # the first and last sample are kept, the others are divided into target_points - 2 buckets
+    edges = np.linspace(1, n - 1, target_points - 1).astype(np.intp)
+    y_filled = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0, y)
+    cumulative_x = np.concatenate(([0.0], np.cumsum(x)))
+    cumulative_y = np.concatenate(([0.0], np.cumsum(y_filled)))
+
+    indices = np.empty(target_points, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(target_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # the third point of the triangle is the average of the next bucket (or the last sample)
+        next_start, next_end = (end, edges[bucket + 2]) if bucket + 2 < edges.size else (n - 1, n)
+        next_end = max(next_end, next_start + 1)
+        average_x = (cumulative_x[next_end] - cumulative_x[next_start]) / (next_end - next_start)
+        average_y = (cumulative_y[next_end] - cumulative_y[next_start]) / (next_end - next_start)
+
+        bucket_x, bucket_y = x[start:end], y_filled[start:end]
+        areas = np.abs(
+            (x[previous] - average_x) * (bucket_y - y_filled[previous])
+            - (x[previous] - bucket_x) * (average_y - y_filled[previous])
+        )
+        previous = start + int(areas.argmax()) if areas.size else start
+        indices[bucket + 1] = previous
+    return np.unique(indices)
+
+
+def decimate_indices(
+    depth: Sequence[float],
+    *values: Sequence[float],
+    target_points: int = DEFAULT_TARGET_POINTS,
+    method: str = "min_max",
+) -> np.ndarray:
+    """Returns the sorted indices to keep for one or more signals along the same depth.
+
+    With multiple signals, the indices selected for each signal are combined, so every signal keeps its peaks.
+
+    :param depth: Depth or elevation of each sample
+    :param values: Signals along the depth
+    :param target_points: Approximate number of points to keep per signal
+    :param method: 'min_max' or 'lttb'
+    """
+    if method == "min_max":
+        selections = [min_max_indices(signal, target_points) for signal in values]
+    elif method == "lttb":
+        selections = [lttb_indices(depth, signal, target_points) for signal in values]
+    else:
+        raise ValueError(f"Unknown decimation method '{method}'")
+    if not selections:
+        return np.arange(np.asarray(depth).size)
+    return np.unique(np.concatenate(selections))
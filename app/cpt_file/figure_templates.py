@@ -0,0 +1,69 @@
+"""Figure templates: the layout of a view is built and validated by Plotly once, and reused for every figure.
+
+Building a figure with `make_subplots` and `update_xaxes`/`update_yaxes` validates every property of the layout on
+every request, which is a large share of the view time for small CPTs. A `FigureTemplate` holds the validated layout
+of a view as plain dict, with the axes of each subplot. A figure is a copy of that layout, updated with the few
+properties that change per request (such as the ticks of the depth axes), and the traces as plain dicts. The figure
+is serialized without validation by Plotly.
+
+As the traces are not validated, they must use the full property names of Plotly, e.g. `marker=dict(color=...)`
+instead of `marker_color`, and set their `type`.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import plotly.io as pio
+from plotly import graph_objects as go
+
+from .cache import LRUCache
+
+FIGURE_TEMPLATES = LRUCache("figure_templates", max_bytes=4 * 1024**2)
+
+
+@dataclass(frozen=True)
+class FigureTemplate:
+    """Validated layout of a figure as plain dict, and the x- and y-axis of each subplot (row, col) in the layout"""
+
+    layout: dict
+    axes: Dict[Tuple[int, int], Tuple[str, str]]
+
+    @classmethod
+    def from_figure(cls, fig: go.Figure, rows: int, cols: int) -> "FigureTemplate":
+        """Creates the template from the layout of a figure with rows x cols subplots; its traces are ignored."""
+        axes = {}
+        for row in range(1, rows + 1):
+            for col in range(1, cols + 1):
+                subplot = fig.get_subplot(row, col)
+                axes[(row, col)] = (subplot.xaxis.plotly_name, subplot.yaxis.plotly_name)
+        return cls(layout=fig.to_plotly_json()["layout"], axes=axes)
+
+    def trace(self, row: int, col: int, **properties) -> dict:
+        """Returns a trace in the subplot (row, col), e.g. `template.trace(1, 1, type="scatter", x=x, y=y)`"""
+        xaxis, yaxis = self.axes[(row, col)]
+        # a trace refers to the axes 'xaxis2' and 'yaxis2' of the layout as 'x2' and 'y2'
+        return dict(properties, xaxis=xaxis.replace("axis", ""), yaxis=yaxis.replace("axis", ""))
+
+    def create_figure(self, traces: Sequence[dict], layout_updates: Optional[dict] = None) -> dict:
+        """Returns the figure as dict with the traces, without altering the layout of the template.
+
+        :param traces: Traces as plain dicts, see `trace`
+        :param layout_updates: Properties of the layout per key; dicts are merged with the dict of the template (one
+            level deep, e.g. `{"yaxis": {"tick0": -30}}`), other values replace the value of the template
+        """
+        layout = dict(self.layout)
+        for key, value in (layout_updates or {}).items():
+            if isinstance(value, dict) and isinstance(layout.get(key), dict):
+                layout[key] = {**layout[key], **value}
+            else:
+                layout[key] = value
+        return {"data": list(traces), "layout": layout}
+
+
+def get_figure_template(view_type: str, build: Callable[[], FigureTemplate]) -> FigureTemplate:
+    """Returns the template of a view type, which is built once per process with `build()`."""
+    return FIGURE_TEMPLATES.get_or_create(view_type, build)
+
+
+def figure_to_json(figure: dict) -> str:
+    """Serializes a figure of `FigureTemplate.create_figure` without validation by Plotly."""
+    return pio.to_json(figure, validate=False)
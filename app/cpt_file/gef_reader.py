@@ -0,0 +1,250 @@
+"""Streaming reader for GEF-CPT files.
+
+The header block is parsed line by line, after which the data block is read in chunks of a fixed number of rows that
+are written into preallocated NumPy columns. The text of the file is never held in memory as a whole, so the peak
+memory is proportional to the resulting arrays.
+"""
+import mmap
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, IO, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from viktor import File
+
+from .measurement_data import MeasurementData
+
+GEF_ENCODING = "ISO-8859-1"
+DEFAULT_CHUNK_SIZE = 4096  # rows
+
+# GEF quantity numbers (4th field of #COLUMNINFO) of the CPT signals, see the GEF-CPT-Report standard
+GEF_QUANTITIES = {
+    1: "penetration_length",
+    2: "qc",
+    3: "fs",
+    4: "Rf",
+    5: "u1",
+    6: "u2",
+    7: "u3",
+    8: "inclination",
+    9: "inclination_n_s",
+    10: "inclination_e_w",
+    11: "corrected_depth",
+    12: "time",
+}
+
+# Name of the height system per code of #ZID
+HEIGHT_SYSTEMS = {"31000": "NAP"}
+# Number of the #MEASUREMENTVAR with the phreatic level [m], as read by the GEF parser of the SDK
+WATER_LEVEL_VARIABLE = 14
+
+# Factor from the unit of a GEF column to the unit of a parsed GEFData object, e.g. Rf from % to a fraction
+SIGNAL_SCALES = {"Rf": 1 / 100}
+
+
+@dataclass
+class GEFHeader:
+    """Header block of a GEF file. All header lines are kept in `raw` as lists of (stripped) values per keyword."""
+
+    raw: Dict[str, List[List[str]]] = field(default_factory=dict)
+
+    def first(self, keyword: str) -> Optional[List[str]]:
+        """Returns the values of the first occurrence of a header keyword, or None."""
+        values = self.raw.get(keyword)
+        return values[0] if values else None
+
+    @property
+    def column_names(self) -> List[str]:
+        """Name per data column, derived from the quantity numbers in #COLUMNINFO."""
+        names = {}
+        for values in self.raw.get("COLUMNINFO", []):
+            column, quantity = int(values[0]), int(values[3])
+            names[column] = GEF_QUANTITIES.get(quantity, f"column_{column}")
+        number_of_columns = int(self.first("COLUMN")[0]) if self.first("COLUMN") else max(names, default=0)
+        return [names.get(column, f"column_{column}") for column in range(1, number_of_columns + 1)]
+
+    @property
+    def column_voids(self) -> Dict[int, float]:
+        """Void value per (0-based) column index"""
+        return {int(values[0]) - 1: float(values[1]) for values in self.raw.get("COLUMNVOID", [])}
+
+    @property
+    def signal_voids(self) -> Dict[str, float]:
+        """Void value per signal name, in the unit of a parsed GEFData object (see SIGNAL_SCALES)"""
+        names = self.column_names
+        return {
+            names[column]: void * SIGNAL_SCALES.get(names[column], 1)
+            for column, void in self.column_voids.items()
+            if column < len(names)
+        }
+
+    @property
+    def last_scan(self) -> Optional[int]:
+        """Number of data rows as announced in the header, if present"""
+        values = self.first("LASTSCAN")
+        return int(values[0]) if values else None
+
+    @property
+    def column_separator(self) -> Optional[str]:
+        values = self.first("COLUMNSEPARATOR")
+        return values[0] if values and values[0] else None
+
+    @property
+    def record_separator(self) -> Optional[str]:
+        values = self.first("RECORDSEPARATOR")
+        return values[0] if values and values[0] else None
+
+    @property
+    def ground_level(self) -> float:
+        """Ground level w.r.t. the height system in [m] (#ZID)"""
+        values = self.first("ZID")
+        return float(values[1]) if values and len(values) > 1 else 0.0
+
+    @property
+    def height_system(self) -> Optional[str]:
+        values = self.first("ZID")
+        return HEIGHT_SYSTEMS.get(values[0], values[0]) if values else None
+
+    @property
+    def name(self) -> str:
+        values = self.first("TESTID")
+        return values[0] if values else ""
+
+    @property
+    def x_y_coordinates(self) -> Optional[Tuple[float, float]]:
+        """RD coordinates [m] of the CPT (#XYID)"""
+        values = self.first("XYID")
+        return (float(values[1]), float(values[2])) if values and len(values) > 2 else None
+
+    @property
+    def water_level(self) -> Optional[float]:
+        """Phreatic level [m] (#MEASUREMENTVAR 14), if present"""
+        for values in self.raw.get("MEASUREMENTVAR", []):
+            if int(values[0]) == WATER_LEVEL_VARIABLE:
+                return float(values[1])
+        return None
+
+
+@dataclass
+class StreamedGEF:
+    """Result of `read_gef`: the header and the data columns by name, with void values replaced by NaN."""
+
+    header: GEFHeader
+    columns: Dict[str, np.ndarray]
+
+    def to_measurement_data(self) -> MeasurementData:
+        """Returns the signals in the same units as a parsed GEFData object: elevation in [mm], qc in [MPa] and Rf
+        as a fraction."""
+        columns = dict(self.columns)
+        depth = columns.get("corrected_depth", columns.get("penetration_length"))
+        if depth is None:
+            raise ValueError("GEF file has no depth column")
+        columns["elevation"] = (self.header.ground_level - depth) * 1e3
+        if "Rf" in columns:
+            columns["Rf"] = columns["Rf"] * SIGNAL_SCALES["Rf"]
+        elif "fs" in columns and "qc" in columns:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                columns["Rf"] = np.where(columns["qc"] > 0, columns["fs"] / columns["qc"], np.nan)
+        return MeasurementData(columns)
+
+
+def parse_header_line(line: str) -> Optional[tuple]:
+    """Returns (keyword, values) of a header line like `#COLUMNINFO= 1, m, sondeerlengte, 1`, or None."""
+    line = line.strip()
+    if not line.startswith("#") or "=" not in line:
+        return None
+    keyword, _, values = line[1:].partition("=")
+    return keyword.strip().upper(), [value.strip() for value in values.split(",")]
+
+
+def read_header(lines: Iterator[str]) -> GEFHeader:
+    """Consumes lines up to and including #EOH and returns the header."""
+    header = GEFHeader()
+    for line in lines:
+        parsed = parse_header_line(line)
+        if parsed is None:
+            continue
+        keyword, values = parsed
+        if keyword == "EOH":
+            return header
+        header.raw.setdefault(keyword, []).append(values)
+    raise ValueError("GEF file has no end of header (#EOH)")
+
+
+def iter_data_chunks(
+    lines: Iterator[str], header: GEFHeader, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[np.ndarray]:
+    """Yields the data rows in 2-D arrays of at most `chunk_size` rows."""
+    number_of_columns = len(header.column_names)
+    column_separator, record_separator = header.column_separator, header.record_separator
+    chunk = []
+    for line in lines:
+        if record_separator:
+            line = line.replace(record_separator, " ")
+        if column_separator:
+            line = line.replace(column_separator, " ")
+        if line.strip():
+            chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield _parse_rows(chunk, number_of_columns)
+            chunk = []
+    if chunk:
+        yield _parse_rows(chunk, number_of_columns)
+
+
+def _parse_rows(rows: List[str], number_of_columns: int) -> np.ndarray:
+    values = np.array(" ".join(rows).split(), dtype=np.float64)
+    if values.size != len(rows) * number_of_columns:
+        raise ValueError(f"GEF data rows should contain {number_of_columns} values each")
+    return values.reshape(len(rows), number_of_columns)
+
+
+def read_gef_lines(lines: Iterator[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> StreamedGEF:
+    """Reads a GEF file from an iterator over its lines."""
+    header = read_header(lines)
+    names = header.column_names
+    capacity = max(header.last_scan or chunk_size, 1)
+    data = np.empty((capacity, len(names)), dtype=np.float64)
+    number_of_rows = 0
+    for chunk in iter_data_chunks(lines, header, chunk_size):
+        if number_of_rows + len(chunk) > capacity:  # LASTSCAN missing or incorrect
+            capacity = max(2 * capacity, number_of_rows + len(chunk))
+            data = np.resize(data, (capacity, len(names)))
+        data[number_of_rows : number_of_rows + len(chunk)] = chunk
+        number_of_rows += len(chunk)
+    data = data[:number_of_rows]
+
+    for column, void in header.column_voids.items():
+        if column < len(names):
+            data[data[:, column] == void, column] = np.nan
+    return StreamedGEF(header=header, columns={name: data[:, i].copy() for i, name in enumerate(names)})
+
+
+@contextmanager
+def _open_lines(source: Union[File, str, Path, IO]) -> Iterator[Iterator[str]]:
+    if isinstance(source, File):
+        with source.open(encoding=GEF_ENCODING) as f:
+            yield iter(f)
+    elif isinstance(source, (str, Path)):
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield (line.decode(GEF_ENCODING) for line in iter(mapped.readline, b""))
+    else:
+        yield iter(source)
+
+
+def read_gef_header(source: Union[File, str, Path, IO]) -> GEFHeader:
+    """Reads the header of a GEF file, without reading its data block; see `read_gef` for the sources."""
+    with _open_lines(source) as lines:
+        return read_header(lines)
+
+
+def read_gef(source: Union[File, str, Path, IO], chunk_size: int = DEFAULT_CHUNK_SIZE) -> StreamedGEF:
+    """Reads a GEF file from a VIKTOR File, a path (memory-mapped) or an opened text stream.
+
+    :param source: GEF file to read
+    :param chunk_size: Number of data rows that are parsed at once
+    :return: StreamedGEF
+    """
+    with _open_lines(source) as lines:
+        return read_gef_lines(lines, chunk_size=chunk_size)
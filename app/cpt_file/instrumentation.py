@@ -0,0 +1,127 @@
+"""Opt-in timing and memory instrumentation of the stages of the controller methods and visualisation builders.
+
+Set the environment variable `CPT_INSTRUMENTATION=1` to enable it. Every `stage` then records its wall time, CPU time
+and the peak of the memory allocated by Python (with `tracemalloc`) within the stage, and logs it as a JSON record on
+the `app.cpt_file.instrumentation` logger. Stages can be nested; the record contains the path of the stage, e.g.
+`visualize_cpt/visualise_cpt/decode_measurement_data`. The measurements within a `record_stages` block are collected,
+e.g. to show them in a DataGroup. When disabled, a stage does nothing but check the environment variable.
+
+The "CPT interpretation" and "Pile Design" views show the stages of their request as "Stage timings" in their data.
+The other views (Plotly views without data and the map) and the buttons (classify, reclassify and filter, which set
+params) return results without a data panel, so their stages are only logged.
+
+Note that tracemalloc slows down allocations, so the wall and CPU times are somewhat higher when it is enabled.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator, List
+
+from viktor.views import DataGroup, DataItem
+
+logger = logging.getLogger(__name__)
+
+ENVIRONMENT_VARIABLE = "CPT_INSTRUMENTATION"
+
+_state = threading.local()
+
+
+@dataclass(frozen=True)
+class StageMeasurement:
+    """Wall time [s], CPU time [s] and peak allocated memory [bytes] of a stage"""
+
+    stage: str
+    wall_time: float
+    cpu_time: float
+    peak_memory: int
+
+
+@dataclass
+class _Frame:
+    path: str
+    start_memory: int
+    peak_memory: int = 0  # the absolute traced peak within the stage, including nested stages
+
+
+def is_enabled() -> bool:
+    """Whether the instrumentation is enabled with the environment variable"""
+    return os.environ.get(ENVIRONMENT_VARIABLE, "").lower() in ("1", "true", "yes")
+
+
+def _get_stack() -> List[_Frame]:
+    if not hasattr(_state, "stack"):
+        _state.stack = []
+        _state.recordings = []
+    return _state.stack
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Measures the block as a stage with the given name, if the instrumentation is enabled."""
+    if not is_enabled():
+        yield
+        return
+
+    stack = _get_stack()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    current_memory, peak_memory = tracemalloc.get_traced_memory()
+    if stack:
+        # resetting the peak below would lose the peak of the enclosing stage so far
+        stack[-1].peak_memory = max(stack[-1].peak_memory, peak_memory)
+    tracemalloc.reset_peak()
+    frame = _Frame(path=f"{stack[-1].path}/{name}" if stack else name, start_memory=current_memory)
+    stack.append(frame)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall_time, cpu_time = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        stack.pop()
+        frame.peak_memory = max(frame.peak_memory, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1].peak_memory = max(stack[-1].peak_memory, frame.peak_memory)
+        elif started_tracing:
+            tracemalloc.stop()
+
+        measurement = StageMeasurement(
+            stage=frame.path,
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            peak_memory=max(frame.peak_memory - frame.start_memory, 0),
+        )
+        logger.info(json.dumps({"event": "stage", **asdict(measurement)}))
+        for recording in _state.recordings:
+            recording.append(measurement)
+
+
+@contextmanager
+def record_stages() -> Iterator[List[StageMeasurement]]:
+    """Collects the measurements of the stages that end within the block; the list stays empty when disabled."""
+    measurements: List[StageMeasurement] = []
+    _get_stack()
+    _state.recordings.append(measurements)
+    try:
+        yield measurements
+    finally:
+        _state.recordings.remove(measurements)
+
+
+def get_instrumentation_data_group(measurements: List[StageMeasurement]) -> DataGroup:
+    """Returns a DataGroup with the wall time per stage, and the CPU time and peak memory as subgroup."""
+    items = []
+    for measurement in measurements:
+        details = DataGroup(
+            DataItem("CPU time", measurement.cpu_time * 1e3, suffix="ms", number_of_decimals=1),
+            DataItem("Peak memory", measurement.peak_memory / 1024**2, suffix="MB", number_of_decimals=2),
+        )
+        items.append(
+            DataItem(measurement.stage, measurement.wall_time * 1e3, details, suffix="ms", number_of_decimals=1)
+        )
+    return DataGroup(*items)
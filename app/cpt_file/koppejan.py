@@ -0,0 +1,178 @@
+"""Base resistance with the Koppejan (4D/8D) method, for every candidate tip level in one pass.
+
+For a pile tip at sample t and a trajectory I that extends to depth x D below the tip (0.7 <= x <= 4):
+
+- qc,I is the mean qc from the tip to x D below it;
+- qc,II is the mean of the minimum path from x D below the tip back up to the tip, where every value is the minimum
+  of qc between that sample and the bottom of trajectory I;
+- qc,III is the mean of the minimum path from the tip up to 8D above it, which starts at the last value of qc,II.
+
+The base resistance is qb = alpha_p * 0.5 * ((qc,I + qc,II) / 2 + qc,III) for the x that gives the lowest qb, limited
+to 15 MPa.
+
+Evaluated directly, every tip level and x costs a pass over the trajectories. Here the sums of the minimum paths are
+computed from prefix sums instead: with T[k] the sum of min(qc[j..k]) over all j <= k (one monotonic stack pass), the
+sum of trajectory II between tip t and bottom e is qc[p] (p - t + 1) + T[e] - T[p], where p is the leftmost minimum in
+[t, e]. The minima come from a sparse table of range minima, so every x is one vectorized step over all tip levels.
+
+The steps run over the w samples between 0.7 D and 4 D below a tip, so the cost is O(n w) for n samples, in w
+vectorized steps. The bottoms cannot be limited to those where the minimum changes, as qc,I and qc,II change with every
+bottom. For 20000 samples at 0.02 m this takes about 0.1 s for D = 0.3 m (50 steps) and 0.5 s for D = 2 m (331 steps);
+the result is cached per CPT and diameter.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+MIN_TRAJECTORY_FACTOR = 0.7  # trajectory I extends at least 0.7 D below the tip
+MAX_TRAJECTORY_FACTOR = 4  # and at most 4 D
+UPPER_TRAJECTORY_FACTOR = 8  # trajectory III extends 8 D above the tip
+MAX_BASE_RESISTANCE = 15  # [MPa]
+
+# Pile class factor alpha_p per pile class of the pile step
+PILE_CLASS_FACTORS = {
+    "Bore": 0.5,
+    "CFA": 0.8,
+    "Screw": 0.9,
+    "Closed": 1.0,
+    "Open": 1.0,
+    "H": 1.0,
+    "sheet": 1.0,
+    "Micro": 0.5,
+}
+
+
+class RangeMinimum:
+    """Sparse table for the position of the leftmost minimum of any range in O(1), vectorized over ranges.
+
+    Row k of the table holds the position of the minimum of values[i..i + 2^k - 1] for every start i.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        n = values.size
+        number_of_levels = max(int(np.log2(n)) + 1, 1) if n else 1
+        self.table = np.zeros((number_of_levels, n), dtype=np.intp)
+        self.table[0] = np.arange(n)
+        for k in range(1, number_of_levels):
+            width = 2 ** (k - 1)
+            left, right = self.table[k - 1, : n - 2 * width + 1], self.table[k - 1, width : n - width + 1]
+            self.table[k, : left.size] = np.where(values[left] <= values[right], left, right)
+
+    def argmin(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Positions of the leftmost minimum in values[start..end] (inclusive), requires start <= end."""
+        level = np.log2(end - start + 1).astype(np.intp)
+        left = self.table[level, start]
+        right = self.table[level, end - (1 << level) + 1]
+        return np.where(self.values[left] <= self.values[right], left, right)
+
+
+def get_previous_smaller_or_equal(values: np.ndarray, range_minimum: Optional[RangeMinimum] = None) -> np.ndarray:
+    """Index of the nearest previous value that is smaller than or equal to each value, -1 if there is none.
+
+    For all values at once, the run of larger values before each value is extended by halving powers of two, as long
+    as the minimum of the extension (from the sparse table) is larger than the value.
+
+    :param range_minimum: Sparse table of `values`, which is created if not given
+    """
+    range_minimum = range_minimum or RangeMinimum(values)
+    index = np.arange(values.size)
+    start = index.copy()  # start of the run of larger values before every value
+    for level in range(range_minimum.table.shape[0] - 1, -1, -1):
+        width = 1 << level
+        can_extend = start >= width
+        candidate = np.where(can_extend, start - width, 0)
+        can_extend &= values[range_minimum.table[level, candidate]] > values
+        start = np.where(can_extend, candidate, start)
+    return start - 1
+
+
+def get_prefix_minimum_sums(values: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """T[k] = sum of min(values[j..k]) over j = 0..k, with T[-1] = 0 stored at the end of the array.
+
+    T[k] = T[previous[k]] + values[k] (k - previous[k]), so T[k] is the sum of values[i] (i - previous[i]) along the
+    chain k, previous[k], ... The chains are summed for all k at once by pointer jumping, in O(log n) steps.
+
+    :param previous: Previous smaller or equal value of every value, see `get_previous_smaller_or_equal`
+    """
+    n = values.size
+    index = np.arange(n)
+    # the sentinel n (T[-1]) has a zero sum and points to itself
+    sums = np.append(values * (index - previous), 0.0)
+    pointer = np.append(np.where(previous >= 0, previous, n), n)
+    while (pointer[:n] != n).any():
+        sums += sums[pointer]
+        pointer = pointer[pointer]
+    return sums
+
+
+def _minimum_path_sums(
+    qc: np.ndarray, minimum_sums: np.ndarray, start: np.ndarray, end: np.ndarray, minimum: np.ndarray
+) -> np.ndarray:
+    """Sum of min(qc[j..end]) over j = start..end, with `minimum` the position of the minimum in qc[start..end]."""
+    return qc[minimum] * (minimum - start + 1) + minimum_sums[end] - minimum_sums[minimum]
+
+
+def calculate_koppejan_base_resistance(
+    qc: Sequence[float], elevation: Sequence[float], diameter: float, pile_class_factor: float = 1.0
+) -> np.ndarray:
+    """Returns the unit base resistance [MPa] with the Koppejan method for every sample as tip level.
+
+    NaN for tip levels less than 0.7 D above the bottom of the CPT. Near the bottom, trajectory I is limited to the
+    available samples, and near the top trajectory III is.
+
+    :param qc: Cone resistance in [MPa]
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :param diameter: Equivalent pile diameter in [m]
+    :param pile_class_factor: alpha_p, see `PILE_CLASS_FACTORS`
+    """
+    qc = np.nan_to_num(np.asarray(qc, dtype=np.float64))
+    depth = -np.asarray(elevation, dtype=np.float64)
+    n = qc.size
+    base_resistance = np.full(n, np.nan)
+    if n == 0:
+        return base_resistance
+
+    range_minimum = RangeMinimum(qc)
+    previous = get_previous_smaller_or_equal(qc, range_minimum)
+    minimum_sums = get_prefix_minimum_sums(qc, previous)
+    cumulative = np.concatenate(([0.0], np.cumsum(qc)))
+
+    tip = np.arange(n)
+    first_bottom = np.searchsorted(depth, depth + MIN_TRAJECTORY_FACTOR * diameter, side="left")
+    valid = first_bottom < n
+    tip, first_bottom = tip[valid], first_bottom[valid]
+    last_bottom = np.maximum(
+        np.searchsorted(depth, depth[tip] + MAX_TRAJECTORY_FACTOR * diameter, side="right") - 1, first_bottom
+    )
+    top = np.searchsorted(depth, depth[tip] - UPPER_TRAJECTORY_FACTOR * diameter, side="left")
+
+    lowest = np.full(tip.size, np.inf)
+    minimum = range_minimum.argmin(tip, first_bottom)
+    for offset in range(int((last_bottom - first_bottom).max(initial=0)) + 1):
+        bottom = np.minimum(first_bottom + offset, last_bottom)
+        length = bottom - tip + 1
+
+        # trajectory I and II, between the tip and the bottom; the leftmost minimum only moves to a smaller new bottom
+        minimum = np.where(qc[bottom] < qc[minimum], bottom, minimum)
+        mean_i = (cumulative[bottom + 1] - cumulative[tip]) / length
+        mean_ii = _minimum_path_sums(qc, minimum_sums, tip, bottom, minimum) / length
+
+        # trajectory III follows min(qc[minimum], min(qc[j..tip])) upwards. As the minimum is the leftmost, the values
+        # between the tip and the minimum are larger, so the last value <= qc[minimum] above the tip is at `previous`
+        last_value = qc[minimum]
+        below_cap = np.where(minimum == tip, tip, previous[minimum])
+        has_path = below_cap >= top
+        path_end = np.where(has_path, below_cap, top)
+        path_minimum = range_minimum.argmin(top, path_end)
+        sum_iii = np.where(
+            has_path,
+            last_value * (tip - path_end) + _minimum_path_sums(qc, minimum_sums, top, path_end, path_minimum),
+            last_value * (tip - top + 1),
+        )
+        mean_iii = sum_iii / (tip - top + 1)
+
+        lowest = np.minimum(lowest, 0.5 * ((mean_i + mean_ii) / 2 + mean_iii))
+
+    base_resistance[tip] = np.minimum(pile_class_factor * lowest, MAX_BASE_RESISTANCE)
+    return base_resistance
@@ -0,0 +1,183 @@
+"""Statistics of the measurements per layer of a soil layout: mean, lower percentile, minimum and maximum.
+
+Every sample is assigned to its layer with one `searchsorted` over the tops of the layers. As the samples are ordered
+from top to bottom, the samples of each layer are contiguous, so the sums, minima and maxima of all layers follow from
+segmented reductions (`np.add.reduceat`, `np.fmin.reduceat` and `np.fmax.reduceat`) over the samples. For the
+percentile, the samples are sorted within their layer by one `np.lexsort` on (value, layer), after which the
+percentile of every layer is interpolated at its position in the sorted segment.
+
+A layer holds the samples from its top down to, but not including, its bottom; the lowest layer includes its bottom.
+"""
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from viktor.views import DataGroup, DataItem
+
+from .constants import ADDITIONAL_COLUMNS
+
+# Unit, scale factor and number of decimals of the signals for display, e.g. Rf is stored as a fraction and shown in %
+SIGNAL_UNITS = {"qc": ("MPa", 1, 2), "Rf": ("%", 100, 2), "fs": ("MPa", 1, 3)}
+STATISTIC_SIGNALS = ["qc", "Rf"] + [column for column in ADDITIONAL_COLUMNS if column in SIGNAL_UNITS]
+
+LOWER_PERCENTILE = 5  # [%], lower value of a signal within a layer, as for characteristic values
+MAX_DATA_GROUP_ITEMS = 100  # maximum number of DataItems in a DataGroup of VIKTOR
+
+
+@dataclass(frozen=True)
+class LayerStatistics:
+    """Statistics per layer of each signal, as arrays with one value per layer (NaN for layers without samples)"""
+
+    tops: np.ndarray  # [m]
+    bottoms: np.ndarray  # [m]
+    names: Tuple[str, ...]
+    count: np.ndarray  # number of samples per layer
+    mean: Dict[str, np.ndarray]
+    percentile: Dict[str, np.ndarray]  # LOWER_PERCENTILE
+    minimum: Dict[str, np.ndarray]
+    maximum: Dict[str, np.ndarray]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.tops, self.bottoms, self.count]
+        for statistic in (self.mean, self.percentile, self.minimum, self.maximum):
+            arrays.extend(statistic.values())
+        return sum(array.nbytes for array in arrays)
+
+    def __len__(self) -> int:
+        return self.tops.size
+
+    def get_hover_text(self, layer: int) -> str:
+        """Returns the statistics of a layer as lines of hover text"""
+        lines = [f"Samples: {self.count[layer]}"]
+        if self.count[layer] == 0:
+            return lines[0]
+        for signal in self.mean:
+            unit, scale, decimals = SIGNAL_UNITS[signal]
+            lines.append(
+                f"{signal} [{unit}]: mean {self.mean[signal][layer] * scale:.{decimals}f}, "
+                f"P{LOWER_PERCENTILE} {self.percentile[signal][layer] * scale:.{decimals}f}, "
+                f"min {self.minimum[signal][layer] * scale:.{decimals}f}, "
+                f"max {self.maximum[signal][layer] * scale:.{decimals}f}"
+            )
+        return "<br>".join(lines)
+
+
+def _reduce_segments(ufunc: np.ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Reduces the values of every segment [start, end) with the ufunc; the result of an empty segment is undefined.
+
+    `reduceat` reduces from each index up to the next index, so the starts and ends are interleaved and only the
+    results of the starts are kept. A padding value makes the end of the last segment a valid index.
+    """
+    padded = np.append(values, values[:1])
+    return ufunc.reduceat(padded, np.column_stack((starts, ends)).ravel())[::2]
+
+
+def calculate_layer_statistics(
+    elevation: np.ndarray,
+    signals: Mapping[str, np.ndarray],
+    tops: Sequence[float],
+    bottoms: Sequence[float],
+    names: Sequence[str],
+    percentile: float = LOWER_PERCENTILE,
+) -> LayerStatistics:
+    """Calculates the statistics of the signals per layer in one pass over the samples.
+
+    :param elevation: Elevation of the samples in [m], from top to bottom
+    :param signals: Values of each signal per sample; NaN values are left out
+    :param tops: Top of each layer in [m], from top to bottom
+    :param bottoms: Bottom of each layer in [m]
+    :param names: Soil name of each layer
+    :param percentile: Percentile [%] of the signals per layer
+    """
+    elevation = np.asarray(elevation, dtype=np.float64)
+    tops, bottoms = np.asarray(tops, dtype=np.float64), np.asarray(bottoms, dtype=np.float64)
+    number_of_layers = tops.size
+    statistics = dict(mean={}, percentile={}, minimum={}, maximum={})
+    if number_of_layers == 0 or elevation.size == 0:
+        empty = np.full(number_of_layers, np.nan)
+        for statistic in statistics.values():
+            statistic.update({name: empty.copy() for name in signals})
+        return LayerStatistics(tops, bottoms, tuple(names), np.zeros(number_of_layers, dtype=np.int64), **statistics)
+    if np.any(np.diff(elevation) > 0):
+        order = np.argsort(-elevation, kind="stable")
+        elevation, signals = elevation[order], {name: np.asarray(values)[order] for name, values in signals.items()}
+
+    # the layer of every sample is the lowest layer with its top at or above the sample, which is non-decreasing
+    sample_layers = np.searchsorted(-tops, -elevation, side="right") - 1
+    above_bottom = elevation > bottoms[np.clip(sample_layers, 0, None)]
+    at_bottom_of_layout = (sample_layers == number_of_layers - 1) & (elevation == bottoms[-1])
+    within_layer = (sample_layers >= 0) & (above_bottom | at_bottom_of_layout)
+    layer_numbers = np.arange(number_of_layers)
+    starts = np.searchsorted(sample_layers, layer_numbers, side="left")
+    ends = np.searchsorted(sample_layers, layer_numbers, side="right")
+
+    count = np.zeros(number_of_layers, dtype=np.int64)
+    last_sample = elevation.size - 1
+    for name, values in signals.items():
+        values = np.asarray(values, dtype=np.float64)
+        valid = within_layer & np.isfinite(values)
+        valid_count = np.where(ends > starts, _reduce_segments(np.add, valid.astype(np.int64), starts, ends), 0)
+        count = np.maximum(count, valid_count)
+        empty = valid_count == 0
+        masked = np.where(valid, values, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total = _reduce_segments(np.add, np.where(valid, values, 0.0), starts, ends)
+            statistics["mean"][name] = np.where(empty, np.nan, total / valid_count)
+        statistics["minimum"][name] = np.where(empty, np.nan, _reduce_segments(np.fmin, masked, starts, ends))
+        statistics["maximum"][name] = np.where(empty, np.nan, _reduce_segments(np.fmax, masked, starts, ends))
+
+        # invalid samples are sorted to the end of their layer, so the valid samples are the first of each segment
+        sorted_values = values[np.lexsort((np.where(valid, values, np.inf), sample_layers))]
+        position = starts + percentile / 100 * np.maximum(valid_count - 1, 0)
+        lower = np.clip(np.floor(position).astype(np.int64), 0, last_sample)
+        upper = np.clip(np.ceil(position).astype(np.int64), 0, last_sample)
+        with np.errstate(invalid="ignore"):
+            interpolated = sorted_values[lower] + (position - lower) * (sorted_values[upper] - sorted_values[lower])
+        statistics["percentile"][name] = np.where(empty, np.nan, interpolated)
+
+    return LayerStatistics(tops, bottoms, tuple(names), count, **statistics)
+
+
+def _get_value(value: float, scale: float = 1) -> Optional[float]:
+    return None if np.isnan(value) else float(value * scale)
+
+
+def get_layer_statistics_data_group(statistics: LayerStatistics) -> DataGroup:
+    """Returns a DataGroup with the mean qc of every layer, and the statistics of each signal as subgroup."""
+    items = []
+    for layer in range(len(statistics)):
+        details = []
+        for signal in statistics.mean:
+            unit, scale, decimals = SIGNAL_UNITS[signal]
+            for label, values in (
+                ("mean", statistics.mean),
+                (f"P{LOWER_PERCENTILE}", statistics.percentile),
+                ("min", statistics.minimum),
+                ("max", statistics.maximum),
+            ):
+                details.append(
+                    DataItem(
+                        f"{signal} {label}",
+                        _get_value(values[signal][layer], scale),
+                        suffix=unit,
+                        number_of_decimals=decimals,
+                    )
+                )
+        details.append(DataItem("Samples", int(statistics.count[layer])))
+        mean_qc = statistics.mean["qc"][layer] if "qc" in statistics.mean else np.nan
+        items.append(
+            DataItem(
+                f"{statistics.tops[layer]:.2f} to {statistics.bottoms[layer]:.2f} m: {statistics.names[layer]}",
+                _get_value(mean_qc),
+                DataGroup(*details),
+                prefix="qc",
+                suffix="MPa",
+                number_of_decimals=2,
+            )
+        )
+    if len(items) > MAX_DATA_GROUP_ITEMS:
+        hidden = len(items) - MAX_DATA_GROUP_ITEMS + 1
+        items = items[: MAX_DATA_GROUP_ITEMS - 1]
+        items.append(DataItem(f"{hidden} more layers", "filter the soil layout to show all layers"))
+    return DataGroup(*items)
@@ -0,0 +1,268 @@
+"""Pile resistances with the CPT method of NF P94-262 (LCPC / French method).
+
+The unit shaft resistance follows from qs = min(alpha * f_sol(qc), qs_max), where f_sol = (a qc + b)(1 - exp(-c qc))
+is the curve of the soil group, and alpha and qs_max depend on the pile category and the soil group. The unit base
+resistance is qb = kc * qce, where kc depends on the pile class and the soil group at the tip, and qce is the mean qc
+from a above to 3a below the tip, with a = max(D / 2, 0.5 m), after limiting qc to 1.3 times the mean qc of that
+window, so that a peak in the window (such as a gravel lens) does not raise qce.
+
+The coefficients are compiled into arrays indexed by [category or class, soil group]. The soil group and f_sol of
+every sample only depend on the CPT and its soil layout (`LCPCSoilProfile`), so the resistances of another pile class
+or category are a lookup into these arrays.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Sequence
+
+import numpy as np
+from munch import Munch
+from viktor import UserError
+from viktor.geo import SoilLayout
+
+from .pile_capacity import get_window_bounds, window_average
+
+CLAY_SILT, INTERMEDIATE, SAND_GRAVEL, PEAT = range(4)
+SOIL_GROUP_NAMES = ["Clay and silt", "Intermediate soil", "Sand and gravel", "Peat"]
+
+# Field of the pile step with the category of each pile class
+PILE_CATEGORY_FIELDS = {
+    "Bore": "bore_category",
+    "CFA": "CFA_category",
+    "Screw": "Screw_category",
+    "Closed": "Closed",
+    "Open": "Open",
+    "H": "H",
+    "sheet": "Sheet",
+    "Micro": "Micro",
+}
+
+# Pile category (1 to 20) of every (pile class, category) of the pile step
+PILE_CATEGORIES = {
+    ("Bore", "No support"): 1,
+    ("Bore", "With Slurry"): 2,
+    ("Bore", "Permanent casing"): 3,
+    ("Bore", "Recoverable casing"): 4,
+    ("Bore", "Dry bored pile or slurry"): 5,
+    ("Bore", "With grooved sockets"): 5,
+    ("CFA", "CFA piles"): 6,
+    ("Screw", "cast-in"): 7,
+    ("Screw", "casing"): 8,
+    ("Closed", "pre"): 9,
+    ("Closed", "coated"): 10,
+    ("Closed", "cast-in-place"): 11,
+    ("Closed", "steel"): 12,
+    ("Open", "steel"): 13,
+    ("H", "driven"): 14,
+    ("H", "grouted"): 15,
+    ("sheet", "sheet"): 16,
+    ("Micro", "gravity"): 17,
+    ("Micro", "low"): 18,
+    ("Micro", "high"): 19,
+    ("Micro", "TAM"): 20,
+}
+
+# Pile class (1 to 8) per pile category, index 0 is unused
+PILE_CLASS_OF_CATEGORY = np.array([0, 1, 1, 1, 1, 1, 2, 3, 3, 4, 4, 4, 4, 5, 6, 6, 7, 8, 8, 8, 8])
+
+# Coefficients a, b and c of the f_sol curve per soil group; peat uses the curve of clay, but has alpha = 0
+F_SOL_COEFFICIENTS = np.array(
+    [
+        [0.0018, 0.1, 0.4],
+        [0.0015, 0.1, 0.25],
+        [0.0012, 0.1, 0.15],
+        [0.0018, 0.1, 0.4],
+    ]
+)
+
+
+def _with_peat(table: list, peat_value: float = 0.0) -> np.ndarray:
+    """Adds index 0 (unused) and a column for peat to a table of rows with values for clay, intermediate and sand."""
+    rows = np.array([[np.nan] * 3] + table, dtype=np.float64)
+    return np.column_stack((rows, np.full(len(rows), peat_value)))
+
+
+# Shaft friction coefficient alpha per pile category; micropiles I and II use the values of category 1
+ALPHA = _with_peat(
+    [
+        [0.55, 0.65, 0.70],
+        [0.65, 0.80, 1.00],
+        [0.35, 0.40, 0.40],
+        [0.65, 0.80, 1.00],
+        [0.70, 0.85, 0.85],
+        [0.75, 0.90, 1.25],
+        [0.95, 1.15, 1.45],
+        [0.30, 0.35, 0.40],
+        [0.55, 0.65, 1.00],
+        [1.00, 1.20, 1.45],
+        [0.60, 0.70, 1.00],
+        [0.40, 0.50, 0.85],
+        [0.60, 0.70, 1.00],
+        [0.55, 0.65, 1.20],
+        [1.35, 1.60, 2.00],
+        [0.45, 0.55, 1.00],
+        [0.55, 0.65, 0.70],
+        [0.55, 0.65, 0.70],
+        [1.35, 1.60, 2.00],
+        [1.70, 2.05, 2.65],
+    ]
+)
+
+# Maximum unit shaft resistance qs_max [MPa] per pile category
+QS_MAX = (
+    _with_peat(
+        [
+            [90, 90, 90],
+            [90, 90, 170],
+            [50, 50, 90],
+            [90, 90, 170],
+            [90, 90, 90],
+            [170, 170, 200],
+            [200, 200, 200],
+            [90, 90, 90],
+            [130, 130, 200],
+            [170, 170, 260],
+            [90, 90, 130],
+            [90, 90, 90],
+            [90, 90, 50],
+            [90, 90, 130],
+            [200, 200, 380],
+            [90, 90, 50],
+            [200, 200, 200],
+            [200, 200, 200],
+            [200, 200, 380],
+            [200, 200, 440],
+        ]
+    )
+    / 1e3
+)
+
+# Base bearing factor kc per pile class; the base in peat uses the value of clay
+KC = _with_peat(
+    [
+        [0.40, 0.30, 0.20],
+        [0.45, 0.30, 0.25],
+        [0.50, 0.50, 0.50],
+        [0.45, 0.40, 0.40],
+        [0.35, 0.30, 0.25],
+        [0.40, 0.40, 0.40],
+        [0.35, 0.25, 0.15],
+        [0.45, 0.30, 0.20],
+    ]
+)
+KC[:, PEAT] = KC[:, CLAY_SILT]
+
+MIN_BASE_WINDOW = 0.5  # [m], minimum of a in the qce window
+PEAK_CLIPPING_FACTOR = 1.3  # qc is limited to this factor times the mean qc of the qce window
+MAX_WINDOW_ELEMENTS = 2**20  # number of (sample, window sample) pairs per chunk of `clipped_window_average`
+
+
+def clipped_window_average(
+    values: np.ndarray, elevation: np.ndarray, above: float, below: float, factor: float = PEAK_CLIPPING_FACTOR
+) -> np.ndarray:
+    """Mean of the values in the window of every sample (see `window_average`), after limiting the values to `factor`
+    times the mean of that window.
+
+    The limit differs per window, so the clipped values of all windows of a chunk of samples are gathered into a
+    (samples x window length) array, of at most MAX_WINDOW_ELEMENTS elements.
+
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    """
+    values = np.asarray(values, dtype=np.float64)
+    limit = factor * window_average(values, elevation, above, below)
+    start, end = get_window_bounds(elevation, above, below)
+    offsets = np.arange(int(np.max(end - start, initial=0)))
+    chunk_size = max(MAX_WINDOW_ELEMENTS // max(offsets.size, 1), 1)
+    clipped_sum = np.empty(values.size)
+    for first in range(0, values.size, chunk_size):
+        chunk = slice(first, first + chunk_size)
+        indices = start[chunk, np.newaxis] + offsets
+        window_values = np.minimum(values[np.minimum(indices, values.size - 1)], limit[chunk, np.newaxis])
+        clipped_sum[chunk] = np.sum(window_values, axis=1, where=indices < end[chunk, np.newaxis])
+    return clipped_sum / (end - start)
+
+
+@lru_cache(maxsize=None)
+def get_soil_group(soil_name: str) -> int:
+    """Returns the soil group of a soil name of the classification tables (e.g. 'Sand, very silty')"""
+    name = soil_name.lower()
+    if name.startswith("peat"):
+        return PEAT
+    if name.startswith("gravel"):
+        return SAND_GRAVEL
+    if name.startswith("sand"):
+        return INTERMEDIATE if any(word in name for word in ("very silty", "loamy", "clayey")) else SAND_GRAVEL
+    if name.startswith("loam") or "very sandy" in name:
+        return INTERMEDIATE
+    if name.startswith(("clay", "soil")):
+        return CLAY_SILT
+    return INTERMEDIATE
+
+
+def get_pile_category(PILE_params: Munch) -> int:
+    """Returns the pile category (1 to 20) of the selected pile class and category"""
+    pile_class = PILE_params["method"]
+    category = PILE_params.get(PILE_CATEGORY_FIELDS.get(pile_class, ""))
+    try:
+        return PILE_CATEGORIES[(pile_class, category)]
+    except KeyError:
+        raise UserError(f"Select a pile category for the pile class '{pile_class}'")
+
+
+def get_sample_soil_groups(elevation: np.ndarray, soil_layout: SoilLayout) -> np.ndarray:
+    """Returns the soil group of the layer of every sample; samples outside the layout get the nearest layer.
+
+    :param elevation: Elevation of each sample in [m]
+    :param soil_layout: SoilLayout in [mm]
+    """
+    layers = soil_layout.layers
+    if not layers:
+        return np.full(elevation.shape, INTERMEDIATE, dtype=np.intp)
+    tops = np.array([layer.top_of_layer / 1e3 for layer in layers])
+    groups = np.array([get_soil_group(layer.soil.properties.get("ui_name") or layer.soil.name) for layer in layers])
+    layer_index = np.clip(np.searchsorted(-tops, -elevation, side="right") - 1, 0, len(layers) - 1)
+    return groups[layer_index]
+
+
+@dataclass(frozen=True)
+class LCPCSoilProfile:
+    """Soil group and f_sol per CPT sample, which are shared by all pile classes and diameters."""
+
+    elevation: np.ndarray  # [m]
+    qc: np.ndarray  # [MPa]
+    soil_group: np.ndarray
+    f_sol: np.ndarray  # [MPa]
+
+    @classmethod
+    def from_cpt(cls, qc: Sequence[float], elevation: Sequence[float], soil_layout: SoilLayout) -> "LCPCSoilProfile":
+        """Samples without qc or elevation are left out.
+
+        :param qc: Cone resistance in [MPa]
+        :param elevation: Elevation of each sample in [m], ordered from top to bottom
+        :param soil_layout: Interpreted SoilLayout in [mm]
+        """
+        qc, elevation = np.asarray(qc, dtype=np.float64), np.asarray(elevation, dtype=np.float64)
+        valid = np.isfinite(qc) & np.isfinite(elevation)
+        if not valid.all():
+            qc, elevation = qc[valid], elevation[valid]
+        soil_group = get_sample_soil_groups(elevation, soil_layout)
+        a, b, c = F_SOL_COEFFICIENTS[soil_group].T
+        f_sol = (a * qc + b) * (1 - np.exp(-c * qc))
+        return cls(elevation=elevation, qc=qc, soil_group=soil_group, f_sol=f_sol)
+
+    @property
+    def nbytes(self) -> int:
+        return self.elevation.nbytes + self.qc.nbytes + self.soil_group.nbytes + self.f_sol.nbytes
+
+    def unit_shaft_resistance(self, category: int) -> np.ndarray:
+        """Unit shaft resistance qs [MPa] per sample for a pile category"""
+        return np.minimum(ALPHA[category, self.soil_group] * self.f_sol, QS_MAX[category, self.soil_group])
+
+    def equivalent_cone_resistance(self, diameter: float) -> np.ndarray:
+        """qce [MPa] per sample as tip level, the mean qc from a above to 3a below the tip with the peaks clipped"""
+        a = max(diameter / 2, MIN_BASE_WINDOW)
+        return clipped_window_average(self.qc, self.elevation, above=a, below=3 * a)
+
+    def unit_base_resistance(self, category: int, diameter: float) -> np.ndarray:
+        """Unit base resistance qb [MPa] per sample as tip level for a pile category and diameter [m]"""
+        kc = KC[PILE_CLASS_OF_CATEGORY[category], self.soil_group]
+        return kc * self.equivalent_cone_resistance(diameter)
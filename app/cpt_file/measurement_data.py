@@ -0,0 +1,170 @@
+"""Compact storage of the CPT measurement signals and an array-backed accessor for them.
+
+The measurement data is stored in the params (HiddenField `measurement_data`) and is sent along with every view
+call. Instead of a dict of float lists, every signal is stored as a packed float32 array that is (optionally) zlib
+compressed and base64 encoded. Missing values are stored as NaN.
+"""
+import base64
+import zlib
+from typing import Collection, Dict, Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+from munch import unmunchify
+
+from .constants import GEF_VOID_SIGNALS, GEF_VOID_VALUES
+
+STORAGE_FORMAT = "float32-base64"
+STORAGE_DTYPE = np.dtype("<f4")
+VOID_TOLERANCE = 1e-6  # relative, as a void value can be scaled to the unit of the signal (e.g. Rf in % to fraction)
+
+
+def encode_signal(values, compress: bool = True) -> str:
+    """Packs a sequence of floats (None is allowed) into a base64 string of little-endian float32 values."""
+    data = np.asarray(values, dtype=np.float64).astype(STORAGE_DTYPE).tobytes()
+    if compress:
+        data = zlib.compress(data)
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_signal(encoded: str, compressed: bool = True) -> np.ndarray:
+    """Inverse of `encode_signal`, returns a float64 array."""
+    data = base64.b64decode(encoded)
+    if compressed:
+        data = zlib.decompress(data)
+    return np.frombuffer(data, dtype=STORAGE_DTYPE).astype(np.float64)
+
+
+def encode_measurement_data(
+    measurement_data: Mapping[str, list], compress: bool = True, signal_voids: Optional[Mapping[str, float]] = None
+) -> dict:
+    """Converts the measurement data of a serialized GEFData object to the compact storage format.
+
+    :param measurement_data: Signals by name, as lists (None is allowed) or arrays of equal length
+    :param compress: Whether the signals are zlib compressed
+    :param signal_voids: Void value per signal, such as the #COLUMNVOID of the GEF file; stored as missing values
+    """
+    lengths = {len(values) for values in measurement_data.values()}
+    if len(lengths) > 1:
+        raise ValueError("All measurement signals should have the same length")
+    columns = {}
+    for name, values in measurement_data.items():
+        if signal_voids and name in signal_voids:
+            values = np.asarray(values, dtype=np.float64)
+            values = np.where(np.isclose(values, signal_voids[name], rtol=VOID_TOLERANCE, atol=0), np.nan, values)
+        columns[name] = encode_signal(values, compress=compress)
+    return {
+        "format": STORAGE_FORMAT,
+        "compressed": compress,
+        "length": lengths.pop() if lengths else 0,
+        "columns": columns,
+    }
+
+
+def get_valid_rows_mask(
+    columns: Mapping[str, Sequence],
+    void_values: Sequence[float] = GEF_VOID_VALUES,
+    void_signals: Optional[Collection[str]] = GEF_VOID_SIGNALS,
+) -> np.ndarray:
+    """Returns a boolean mask that is True for every row without missing values in any of the signals.
+
+    A value is missing if it is None, NaN or infinite, or if it equals one of `void_values` in one of the
+    `void_signals` (all signals if None).
+
+    :param columns: Signals by name, as lists (None is allowed) or arrays of equal length
+    :param void_values: Placeholder values for missing measurements, such as the GEF column voids
+    :param void_signals: Names of the signals in which `void_values` are regarded as missing
+    """
+    valid = None
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)
+        column_valid = np.isfinite(values)
+        if void_values and (void_signals is None or name in void_signals):
+            column_valid &= ~np.isin(values, void_values)
+        valid = column_valid if valid is None else valid & column_valid
+    return np.ones(0, dtype=bool) if valid is None else valid
+
+
+def is_encoded(measurement_data: Optional[Mapping]) -> bool:
+    """Returns True if the measurement data is stored in the compact storage format."""
+    return bool(measurement_data) and measurement_data.get("format") == STORAGE_FORMAT
+
+
+class MeasurementData:
+    """Array-backed access to the measurement signals of a CPT (elevation, qc, Rf and the additional columns).
+
+    Signals are available as attribute (`data.qc`) or item (`data["qc"]`) and are float64 NumPy arrays, ordered
+    from top to bottom. Missing values are NaN.
+    """
+
+    def __init__(self, columns: Mapping[str, np.ndarray]):
+        self._columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+
+    @classmethod
+    def from_stored(cls, measurement_data: Mapping) -> "MeasurementData":
+        """Creates the accessor from the stored measurement data, in compact or in (legacy) list format."""
+        measurement_data = unmunchify(measurement_data)
+        if is_encoded(measurement_data):
+            compressed = measurement_data.get("compressed", True)
+            return cls(
+                {name: decode_signal(values, compressed) for name, values in measurement_data["columns"].items()}
+            )
+        # None values are converted to NaN by NumPy
+        return cls({name: np.array(values, dtype=np.float64) for name, values in measurement_data.items()})
+
+    @classmethod
+    def from_params(cls, params: Mapping) -> "MeasurementData":
+        """Creates the accessor from the `measurement_data` stored in the params."""
+        return cls.from_stored(params["measurement_data"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__["_columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return next(iter(self._columns.values())).size if self._columns else 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the signals in bytes"""
+        return sum(values.nbytes for values in self._columns.values())
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Returns the signals by name"""
+        return dict(self._columns)
+
+    def drop_incomplete_rows(
+        self, void_values: Sequence[float] = GEF_VOID_VALUES, void_signals: Optional[Collection[str]] = GEF_VOID_SIGNALS
+    ) -> "MeasurementData":
+        """Returns a new MeasurementData without the rows that have a missing value in one or more signals.
+
+        See `get_valid_rows_mask` for the definition of a missing value.
+        """
+        if not self._columns:
+            return self
+        valid = get_valid_rows_mask(self._columns, void_values=void_values, void_signals=void_signals)
+        if valid.all():
+            return self
+        return MeasurementData({name: values[valid] for name, values in self._columns.items()})
+
+    def to_dict(self) -> Dict[str, list]:
+        """Returns the signals as lists of floats (None for missing values), as in a serialized GEFData object."""
+        return {
+            name: [None if np.isnan(value) else value for value in values.tolist()]
+            for name, values in self._columns.items()
+        }
+
+    def encode(self, compress: bool = True) -> dict:
+        """Returns the signals in the compact storage format"""
+        return encode_measurement_data(self._columns, compress=compress)
@@ -43,6 +43,10 @@ from .constants import (
     DEFAULT_ROBERTSON_TABLE,
     DEFAULT_SOIL_NAMES,
     MAX_CONE_RESISTANCE_TYPE,
+    MIN_LAYER_THICKNESS_LADDER,
+    PILE_DIAMETER_RANGE,
+    PILE_LENGTH_RANGE,
+    Pile_Base_Method,
     Pile_Class,
     Pile_Bore_Category,
     Pile_CFA_Category,
@@ -155,6 +159,12 @@ Classify the uploaded GEF file by clicking the "Classify soil layout" button. Pr
         """
     )
     classification.classify_soil_layout_button = SetParamsButton("Classify soil layout", "classify_soil_layout")
+    classification.reclassify_soil_layout_button = SetParamsButton(
+        "Reclassify soil layout",
+        "reclassify_soil_layout",
+        description="Classify the measurements of the already classified CPT again with the current table, "
+        "without parsing the GEF file again.",
+    )
 
     cpt = Step("CPT interpretation", views=["visualize_cpt", "visualize_map"])
     cpt.text = Text(
@@ -171,8 +181,8 @@ Classify the uploaded GEF file by clicking the "Classify soil layout" button. Pr
     cpt.min_layer_thickness = NumberField(
         "Minimum Layer Thickness",
         suffix="mm",
-        min=0,
-        step=50,
+        min=MIN_LAYER_THICKNESS_LADDER[0],
+        step=MIN_LAYER_THICKNESS_LADDER[2],
         default=DEFAULT_MIN_LAYER_THICKNESS,
         flex=40,
     )
@@ -184,6 +194,13 @@ Classify the uploaded GEF file by clicking the "Classify soil layout" button. Pr
         description="Reset the table to the original soil layout",
     )
 
+    cpt.site = TextField(
+        "Site",
+        flex=100,
+        description="Show the CPTs of this site of the site database on the map. The site database is set with the "
+        "environment variable CPT_SITE_DATABASE.",
+    )
+
     cpt.ground_water_level = NumberField("Phreatic level", name="ground_water_level", suffix="m NAP", flex=50)
     cpt.ground_level = NumberField("Ground level", name="ground_level", suffix="m NAP", flex=50)
     cpt.soil_layout = TableInput("Soil layout", name="soil_layout")
@@ -196,7 +213,7 @@ Classify the uploaded GEF file by clicking the "Classify soil layout" button. Pr
     cpt.measurement_data = HiddenField("GEF Measurement data", name="measurement_data")
     cpt.soil_layout_original = HiddenField("Soil layout original", name="soil_layout_original")
 
-    PILE = Step("Pile Capacity Design",views=["visualize_pile"])
+    PILE = Step("Pile Capacity Design", views=["visualize_pile", "visualize_pile_design_sweep"])
 
     PILE.text_02 = Text(
         """## Select your pile geometry
@@ -206,9 +223,9 @@ Classify the uploaded GEF file by clicking the "Classify soil layout" button. Pr
     PILE.Diameter = NumberField(
         "Pile Diameter (m)",
         default=1,
-        min=0.5,
-        step=0.5,
-        max=3,
+        min=PILE_DIAMETER_RANGE[0],
+        step=PILE_DIAMETER_RANGE[2],
+        max=PILE_DIAMETER_RANGE[1],
         # flex=33,
         variant='slider'
     )
@@ -216,15 +233,15 @@ Classify the uploaded GEF file by clicking the "Classify soil layout" button. Pr
     PILE.Length = NumberField(
         "Pile Length (m)",
         default=10,
-        min=3,
-        step=0.2,
-        max=50,
+        min=PILE_LENGTH_RANGE[0],
+        step=PILE_LENGTH_RANGE[2],
+        max=PILE_LENGTH_RANGE[1],
         # flex=33,
         variant='slider'
     )
 
     PILE.Load = NumberField(
-        "Pile Load Required (MPa)",
+        "Pile Load Required (MN)",
         default=30,
         min=10,
         step=2,
@@ -342,4 +359,78 @@ Select your preferred pile category based on the selected pile class
         visible=IsEqual(Lookup("PILE.method"), "Micro")
     )
 
+    PILE.text_03 = Text(
+        """## Select your base resistance method
+        """
+    )
+    PILE.base_method = OptionField(
+        "Base resistance method",
+        options=Pile_Base_Method,
+        default="lcpc",
+        autoselect_single_option=True,
+        variant="radio-inline",
+        description="NF P94-262: kc times the mean qc from a above to 3a below the tip. \n"
+        "\n Koppejan: minimum path over 0.7D to 4D below and 8D above the tip.",
+    )
 
+    tunnel = Step(
+        "Tunnel Settlement",
+        views=["visualize_tunnel_settlement", "visualize_longitudinal_settlement", "visualize_map"],
+    )
+    tunnel.text = Text(
+        """## Greenfield settlement above a bored tunnel
+
+The transverse settlement trough follows the Gaussian curve of Peck. The trough width parameter K is the mean of the
+K of the interpreted soil layers above the tunnel axis, weighted by their thickness.
+        """
+    )
+    tunnel.axis_level = NumberField("Tunnel axis level", suffix="m NAP", default=-20, flex=50)
+    tunnel.diameter = NumberField("Tunnel diameter", suffix="m", default=6, min=1, max=20, flex=50)
+    tunnel.volume_loss = NumberField(
+        "Volume loss", suffix="%", default=1, min=0.1, max=5, step=0.1, num_decimals=1, variant="slider"
+    )
+    tunnel.half_width = NumberField(
+        "Half width of the surface grid", suffix="m", default=60, min=5, flex=50
+    )
+    tunnel.grid_spacing = NumberField("Grid spacing", suffix="m", default=0.25, min=0.01, flex=50)
+    tunnel.text_advance = Text(
+        """## Advance of the tunnel face
+
+The longitudinal settlement follows the cumulative Gaussian curve behind the face, on a grid of chainages along the
+alignment and the offsets of the surface grid.
+        """
+    )
+    tunnel.tunnel_start = NumberField("Chainage of the tunnel start", suffix="m", default=0, flex=50)
+    tunnel.face_end = NumberField("Chainage of the last face position", suffix="m", default=100, flex=50)
+    tunnel.number_of_steps = NumberField(
+        "Number of face positions", default=20, min=1, max=200, step=1, num_decimals=0, flex=50
+    )
+    tunnel.chainage_margin = NumberField(
+        "Margin of the grid before and after the tunnel", suffix="m", default=50, min=0, flex=50
+    )
+    tunnel.chainage_spacing = NumberField("Chainage spacing", suffix="m", default=1, min=0.1, flex=50)
+    tunnel.text_buildings = Text(
+        """## Building damage screening
+
+The buildings are rectangles along the alignment, with their walls across the tunnel. Their damage category follows
+from the deflection ratio and horizontal strain in the settlement trough when the face is at its last position, and
+is shown on the map. The alignment starts at the CPT, unless the RD coordinates of chainage 0 are entered.
+        """
+    )
+    tunnel.origin_x = NumberField("RD x of chainage 0", suffix="m", flex=33)
+    tunnel.origin_y = NumberField("RD y of chainage 0", suffix="m", flex=33)
+    tunnel.bearing = NumberField("Bearing of the alignment", suffix="°", default=90, min=0, max=360, flex=33)
+    tunnel.buildings = TableInput(
+        "Buildings",
+        default=[
+            dict(name="A", chainage_start=20, chainage_end=35, offset_start=-25, offset_end=-8, height=10),
+            dict(name="B", chainage_start=40, chainage_end=60, offset_start=-6, offset_end=6, height=15),
+            dict(name="C", chainage_start=70, chainage_end=80, offset_start=10, offset_end=30, height=8),
+        ],
+    )
+    tunnel.buildings.name = TextField("Name")
+    tunnel.buildings.chainage_start = NumberField("Chainage from [m]", num_decimals=1)
+    tunnel.buildings.chainage_end = NumberField("Chainage to [m]", num_decimals=1)
+    tunnel.buildings.offset_start = NumberField("Offset from [m]", num_decimals=1)
+    tunnel.buildings.offset_end = NumberField("Offset to [m]", num_decimals=1)
+    tunnel.buildings.height = NumberField("Height [m]", num_decimals=1)
@@ -0,0 +1,202 @@
+"""Vectorized pile capacity calculations on CPT measurement arrays."""
+from dataclasses import dataclass
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class PileCapacity:
+    """Unit shaft, base and total resistance per CPT sample, ordered from top to bottom.
+
+    All arrays have the same length, so they can be plotted against `elevation` directly or exported as columns.
+    """
+
+    elevation: np.ndarray  # [m]
+    shaft: np.ndarray  # [MPa]
+    base: np.ndarray  # [MPa]
+    total: np.ndarray  # [MPa]
+
+    @property
+    def nbytes(self) -> int:
+        return self.elevation.nbytes + self.shaft.nbytes + self.base.nbytes + self.total.nbytes
+
+
+def get_window_bounds(elevation: np.ndarray, above: float, below: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the first sample and one past the last sample of the window from `above` [m] above to `below` [m]
+    below every sample.
+
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    """
+    depth = -np.asarray(elevation, dtype=np.float64)
+    start = np.searchsorted(depth, depth - above, side="left")
+    end = np.searchsorted(depth, depth + below, side="right")
+    return start, end
+
+
+def window_average(values: np.ndarray, elevation: np.ndarray, above: float, below: float) -> np.ndarray:
+    """Mean of the values from `above` [m] above to `below` [m] below every sample, with a cumulative sum.
+
+    Near the top and bottom of the sounding the window is truncated to the samples that are available.
+
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    """
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    start, end = get_window_bounds(elevation, above, below)
+    return (cumulative[end] - cumulative[start]) / (end - start)
+
+
+@dataclass(frozen=True)
+class PileDesignSweep:
+    """Bearing capacity of every combination of pile diameter and length.
+
+    The capacity arrays have shape (diameters, lengths); designs with a tip below the bottom of the CPT are NaN.
+    """
+
+    diameters: np.ndarray  # [m]
+    lengths: np.ndarray  # [m]
+    tip_elevation: np.ndarray  # [m], per length
+    shaft: np.ndarray  # [MN]
+    base: np.ndarray  # [MN]
+    total: np.ndarray  # [MN]
+
+    @property
+    def nbytes(self) -> int:
+        return self.shaft.nbytes + self.base.nbytes + self.total.nbytes
+
+    def meets(self, load: float) -> np.ndarray:
+        """Whether the capacity of each design is at least `load` [MN]"""
+        return np.nan_to_num(self.total, nan=-np.inf) >= load
+
+
+def get_cumulative_shaft_resistance(shaft: np.ndarray, elevation: np.ndarray) -> np.ndarray:
+    """Integral of the unit shaft resistance from the top of the CPT to every sample (trapezoidal prefix sum).
+
+    :param shaft: Unit shaft resistance in [MPa]
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :return: Shaft resistance per meter of pile circumference in [MN/m]
+    """
+    increments = (shaft[1:] + shaft[:-1]) / 2 * (elevation[:-1] - elevation[1:])
+    return np.concatenate(([0.0], np.cumsum(increments)))
+
+
+def _interpolate_at(elevation: np.ndarray, values: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """Linear interpolation along the last axis of `values` at the levels [m]; NaN below the bottom of the CPT.
+
+    The rows share the elevations, so the surrounding samples and the weights are located once for all rows.
+    """
+    # the samples are searched in ascending order, the elevations are descending
+    x_values = elevation[::-1]
+    clipped_levels = np.clip(levels, x_values[0], x_values[-1])
+    lower = np.clip(np.searchsorted(x_values, clipped_levels, side="right") - 1, 0, max(x_values.size - 2, 0))
+    upper = np.minimum(lower + 1, x_values.size - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.nan_to_num((clipped_levels - x_values[lower]) / (x_values[upper] - x_values[lower]))
+    rows = np.atleast_2d(values)[:, ::-1]
+    interpolated = rows[:, lower] * (1 - weight) + rows[:, upper] * weight
+    interpolated[:, levels < elevation[-1]] = np.nan
+    return interpolated if np.ndim(values) > 1 else interpolated[0]
+
+
+def sweep_pile_designs(
+    elevation: np.ndarray,
+    shaft: np.ndarray,
+    base_table: np.ndarray,
+    diameters: Sequence[float],
+    lengths: Sequence[float],
+    surface_level: float,
+) -> PileDesignSweep:
+    """Calculates the capacity of all combinations of diameter and length in one pass.
+
+    The shaft resistance along the pile follows from one prefix sum over the CPT, which is shared by all diameters,
+    and the base resistance from the precomputed table with the unit base resistance per diameter.
+
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :param shaft: Unit shaft resistance per sample in [MPa]
+    :param base_table: Unit base resistance per diameter and sample in [MPa]
+    :param diameters: Pile diameters in [m], in the order of the rows of `base_table`
+    :param lengths: Pile lengths in [m] below the surface level
+    :param surface_level: Elevation of the pile head in [m]
+    """
+    diameters, lengths = np.asarray(diameters, dtype=np.float64), np.asarray(lengths, dtype=np.float64)
+    tip_elevation = surface_level - lengths
+
+    # the shaft resistance between the surface level and the tip, per meter of circumference
+    cumulative_shaft = get_cumulative_shaft_resistance(shaft, elevation)
+    shaft_per_circumference = _interpolate_at(elevation, cumulative_shaft, tip_elevation) - np.interp(
+        surface_level, elevation[::-1], cumulative_shaft[::-1]
+    )
+    base_at_tip = _interpolate_at(elevation, base_table, tip_elevation)
+
+    shaft_capacity = np.pi * diameters[:, np.newaxis] * shaft_per_circumference[np.newaxis, :]
+    base_capacity = np.pi * diameters[:, np.newaxis] ** 2 / 4 * base_at_tip
+    return PileDesignSweep(
+        diameters=diameters,
+        lengths=lengths,
+        tip_elevation=tip_elevation,
+        shaft=shaft_capacity,
+        base=base_capacity,
+        total=shaft_capacity + base_capacity,
+    )
+
+
+@dataclass(frozen=True)
+class BearingCapacityProfile:
+    """Bearing capacity of a pile with its tip at each CPT sample below the surface level, from top to bottom."""
+
+    elevation: np.ndarray  # [m], of the pile tip
+    shaft: np.ndarray  # [MN]
+    base: np.ndarray  # [MN]
+    total: np.ndarray  # [MN]
+
+    @property
+    def nbytes(self) -> int:
+        return self.elevation.nbytes + self.shaft.nbytes + self.base.nbytes + self.total.nbytes
+
+
+def calculate_bearing_capacity_profile(
+    elevation: np.ndarray, shaft: np.ndarray, base: np.ndarray, diameter: float, surface_level: float
+) -> BearingCapacityProfile:
+    """Calculates the bearing capacity for every tip level along the CPT.
+
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :param shaft: Unit shaft resistance per sample in [MPa]
+    :param base: Unit base resistance per sample in [MPa] for a pile of `diameter`
+    :param diameter: Pile diameter in [m]
+    :param surface_level: Elevation of the pile head in [m]
+    """
+    cumulative_shaft = get_cumulative_shaft_resistance(shaft, elevation)
+    cumulative_shaft -= np.interp(surface_level, elevation[::-1], cumulative_shaft[::-1])
+    below_surface = elevation <= surface_level
+    shaft_capacity = np.pi * diameter * cumulative_shaft[below_surface]
+    base_capacity = np.pi * diameter**2 / 4 * base[below_surface]
+    return BearingCapacityProfile(
+        elevation=elevation[below_surface],
+        shaft=shaft_capacity,
+        base=base_capacity,
+        total=shaft_capacity + base_capacity,
+    )
+
+
+def solve_required_tip_level(profile: BearingCapacityProfile, loads: Union[float, Sequence[float]]) -> np.ndarray:
+    """Returns the shallowest tip level [m] at which the bearing capacity reaches each load [MN].
+
+    The running maximum of the capacity along the depth is monotone, so the first sample that reaches a load is found
+    by bisection for all loads at once. The tip level is interpolated linearly between that sample and the one above.
+    NaN if the capacity along the CPT does not reach the load.
+    """
+    loads = np.asarray(loads, dtype=np.float64)
+    if profile.total.size == 0:
+        return np.full(loads.shape, np.nan)
+    running_maximum = np.maximum.accumulate(np.nan_to_num(profile.total, nan=-np.inf))
+    index = np.searchsorted(running_maximum, loads, side="left")
+    reached = index < running_maximum.size
+    index = np.minimum(index, running_maximum.size - 1)
+
+    above = np.maximum(index - 1, 0)
+    capacity_above, capacity_below = profile.total[above], profile.total[index]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.clip((loads - capacity_above) / (capacity_below - capacity_above), 0, 1)
+    fraction = np.where((index > 0) & np.isfinite(fraction), fraction, 1)
+    tip_level = profile.elevation[above] + fraction * (profile.elevation[index] - profile.elevation[above])
+    return np.where(reached, tip_level, np.nan)
@@ -0,0 +1,161 @@
+"""Vectorized Robertson classification with a precomputed zone lookup grid.
+
+The zones of the normalised Robertson (1990) soil behaviour type chart are rasterized once into a 2-D grid over
+log10(Fr) x log10(Qt). All samples of a CPT are normalised with the vertical stresses along the CPT, and classified
+with a single array index operation into that grid.
+
+The zone boundaries follow Robertson (2010): zones 2 to 7 are bounded by the soil behaviour type index Ic, zone 1
+(sensitive fine grained) by Qt < 12 exp(-1.4 Fr), and zones 8 and 9 (very stiff soils) by the upper boundary of the
+chart. Samples outside the chart get zone 0 (unknown). The stresses follow from the unit weight of every sample, which
+is estimated from qc and Rf with Robertson and Cabal (2010), as the unit weights of the zones depend on the result.
+
+On `sample_gef.GEF`, the grid gives the zone of the analytic chart for every sample. After filtering on a minimum layer
+thickness of 300 mm, 14 depth ranges differ from the classification of the platform; each is documented with its cause
+in `tests/fixtures/sample_gef_robertson_platform.json`.
+"""
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from viktor import UserError
+from viktor.geo import Soil
+
+from .classification_table import MIN_EFFECTIVE_STRESS
+from .stress_profile import UNIT_WEIGHT_WATER, get_sample_stress_profile
+
+ATMOSPHERIC_PRESSURE = 0.1  # [MPa]
+UNKNOWN_ZONE = 0
+NUMBER_OF_ZONES = 9
+UNIT_WEIGHT_RANGE = (10.0, 22.0)  # [kN/m3], limits of the estimated unit weight
+MIN_NET_CONE_RESISTANCE = 1e-3  # [MPa], lower limit of qc - sigma_v0, which is negative in very soft soil
+
+# Extent and resolution of the lookup grid
+LOG_FR_RANGE = (-1.0, 1.0)  # Fr from 0.1 % to 10 %
+LOG_QT_RANGE = (0.0, 3.0)  # Qt from 1 to 1000
+GRID_RESOLUTION = 1024
+
+IC_ZONE_LIMITS = [1.31, 2.05, 2.60, 2.95, 3.60]  # upper Ic limit of zones 7, 6, 5, 4, 3
+IC_ZONES = [7, 6, 5, 4, 3, 2]
+
+
+def get_robertson_zones(log_fr: np.ndarray, log_qt: np.ndarray) -> np.ndarray:
+    """Evaluates the Robertson zone (1 to 9) of points in the chart analytically.
+
+    :param log_fr: log10 of the normalised friction ratio Fr in [%]
+    :param log_qt: log10 of the normalised cone resistance Qt
+    """
+    log_fr, log_qt = np.broadcast_arrays(np.asarray(log_fr, dtype=float), np.asarray(log_qt, dtype=float))
+    fr, qt = 10**log_fr, 10**log_qt
+
+    ic = np.sqrt((3.47 - log_qt) ** 2 + (log_fr + 1.22) ** 2)
+    zones = np.asarray(IC_ZONES)[np.searchsorted(IC_ZONE_LIMITS, ic, side="right")]
+
+    zones = np.where(qt < 12 * np.exp(-1.4 * fr), 1, zones)
+
+    denominator = 0.005 * (fr - 1) - 0.0003 * (fr - 1) ** 2 - 0.002
+    with np.errstate(divide="ignore"):
+        very_stiff = (fr > 1.5) & (denominator > 0) & (qt >= 1 / np.where(denominator > 0, denominator, np.inf))
+    zones = np.where(very_stiff, np.where(fr <= 4.5, 8, 9), zones)
+    return zones.astype(np.int8)
+
+
+@lru_cache(maxsize=1)
+def get_zone_grid(resolution: int = GRID_RESOLUTION) -> np.ndarray:
+    """Returns the zone per grid cell, indexed as grid[fr_index, qt_index]. The grid is computed once."""
+    log_fr = _cell_centers(LOG_FR_RANGE, resolution)
+    log_qt = _cell_centers(LOG_QT_RANGE, resolution)
+    grid = get_robertson_zones(log_fr[:, np.newaxis], log_qt[np.newaxis, :])
+    grid.flags.writeable = False
+    return grid
+
+
+def _cell_centers(value_range: Tuple[float, float], resolution: int) -> np.ndarray:
+    step = (value_range[1] - value_range[0]) / resolution
+    return value_range[0] + step * (np.arange(resolution) + 0.5)
+
+
+def _to_grid_index(log_values: np.ndarray, value_range: Tuple[float, float], resolution: int) -> np.ndarray:
+    scaled = (log_values - value_range[0]) / (value_range[1] - value_range[0]) * resolution
+    return np.clip(scaled, 0, resolution - 1).astype(np.intp)
+
+
+def estimate_unit_weight(qc: np.ndarray, rf_percentage: np.ndarray) -> np.ndarray:
+    """Unit weight [kN/m3] of every sample from qc [MPa] and Rf [%], with Robertson and Cabal (2010)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = 0.27 * np.log10(rf_percentage) + 0.36 * np.log10(qc / ATMOSPHERIC_PRESSURE) + 1.236
+    return np.clip(np.nan_to_num(ratio * UNIT_WEIGHT_WATER, nan=UNIT_WEIGHT_RANGE[1]), *UNIT_WEIGHT_RANGE)
+
+
+def get_normalised_signals(
+    qc: np.ndarray, rf_percentage: np.ndarray, elevation: np.ndarray, ground_water_level: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the normalised friction ratio Fr [%] and cone resistance Qt of every sample.
+
+    Fr = fs / (qc - sigma_v0) and Qt = (qc - sigma_v0) / sigma'_v0, where the cone resistance is not corrected for the
+    pore pressure behind the cone, as the net area ratio of the cone is not stored.
+
+    :param qc: Cone resistance in [MPa], larger than 0
+    :param rf_percentage: Friction ratio in [%], larger than 0
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :param ground_water_level: Phreatic level in [m]
+    """
+    unit_weight = estimate_unit_weight(qc, rf_percentage)
+    stress_profile = get_sample_stress_profile(elevation, unit_weight, unit_weight, ground_water_level)
+    total_stress = stress_profile.total_stress_at(elevation) / 1e3
+    effective_stress = np.maximum(stress_profile.effective_stress_at(elevation), MIN_EFFECTIVE_STRESS) / 1e3
+    net_cone_resistance = np.maximum(qc - total_stress, MIN_NET_CONE_RESISTANCE)
+    return rf_percentage * qc / net_cone_resistance, net_cone_resistance / effective_stress
+
+
+def classify_robertson_zones(
+    qc: Sequence[float],
+    rf: Sequence[float],
+    elevation: Sequence[float],
+    ground_water_level: float,
+    resolution: int = GRID_RESOLUTION,
+) -> np.ndarray:
+    """Returns the Robertson zone of every sample, 0 for samples that cannot be classified.
+
+    Samples outside the extent of the chart are clipped to its edge, as the zones continue outwards.
+
+    :param qc: Cone resistance in [MPa]
+    :param rf: Friction ratio as fraction (as in GEFData)
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    :param ground_water_level: Phreatic level in [m]
+    """
+    qc = np.asarray(qc, dtype=np.float64)
+    rf_percentage = np.asarray(rf, dtype=np.float64) * 100
+    valid = np.isfinite(qc) & np.isfinite(rf_percentage) & (qc > 0) & (rf_percentage > 0)
+    if not valid.any():
+        return np.full(qc.shape, UNKNOWN_ZONE, dtype=np.int8)
+
+    fr, qt = get_normalised_signals(
+        qc[valid], rf_percentage[valid], np.asarray(elevation, dtype=np.float64)[valid], ground_water_level
+    )
+    grid = get_zone_grid(resolution)
+    zones = np.full(qc.shape, UNKNOWN_ZONE, dtype=np.int8)
+    zones[valid] = grid[
+        _to_grid_index(np.log10(fr), LOG_FR_RANGE, resolution), _to_grid_index(np.log10(qt), LOG_QT_RANGE, resolution)
+    ]
+    return zones
+
+
+def get_zone_name(zone: int) -> str:
+    """Name of a zone as used in the Robertson table"""
+    return "Robertson zone unknown" if zone == UNKNOWN_ZONE else f"Robertson zone {zone}"
+
+
+def get_zone_soils(table: List[dict], soils: Dict[str, Soil]) -> List[Soil]:
+    """Returns the Soil per zone (index 0 is the unknown zone) for a Robertson table.
+
+    :param table: Rows of the Robertson table, with the zone in 'name' and the soil in 'ui_name'
+    :param soils: Mapping between the ui_name and the Soil, see `Classification.soil_mapping`
+    """
+    ui_names = {row["name"]: row["ui_name"] for row in table}
+    zone_soils = []
+    for zone in range(NUMBER_OF_ZONES + 1):
+        try:
+            zone_soils.append(soils[ui_names[get_zone_name(zone)]])
+        except KeyError:
+            raise UserError(f"'{get_zone_name(zone)}' is missing from the Robertson table")
+    return zone_soils
@@ -0,0 +1,199 @@
+"""Greenfield surface settlement above a bored tunnel with the Gaussian trough of Peck (1969).
+
+The transverse settlement trough at a horizontal offset y from the tunnel axis is
+
+    S(y) = S_max exp(-y^2 / (2 i^2)),  with  S_max = V_L (pi D^2 / 4) / (sqrt(2 pi) i)  and  i = K z0,
+
+where V_L is the volume loss (the volume of the trough per meter as fraction of the excavated area), D the tunnel
+diameter and z0 the depth of the tunnel axis below the surface. The trough width parameter K follows from the soil
+layers above the tunnel axis, as the mean of the K of each layer weighted by its thickness (O'Reilly and New, 1982).
+
+All functions are vectorized: the offsets can have any shape, so a whole surface grid is evaluated in one pass.
+
+Along the alignment, the settlement while the face advances follows the cumulative Gaussian of Attewell and Woodman
+(1982): at chainage x, with the tunnel from x_start to the face at x_face,
+
+    S(x, y) = S(y) [Phi((x - x_start) / i) - Phi((x - x_face) / i)],
+
+so the field of every face position is the transverse trough times a longitudinal factor that only depends on x.
+"""
+import math
+from dataclasses import dataclass
+from typing import Sequence, Union
+
+import numpy as np
+from viktor import UserError
+from viktor.geo import SoilLayout
+
+from .lcpc import CLAY_SILT, INTERMEDIATE, PEAT, SAND_GRAVEL, get_soil_group
+
+# Trough width parameter K per soil group of `lcpc.get_soil_group` (Mair and Taylor, 1997)
+TROUGH_WIDTH_PARAMETERS = np.zeros(4)
+TROUGH_WIDTH_PARAMETERS[[CLAY_SILT, INTERMEDIATE, SAND_GRAVEL, PEAT]] = [0.5, 0.4, 0.35, 0.5]
+
+MAX_CUBE_SIZE = 25_000_000  # number of values of a settlement cube, 100 MB as float32
+MAX_SURFACE_GRID_SIZE = 1_000_000  # number of offsets of a surface grid, 8 MB as float64
+
+# Rational approximation 7.1.26 of Abramowitz and Stegun (1964) of erfc(x) for x >= 0, absolute error below 1.5e-7
+ERFC_P = 0.3275911
+ERFC_COEFFICIENTS = (1.061405429, -1.453152027, 1.421413741, -0.284496736, 0.254829592)  # a5 to a1
+
+ArrayLike = Union[float, np.ndarray]
+
+
+def get_layer_trough_width_parameters(soil_layout: SoilLayout) -> np.ndarray:
+    """Returns the trough width parameter K of every layer of the soil layout, from its soil group."""
+    groups = [get_soil_group(layer.soil.properties.get("ui_name") or layer.soil.name) for layer in soil_layout.layers]
+    return TROUGH_WIDTH_PARAMETERS[np.array(groups, dtype=np.intp)]
+
+
+def get_weighted_trough_width_parameter(
+    tops: np.ndarray, bottoms: np.ndarray, layer_k: np.ndarray, surface_level: float, axis_level: ArrayLike
+) -> np.ndarray:
+    """Mean K of the layers between the surface level and the tunnel axis, weighted by their thickness.
+
+    The top layer extends up to the surface level, and the bottom layer down to the tunnel axis if the axis is below
+    the soil layout. Vectorized over the axis levels.
+
+    :param tops: Top of each layer in [m], from top to bottom
+    :param bottoms: Bottom of each layer in [m]
+    :param layer_k: Trough width parameter of each layer
+    :param surface_level: Surface level in [m]
+    :param axis_level: Level of the tunnel axis in [m], below the surface level
+    """
+    axis_level = np.asarray(axis_level, dtype=np.float64)
+    if np.any(axis_level >= surface_level):
+        raise UserError("The tunnel axis must be below the surface level")
+    if len(layer_k) == 0:
+        raise UserError("The soil layout has no layers to derive the trough width parameter from")
+    tops, bottoms = np.array(tops, dtype=np.float64), np.array(bottoms, dtype=np.float64)
+    tops[0], bottoms[-1] = np.inf, -np.inf
+
+    # thickness of every layer between the surface and the axis, with the layers on the last axis
+    upper = np.minimum(tops, surface_level)
+    lower = np.maximum(bottoms, axis_level[..., np.newaxis])
+    thickness = np.clip(upper - lower, 0, None)
+    return (thickness * layer_k).sum(axis=-1) / (surface_level - axis_level)
+
+
+@dataclass(frozen=True)
+class TransverseTrough:
+    """Gaussian transverse settlement trough; the parameters can be arrays, e.g. one value per cross-section."""
+
+    axis_depth: ArrayLike  # z0 [m], below the surface
+    diameter: ArrayLike  # [m]
+    volume_loss: ArrayLike  # V_L [-], e.g. 0.01 for 1 %
+    trough_width_parameter: ArrayLike  # K [-]
+
+    def __post_init__(self):
+        if np.any(np.asarray(self.axis_depth) <= np.asarray(self.diameter) / 2):
+            raise UserError("The tunnel must be below the surface: the axis depth must exceed half the diameter")
+
+    @property
+    def trough_width(self) -> ArrayLike:
+        """i [m], the offset of the inflection point of the trough"""
+        return self.trough_width_parameter * self.axis_depth
+
+    @property
+    def trough_volume(self) -> ArrayLike:
+        """Volume of the trough per meter of tunnel [m3/m]"""
+        return self.volume_loss * np.pi * self.diameter**2 / 4
+
+    @property
+    def max_settlement(self) -> ArrayLike:
+        """S_max [m], above the tunnel axis"""
+        return self.trough_volume / (np.sqrt(2 * np.pi) * self.trough_width)
+
+    def settlement(self, offset: ArrayLike) -> np.ndarray:
+        """Settlement [m] at the horizontal offsets [m] from the tunnel axis"""
+        offset = np.asarray(offset, dtype=np.float64)
+        return self.max_settlement * np.exp(-(offset**2) / (2 * self.trough_width**2))
+
+    def slope(self, offset: ArrayLike) -> np.ndarray:
+        """Slope dS/dy [-] of the trough at the offsets [m]"""
+        offset = np.asarray(offset, dtype=np.float64)
+        return -offset / self.trough_width**2 * self.settlement(offset)
+
+    def horizontal_displacement(self, offset: ArrayLike) -> np.ndarray:
+        """Horizontal displacement [m] at the offsets [m], towards the tunnel axis (O'Reilly and New, 1982)"""
+        offset = np.asarray(offset, dtype=np.float64)
+        return -offset / self.axis_depth * self.settlement(offset)
+
+
+def get_surface_grid(half_width: float, spacing: float) -> np.ndarray:
+    """Offsets [m] from the tunnel axis, from -half_width to half_width with the given spacing"""
+    if spacing <= 0:
+        raise UserError("The grid spacing must be larger than 0")
+    number_of_points = int(round(2 * half_width / spacing)) + 1
+    if number_of_points > MAX_SURFACE_GRID_SIZE:
+        raise UserError("The surface grid is too large, increase the grid spacing or reduce the half width")
+    return np.linspace(-half_width, half_width, number_of_points)
+
+
+def normal_cdf(values: ArrayLike) -> np.ndarray:
+    """Cumulative distribution function of the standard normal distribution, with an absolute error below 1e-7.
+
+    The tail is evaluated as erfc(|x| / sqrt(2)) / 2 for both signs, so that it goes to 0 without cancellation.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    z = np.abs(values) / math.sqrt(2)
+    t = 1 / (1 + ERFC_P * z)
+    polynomial = np.zeros_like(t)
+    for coefficient in ERFC_COEFFICIENTS:
+        polynomial = (polynomial + coefficient) * t
+    tail = 0.5 * polynomial * np.exp(-z * z)
+    return np.where(values < 0, tail, 1 - tail)
+
+
+@dataclass(frozen=True)
+class SettlementCube:
+    """Surface settlement [m] per face position and grid point, as float32 array of shape (step, chainage, offset)"""
+
+    face_positions: np.ndarray  # [m], chainage of the face per step
+    chainages: np.ndarray  # [m], along the alignment
+    offsets: np.ndarray  # [m], from the tunnel axis
+    settlement: np.ndarray  # [m]
+
+    @property
+    def nbytes(self) -> int:
+        return self.face_positions.nbytes + self.chainages.nbytes + self.offsets.nbytes + self.settlement.nbytes
+
+
+def calculate_longitudinal_settlement(
+    trough: TransverseTrough,
+    tunnel_start: float,
+    face_positions: Sequence[float],
+    chainages: Sequence[float],
+    offsets: Sequence[float],
+) -> SettlementCube:
+    """Calculates the settlement of the surface grid for every face position.
+
+    The transverse trough is evaluated once for the offsets. Per step, only the increment of the longitudinal factor
+    between the previous and the current face position is evaluated along the chainages; the running sum of these
+    increments times the transverse trough gives the settlement field of each step in one broadcast.
+
+    :param trough: Transverse trough of the cross-section, the same for all chainages
+    :param tunnel_start: Chainage [m] where the tunnel starts
+    :param face_positions: Chainage [m] of the face per step, in the order of the advance
+    :param chainages: Chainages [m] of the grid
+    :param offsets: Offsets [m] of the grid from the tunnel axis
+    """
+    face_positions = np.asarray(face_positions, dtype=np.float64)
+    chainages, offsets = np.asarray(chainages, dtype=np.float64), np.asarray(offsets, dtype=np.float64)
+    if face_positions.size == 0:
+        raise UserError("At least one face position is required")
+    if face_positions.size * chainages.size * offsets.size > MAX_CUBE_SIZE:
+        raise UserError("The settlement grid is too large, increase the grid spacing or reduce the number of steps")
+    trough_width = float(trough.trough_width)
+    transverse = trough.settlement(offsets)
+
+    # Phi((x - x_face) / i) for the start and every face position; the increment of step k is the difference of the
+    # faces of steps k - 1 and k, and the tunnel start acts as the face of step -1
+    faces = np.concatenate(([tunnel_start], face_positions))
+    behind_face = normal_cdf((chainages[np.newaxis, :] - faces[:, np.newaxis]) / trough_width)
+    increments = behind_face[:-1] - behind_face[1:]
+    longitudinal = np.cumsum(increments, axis=0)
+
+    settlement = np.empty((face_positions.size, chainages.size, offsets.size), dtype=np.float32)
+    np.multiply(longitudinal[:, :, np.newaxis], transverse[np.newaxis, np.newaxis, :], out=settlement, casting="unsafe")
+    return SettlementCube(face_positions=face_positions, chainages=chainages, offsets=offsets, settlement=settlement)
@@ -0,0 +1,292 @@
+"""Local store of the classified CPTs of a site, with a spatial index on their RD coordinates.
+
+The results of `Classification.classify_cpt_file` are stored in SQLite, compressed, next to a row with the name,
+coordinates, ground level and bottom of each CPT. The coordinates are indexed in an R-tree, so that nearest-k and
+within-polygon queries only visit the CPTs near the query instead of all CPTs of the site. The bounding box of the
+CPTs of every site is kept up to date when CPTs are added or removed, so a query does not scan the table for it. The
+locations can be read (and clustered for the map) without reading the measurement data of any CPT.
+
+Set the environment variable `CPT_SITE_DATABASE` to the path of the database to show the CPTs of a site on the map.
+"""
+import json
+import math
+import os
+import sqlite3
+import zlib
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from viktor import UserError
+
+ENVIRONMENT_VARIABLE = "CPT_SITE_DATABASE"
+
+INITIAL_SEARCH_RADIUS = 100  # [m], half-width of the first box of a nearest-k query
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cpt (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    name TEXT NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    ground_level REAL,
+    bottom REAL,
+    result BLOB NOT NULL,
+    UNIQUE (site, name)
+);
+CREATE INDEX IF NOT EXISTS cpt_site ON cpt (site);
+CREATE VIRTUAL TABLE IF NOT EXISTS cpt_index USING rtree (id, min_x, max_x, min_y, max_y);
+CREATE TABLE IF NOT EXISTS site_bounds (
+    site TEXT PRIMARY KEY,
+    min_x REAL NOT NULL,
+    max_x REAL NOT NULL,
+    min_y REAL NOT NULL,
+    max_y REAL NOT NULL
+);
+"""
+
+LOCATION_COLUMNS = "cpt.id, cpt.site, cpt.name, cpt.x, cpt.y, cpt.ground_level, cpt.bottom"
+
+
+@dataclass(frozen=True)
+class CPTLocation:
+    """Location of a stored CPT, with the RD coordinates in [m] and the levels in [m NAP]"""
+
+    id: int
+    site: str
+    name: str
+    x: float
+    y: float
+    ground_level: Optional[float]
+    bottom: Optional[float]
+
+
+@dataclass(frozen=True)
+class LocationCluster:
+    """CPTs that are shown as one point on the map, at the mean of their coordinates"""
+
+    x: float
+    y: float
+    locations: Tuple[CPTLocation, ...]
+
+
+def _compress(cpt_dict: dict) -> bytes:
+    return zlib.compress(json.dumps(cpt_dict, separators=(",", ":")).encode())
+
+
+def _decompress(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data).decode())
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Whether each point lies inside the polygon (even-odd rule), vectorized over the points."""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    inside = np.zeros(x.shape, dtype=bool)
+    vertices = np.asarray(polygon, dtype=np.float64)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_intersection = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < x_intersection)
+    return inside
+
+
+class SiteDatabase:
+    """SQLite database with the classified CPTs of one or more sites."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+            # databases of before the bounds per site was stored
+            if connection.execute("SELECT 1 FROM site_bounds LIMIT 1").fetchone() is None:
+                connection.execute(
+                    "INSERT INTO site_bounds SELECT site, MIN(x), MAX(x), MIN(y), MAX(y) FROM cpt GROUP BY site"
+                )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection per operation, so that the database can be used from several threads and processes."""
+        with closing(sqlite3.connect(self.path)) as connection:
+            with connection:
+                yield connection
+
+    def add_cpt(self, site: str, name: str, cpt_dict: dict) -> int:
+        """Stores (or replaces) the result of `classify_cpt_file` of a CPT and returns its id.
+
+        :param site: Name of the site
+        :param name: Name of the CPT, unique within the site
+        :param cpt_dict: Result of `Classification.classify_cpt_file`, with its coordinates in `x_rd` and `y_rd`
+        """
+        x, y = cpt_dict.get("x_rd"), cpt_dict.get("y_rd")
+        if x is None or y is None:
+            raise UserError(f"CPT '{name}' has no RD coordinates")
+        ground_level = cpt_dict.get("headers", {}).get("ground_level_wrt_reference_m")
+        bottom = cpt_dict.get("bottom_of_soil_layout_user")
+        with self._connect() as connection:
+            row = connection.execute("SELECT id FROM cpt WHERE site = ? AND name = ?", (site, name)).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM cpt_index WHERE id = ?", row)
+            cursor = connection.execute(
+                "INSERT OR REPLACE INTO cpt (site, name, x, y, ground_level, bottom, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (site, name, x, y, ground_level, bottom, _compress(cpt_dict)),
+            )
+            cpt_id = cursor.lastrowid
+            connection.execute("INSERT INTO cpt_index VALUES (?, ?, ?, ?, ?)", (cpt_id, x, x, y, y))
+            if row is None:
+                connection.execute(
+                    "INSERT INTO site_bounds VALUES (?, ?, ?, ?, ?) ON CONFLICT (site) DO UPDATE SET "
+                    "min_x = MIN(min_x, excluded.min_x), max_x = MAX(max_x, excluded.max_x), "
+                    "min_y = MIN(min_y, excluded.min_y), max_y = MAX(max_y, excluded.max_y)",
+                    (site, x, x, y, y),
+                )
+            else:  # the replaced CPT may have been on the boundary
+                self._update_site_bounds(connection, site)
+        return cpt_id
+
+    def add_batch_results(self, site: str, results: Sequence[dict]) -> List[int]:
+        """Stores the classified files of a batch run (see `batch.run_batch`); failed files are skipped."""
+        return [
+            self.add_cpt(site, Path(result["file"]).stem, result["result"])
+            for result in results
+            if result["status"] == "ok"
+        ]
+
+    def remove_cpt(self, cpt_id: int) -> None:
+        with self._connect() as connection:
+            row = connection.execute("SELECT site FROM cpt WHERE id = ?", (cpt_id,)).fetchone()
+            connection.execute("DELETE FROM cpt WHERE id = ?", (cpt_id,))
+            connection.execute("DELETE FROM cpt_index WHERE id = ?", (cpt_id,))
+            if row is not None:
+                self._update_site_bounds(connection, row[0])
+
+    @staticmethod
+    def _update_site_bounds(connection: sqlite3.Connection, site: str) -> None:
+        """Recalculates the bounding box of a site from its CPTs, through the index on the site"""
+        connection.execute("DELETE FROM site_bounds WHERE site = ?", (site,))
+        connection.execute(
+            "INSERT INTO site_bounds SELECT site, MIN(x), MAX(x), MIN(y), MAX(y) FROM cpt WHERE site = ? GROUP BY site",
+            (site,),
+        )
+
+    def get_sites(self) -> List[str]:
+        with self._connect() as connection:
+            return [row[0] for row in connection.execute("SELECT DISTINCT site FROM cpt ORDER BY site")]
+
+    def get_locations(self, site: Optional[str] = None) -> List[CPTLocation]:
+        """Returns the locations of all CPTs (of a site), without reading their results."""
+        query = f"SELECT {LOCATION_COLUMNS} FROM cpt"
+        arguments: tuple = ()
+        if site is not None:
+            query, arguments = query + " WHERE site = ?", (site,)
+        with self._connect() as connection:
+            return [CPTLocation(*row) for row in connection.execute(query + " ORDER BY cpt.id", arguments)]
+
+    def get_result(self, cpt_id: int) -> dict:
+        """Returns the stored result of `classify_cpt_file` of a CPT."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT result FROM cpt WHERE id = ?", (cpt_id,)).fetchone()
+        if row is None:
+            raise UserError(f"CPT {cpt_id} is not in the site database")
+        return _decompress(row[0])
+
+    def _get_locations_in_box(
+        self, min_x: float, max_x: float, min_y: float, max_y: float, site: Optional[str]
+    ) -> List[CPTLocation]:
+        query = (
+            f"SELECT {LOCATION_COLUMNS} FROM cpt_index JOIN cpt ON cpt.id = cpt_index.id "
+            "WHERE cpt_index.max_x >= ? AND cpt_index.min_x <= ? AND cpt_index.max_y >= ? AND cpt_index.min_y <= ?"
+        )
+        arguments: tuple = (min_x, max_x, min_y, max_y)
+        if site is not None:
+            query, arguments = query + " AND cpt.site = ?", arguments + (site,)
+        with self._connect() as connection:
+            return [CPTLocation(*row) for row in connection.execute(query, arguments)]
+
+    def get_nearest(self, x: float, y: float, k: int = 1, site: Optional[str] = None) -> List[CPTLocation]:
+        """Returns the k CPTs nearest to the RD coordinates, nearest first.
+
+        The R-tree is queried with a box around the point that doubles until it holds k CPTs, or covers the bounding
+        box of all CPTs. The k-th nearest of those is at most the distance to the corner of the box, so one last query
+        with that distance as half-width holds all CPTs that can be nearer.
+        """
+        if k <= 0:
+            return []
+        bounds = self._get_bounds(site)
+        if bounds is None:
+            return []
+        min_x, max_x, min_y, max_y = bounds
+        # half-width of the box around the point that covers the bounding box of all CPTs
+        max_radius = max(abs(x - min_x), abs(x - max_x), abs(y - min_y), abs(y - max_y))
+        radius = INITIAL_SEARCH_RADIUS
+        while True:
+            radius = min(radius, max_radius)
+            candidates = self._get_locations_in_box(x - radius, x + radius, y - radius, y + radius, site)
+            if len(candidates) >= k or radius >= max_radius:
+                break
+            radius *= 2
+        if candidates:
+            kth_distance = sorted(math.hypot(c.x - x, c.y - y) for c in candidates)[min(k, len(candidates)) - 1]
+            if kth_distance > radius:
+                candidates = self._get_locations_in_box(
+                    x - kth_distance, x + kth_distance, y - kth_distance, y + kth_distance, site
+                )
+        return sorted(candidates, key=lambda c: (math.hypot(c.x - x, c.y - y), c.id))[:k]
+
+    def get_within_polygon(
+        self, polygon: Sequence[Tuple[float, float]], site: Optional[str] = None
+    ) -> List[CPTLocation]:
+        """Returns the CPTs inside a polygon of RD coordinates; the R-tree selects the CPTs in its bounding box."""
+        vertices = np.asarray(polygon, dtype=np.float64)
+        if vertices.ndim != 2 or len(vertices) < 3:
+            raise UserError("A polygon needs at least 3 points")
+        (min_x, min_y), (max_x, max_y) = vertices.min(axis=0), vertices.max(axis=0)
+        candidates = self._get_locations_in_box(min_x, max_x, min_y, max_y, site)
+        if not candidates:
+            return []
+        inside = points_in_polygon(np.array([c.x for c in candidates]), np.array([c.y for c in candidates]), vertices)
+        return sorted((c for c, is_inside in zip(candidates, inside) if is_inside), key=lambda c: c.id)
+
+    def _get_bounds(self, site: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+        """Bounding box (min_x, max_x, min_y, max_y) of all CPTs (of a site), or None if there are none"""
+        query = "SELECT MIN(min_x), MAX(max_x), MIN(min_y), MAX(max_y) FROM site_bounds"
+        arguments: tuple = ()
+        if site is not None:
+            query, arguments = query + " WHERE site = ?", (site,)
+        with self._connect() as connection:
+            bounds = connection.execute(query, arguments).fetchone()
+        return None if bounds[0] is None else bounds
+
+
+def get_site_database() -> Optional[SiteDatabase]:
+    """Returns the site database of the environment variable, or None if it is not set."""
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    return SiteDatabase(path) if path else None
+
+
+def cluster_locations(locations: Sequence[CPTLocation], cell_size: float) -> List[LocationCluster]:
+    """Groups the locations on a square grid of `cell_size` [m]; every occupied cell is one cluster."""
+    if not locations:
+        return []
+    coordinates = np.array([(location.x, location.y) for location in locations])
+    cells = np.floor(coordinates / cell_size).astype(np.int64)
+    _, cell_index, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cell_index = cell_index.ravel()
+    mean_x = np.bincount(cell_index, weights=coordinates[:, 0]) / counts
+    mean_y = np.bincount(cell_index, weights=coordinates[:, 1]) / counts
+    members = [[] for _ in counts]
+    for location, index in zip(locations, cell_index):
+        members[index].append(location)
+    return [LocationCluster(x, y, tuple(cluster)) for x, y, cluster in zip(mean_x, mean_y, members)]
+
+
+def get_cluster_cell_size(locations: Sequence[CPTLocation], cells_per_side: int, minimum: float) -> float:
+    """Cell size [m] that divides the extent of the locations in about `cells_per_side` cells, at least `minimum`"""
+    if not locations:
+        return minimum
+    x, y = [location.x for location in locations], [location.y for location in locations]
+    return max((max(x) - min(x)) / cells_per_side, (max(y) - min(y)) / cells_per_side, minimum)
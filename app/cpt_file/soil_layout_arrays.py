@@ -0,0 +1,298 @@
+"""Array-backed soil layout with an explicit unit, converted to a VIKTOR `SoilLayout` or table rows only at the edges.
+
+A layout is stored as the boundaries of its layers (the tops from top to bottom, followed by the bottom of the lowest
+layer) and a soil index per layer into a `SoilRegistry`. Changing the unit only scales the boundaries, so the round
+trips through `SoilLayout.serialize` and `SoilLayout.from_dict` of the unit conversions are not needed, and the Soil
+objects of the registry are shared by all layouts instead of being rebuilt for every layer.
+
+The thin layers are filtered from these arrays, with the same result as
+`SoilLayout.filter_layers_on_thickness`:
+
+- the layers of a run of consecutive layers thinner than the minimum thickness are grouped from the top down, a group
+  is closed as soon as it reaches the minimum thickness;
+- every closed group becomes one layer, of the soil with the largest thickness in the group (the first of these soils
+  if several have the same thickness);
+- the remainder of a run that does not reach the minimum thickness is added to the layer above, or to the layer below
+  if it is at the top of the layout;
+- adjacent layers with the same soil are merged.
+
+A `ThicknessFilterLadder` holds the filtered layouts for a range of minimum thicknesses, so that changing the minimum
+thickness only looks up a precomputed layout.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from viktor import UserError
+from viktor.geo import Soil, SoilLayer, SoilLayout
+
+MILLIMETERS_PER_UNIT = {"mm": 1, "m": 1000}
+
+
+@dataclass(frozen=True)
+class SoilRegistry:
+    """Soils by index, and the index of each soil by the soil name visible in the UI"""
+
+    soils: Tuple[Soil, ...]
+    names: Tuple[str, ...]
+    index: Dict[str, int] = field(compare=False, repr=False)
+
+    @classmethod
+    def from_mapping(cls, soil_mapping: Dict[str, Soil]) -> "SoilRegistry":
+        """:param soil_mapping: Soil per UI name, see `Classification.soil_mapping`"""
+        names = tuple(soil_mapping)
+        return cls(soils=tuple(soil_mapping.values()), names=names, index={name: i for i, name in enumerate(names)})
+
+    def __len__(self) -> int:
+        return len(self.soils)
+
+    def get_indices(self, names: Sequence[str]) -> np.ndarray:
+        """Returns the index of each soil name"""
+        try:
+            return np.array([self.index[name] for name in names], dtype=np.intp)
+        except KeyError as e:
+            raise UserError(
+                f"'{e.args[0]}' is not available in the selected classification table.\n"
+                f"Please select a different table, or reclassify the CPT files"
+            )
+
+
+def _check_unit(unit: str) -> None:
+    if unit not in MILLIMETERS_PER_UNIT:
+        raise ValueError(f"Unknown unit '{unit}', expected one of {sorted(MILLIMETERS_PER_UNIT)}")
+
+
+def convert_unit(values, from_unit: str, to_unit: str):
+    """Converts values (floats or arrays) between units, e.g. -700 mm to -0.7 m"""
+    _check_unit(from_unit)
+    _check_unit(to_unit)
+    return values * MILLIMETERS_PER_UNIT[from_unit] / MILLIMETERS_PER_UNIT[to_unit]
+
+
+@dataclass(frozen=True)
+class LayoutArrays:
+    """Soil layout as layer boundaries in `unit` and a soil index per layer into `registry`."""
+
+    boundaries: np.ndarray  # tops of the layers from top to bottom, and the bottom of the lowest layer
+    soil_indices: np.ndarray
+    registry: SoilRegistry
+    unit: str
+
+    def __post_init__(self):
+        _check_unit(self.unit)
+
+    @property
+    def tops(self) -> np.ndarray:
+        return self.boundaries[:-1]
+
+    @property
+    def bottoms(self) -> np.ndarray:
+        return self.boundaries[1:]
+
+    @property
+    def thickness(self) -> np.ndarray:
+        return self.boundaries[:-1] - self.boundaries[1:]
+
+    @property
+    def nbytes(self) -> int:
+        return self.boundaries.nbytes + self.soil_indices.nbytes
+
+    def __len__(self) -> int:
+        return self.soil_indices.size
+
+    def is_close(self, other: "LayoutArrays", atol: float = 1e-6) -> bool:
+        """Returns whether both layouts have the same soils and boundaries, within `atol` in the unit of this layout"""
+        other = other.to_unit(self.unit)
+        return (
+            self.boundaries.shape == other.boundaries.shape
+            and np.array_equal(self.soil_indices, other.soil_indices)
+            and np.allclose(self.boundaries, other.boundaries, rtol=0, atol=atol)
+        )
+
+    def to_unit(self, unit: str) -> "LayoutArrays":
+        """Returns the layout with the boundaries in `unit`"""
+        if unit == self.unit:
+            return self
+        return LayoutArrays(convert_unit(self.boundaries, self.unit, unit), self.soil_indices, self.registry, unit)
+
+    @classmethod
+    def from_table(cls, rows: List[dict], bottom: float, registry: SoilRegistry, unit: str = "m") -> "LayoutArrays":
+        """Creates the layout from the rows of the soil layout table.
+
+        :param rows: Rows with the soil name and top of layer, from top to bottom
+        :param bottom: Bottom of the lowest layer
+        :param registry: Registry with the soils of the table
+        :param unit: Unit of the tops and the bottom
+        """
+        boundaries = np.array([row["top_of_layer"] for row in rows] + [bottom], dtype=np.float64)
+        return cls(boundaries, registry.get_indices([row["name"] for row in rows]), registry, unit)
+
+    @classmethod
+    def from_soil_layout(cls, soil_layout: SoilLayout, registry: SoilRegistry, unit: str = "mm") -> "LayoutArrays":
+        """Creates the layout from a SoilLayout of which the soils are in the registry (by UI name)."""
+        layers = soil_layout.layers
+        if not layers:
+            return cls(np.zeros(0), np.zeros(0, dtype=np.intp), registry, unit)
+        boundaries = np.array([layer.top_of_layer for layer in layers] + [layers[-1].bottom_of_layer])
+        names = [layer.soil.properties.get("ui_name") or layer.soil.name for layer in layers]
+        return cls(boundaries, registry.get_indices(names), registry, unit)
+
+    def filter_layers_on_thickness(
+        self, min_layer_thickness: float, merge_adjacent_same_soil_layers: bool = True
+    ) -> "LayoutArrays":
+        """Returns the layout without the layers thinner than `min_layer_thickness` (in the unit of the layout).
+
+        If all layers are thinner and add up to less than the minimum thickness, they become one layer.
+        (`SoilLayout.filter_layers_on_thickness` raises an IndexError in that case.)
+        """
+        return _filter_layers_on_thickness(self, min_layer_thickness, merge_adjacent_same_soil_layers)
+
+    def to_soil_layout(self, unit: str = "mm") -> SoilLayout:
+        """Returns the layout as VIKTOR SoilLayout in `unit`, with the Soil objects of the registry"""
+        layout = self.to_unit(unit)
+        soils = self.registry.soils
+        return SoilLayout(
+            [
+                SoilLayer(soils[soil_index], top, bottom)
+                for soil_index, top, bottom in zip(
+                    layout.soil_indices.tolist(), layout.tops.tolist(), layout.bottoms.tolist()
+                )
+            ]
+        )
+
+    def to_table_rows(self) -> List[dict]:
+        """Returns the rows of the soil layout table, with the tops in [m]"""
+        layout = self.to_unit("m")
+        names = self.registry.names
+        return [
+            {"name": names[soil_index], "top_of_layer": top}
+            for soil_index, top in zip(layout.soil_indices.tolist(), layout.tops.tolist())
+        ]
+
+
+def _get_thin_layer_groups(thickness: np.ndarray, min_layer_thickness: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the first layer of every group of layers, and whether the group is too thin to be a layer on its own.
+
+    Every layer that is at least the minimum thickness is a group of its own. The layers of a run of thin layers are
+    added to a group until the group reaches the minimum thickness; the rest of the run is the last group of the run.
+    """
+    thin = thickness < min_layer_thickness
+    group_starts = [np.flatnonzero(~thin)]
+    too_thin = [np.zeros(group_starts[0].size, dtype=bool)]
+    edges = np.flatnonzero(np.diff(np.r_[False, thin, False].astype(np.int8)))
+    for run_start, run_end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        start = run_start
+        while start < run_end:
+            # the group ends at the first layer at which its thickness reaches the minimum
+            end = start + int(np.searchsorted(np.cumsum(thickness[start:run_end]), min_layer_thickness)) + 1
+            group_starts.append(np.array([start]))
+            too_thin.append(np.array([end > run_end]))
+            start = end
+    group_starts, too_thin = np.concatenate(group_starts), np.concatenate(too_thin)
+    order = np.argsort(group_starts, kind="stable")
+    return group_starts[order], too_thin[order]
+
+
+def _filter_layers_on_thickness(layout: LayoutArrays, min_layer_thickness: float, merge: bool) -> LayoutArrays:
+    thickness, soil_indices = layout.thickness, layout.soil_indices
+    number_of_layers = soil_indices.size
+    if number_of_layers == 0:
+        return layout
+    group_starts, too_thin = _get_thin_layer_groups(thickness, min_layer_thickness)
+    group_ids = np.repeat(np.arange(group_starts.size), np.diff(np.r_[group_starts, number_of_layers]))
+
+    # the soil with the largest thickness in each group, the first of these soils on a tie
+    _, pairs = np.unique(group_ids * len(layout.registry) + soil_indices, return_inverse=True)
+    soil_totals = np.bincount(pairs, weights=thickness)[pairs]
+    is_dominant = soil_totals == np.maximum.reduceat(soil_totals, group_starts)[group_ids]
+    dominant_layers = np.where(is_dominant, np.arange(number_of_layers), number_of_layers)
+    group_soils = soil_indices[np.minimum.reduceat(dominant_layers, group_starts)]
+
+    # groups that are too thin are added to the group above, or below for the top group
+    starts = np.zeros(number_of_layers, dtype=bool)
+    starts[group_starts] = True
+    if group_starts.size > 1:
+        absorbed = np.flatnonzero(too_thin)
+        group_soils[absorbed] = group_soils[np.where(absorbed == 0, 1, absorbed - 1)]
+        starts[group_starts[absorbed]] = False
+        if too_thin[0]:
+            starts[0], starts[group_starts[1]] = True, False
+    layer_soils = group_soils[group_ids]
+
+    if merge:
+        starts &= np.r_[True, layer_soils[1:] != layer_soils[:-1]]
+    boundaries = np.r_[layout.boundaries[:-1][starts], layout.boundaries[-1:]]
+    return LayoutArrays(boundaries, layer_soils[starts], layout.registry, layout.unit)
+
+
+@dataclass(frozen=True)
+class ThicknessFilterLadder:
+    """Filtered layouts of one layout for a range of minimum layer thicknesses, in the unit of the layout"""
+
+    layout: LayoutArrays
+    thresholds: np.ndarray
+    filtered_layouts: Tuple[LayoutArrays, ...]
+
+    @classmethod
+    def from_layout(cls, layout: LayoutArrays, thresholds: Sequence[float]) -> "ThicknessFilterLadder":
+        """Filters the layout for every minimum thickness of `thresholds`.
+
+        Consecutive thresholds often give the same layout, which is then stored once.
+        """
+        thresholds = np.unique(np.asarray(thresholds, dtype=np.float64))
+        filtered_layouts: List[LayoutArrays] = []
+        for threshold in thresholds.tolist():
+            filtered = layout.filter_layers_on_thickness(threshold)
+            if filtered_layouts and _is_same_layout(filtered, filtered_layouts[-1]):
+                filtered = filtered_layouts[-1]
+            filtered_layouts.append(filtered)
+        return cls(layout, thresholds, tuple(filtered_layouts))
+
+    @property
+    def nbytes(self) -> int:
+        unique_layouts = {id(layout): layout for layout in self.filtered_layouts}
+        return self.layout.nbytes + self.thresholds.nbytes + sum(layout.nbytes for layout in unique_layouts.values())
+
+    def get(self, min_layer_thickness: float) -> LayoutArrays:
+        """Returns the filtered layout, precomputed if the minimum thickness is one of the thresholds."""
+        index = int(np.searchsorted(self.thresholds, min_layer_thickness))
+        if index < self.thresholds.size and self.thresholds[index] == min_layer_thickness:
+            return self.filtered_layouts[index]
+        return self.layout.filter_layers_on_thickness(min_layer_thickness)
+
+
+def _is_same_layout(layout: LayoutArrays, other: LayoutArrays) -> bool:
+    return np.array_equal(layout.boundaries, other.boundaries) and np.array_equal(
+        layout.soil_indices, other.soil_indices
+    )
+
+
+def convert_soil_layout_to_table_rows(soil_layout: SoilLayout, unit: str = "mm") -> List[dict]:
+    """Returns the rows of the soil layout table of a SoilLayout in `unit`, with the tops in [m]"""
+    return [
+        {"name": layer.soil.properties.ui_name, "top_of_layer": convert_unit(layer.top_of_layer, unit, "m")}
+        for layer in soil_layout.layers
+    ]
+
+
+def convert_serialized_soil_layout_to_table_rows(serialized_soil_layout: dict, unit: str = "mm") -> List[dict]:
+    """Returns the rows of the soil layout table of a serialized SoilLayout, without creating the SoilLayout."""
+    return [
+        {"name": layer["soil"]["properties"]["ui_name"], "top_of_layer": convert_unit(layer["top_of_layer"], unit, "m")}
+        for layer in serialized_soil_layout["layers"]
+    ]
+
+
+def convert_soil_layout_unit(soil_layout: SoilLayout, from_unit: str, to_unit: str) -> SoilLayout:
+    """Returns the SoilLayout with the boundaries in `to_unit`; the layers share the Soil objects of the input"""
+    return SoilLayout(
+        [
+            SoilLayer(
+                layer.soil,
+                convert_unit(layer.top_of_layer, from_unit, to_unit),
+                convert_unit(layer.bottom_of_layer, from_unit, to_unit),
+                layer.properties,
+            )
+            for layer in soil_layout.layers
+        ]
+    )
@@ -17,8 +17,9 @@ SOFTWARE.
 from copy import deepcopy
 from io import BytesIO, StringIO
 from math import ceil
-from typing import List, Union
+from typing import List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from munch import Munch, unmunchify
 from viktor import Color, UserError
 from viktor.geo import (
@@ -32,37 +33,32 @@ from viktor.geo import (
     TableMethod,
 )
 
-from .constants import ADDITIONAL_COLUMNS, DEFAULT_MIN_LAYER_THICKNESS
+from .cache import PARAMS_CACHE, LRUCache, content_hash
+from .constants import ADDITIONAL_COLUMNS, DEFAULT_MIN_LAYER_THICKNESS, MIN_LAYER_THICKNESS_LADDER
+from .classification_table import NO_MATCH, classify_with_table
+from .gef_reader import StreamedGEF, read_header
+from .instrumentation import stage
+from .measurement_data import MeasurementData, encode_measurement_data
+from .robertson import classify_robertson_zones, get_zone_soils
+from .soil_layout_arrays import (
+    LayoutArrays,
+    SoilRegistry,
+    ThicknessFilterLadder,
+    convert_serialized_soil_layout_to_table_rows,
+    convert_soil_layout_unit,
+)
+
+SOIL_REGISTRIES = LRUCache("soil_registries", max_bytes=8 * 1024**2)
 
 
 def convert_soil_layout_from_mm_to_meter(soil_layout: SoilLayout) -> SoilLayout:
-    """Converts the units of the SoilLayout from mm to m."""
-    serialization_dict = soil_layout.serialize()
-    for layer in serialization_dict["layers"]:
-        layer["top_of_layer"] = layer["top_of_layer"] / 1000
-        layer["bottom_of_layer"] = layer["bottom_of_layer"] / 1000
-    return SoilLayout.from_dict(serialization_dict)
+    """Converts the units of the SoilLayout from mm to m; the layers share the Soil objects of the input."""
+    return convert_soil_layout_unit(soil_layout, "mm", "m")
 
 
 def convert_soil_layout_from_meter_to_mm(soil_layout: SoilLayout) -> SoilLayout:
-    """Converts the units of the SoilLayout from m to mm."""
-    serialization_dict = soil_layout.serialize()
-    for layer in serialization_dict["layers"]:
-        layer["top_of_layer"] = layer["top_of_layer"] * 1000
-        layer["bottom_of_layer"] = layer["bottom_of_layer"] * 1000
-    return SoilLayout.from_dict(serialization_dict)
-
-
-def filter_nones_from_params_dict(raw_dict) -> dict:
-    """Removes all rows which contain one or more None-values"""
-    rows_to_be_removed = []
-    for row_index, items in enumerate(zip(*raw_dict["measurement_data"].values())):
-        if None in items:
-            rows_to_be_removed.append(row_index)
-    for row in reversed(rows_to_be_removed):
-        for signal in raw_dict["measurement_data"].keys():
-            del raw_dict["measurement_data"][signal][row]
-    return raw_dict
+    """Converts the units of the SoilLayout from m to mm; the layers share the Soil objects of the input."""
+    return convert_soil_layout_unit(soil_layout, "m", "mm")
 
 
 def convert_input_table_field_to_soil_layout(
@@ -76,22 +72,52 @@ def convert_input_table_field_to_soil_layout(
     :param soil_layers_from_table_input: Table where a row represents a layer.
     Each row should contain a soil name and top of layer [m].
     :param soils: Dictionary with soil names and their respective Soil.
-    :return: SoilLayout
+    :return: SoilLayout in [mm]
     """
-    bottom = bottom_of_soil_layout_user
-    soil_layers = []
-    for layer in reversed(soil_layers_from_table_input):
-        soil_name = layer["name"]
-        top_of_layer = layer["top_of_layer"]
-        try:
-            soil_layers.append(SoilLayer(soils[soil_name], top_of_layer, bottom))
-        except KeyError:
-            raise UserError(
-                f"'{soil_name}' is not available in the selected classification table.\n"
-                f"Please select a different table, or reclassify the CPT files"
-            )
-        bottom = top_of_layer  # Set bottom of next soil layer to top of current layer.
-    return convert_soil_layout_from_meter_to_mm(SoilLayout(soil_layers[::-1]))
+    registry = SoilRegistry.from_mapping(soils)
+    layout = LayoutArrays.from_table(soil_layers_from_table_input, bottom_of_soil_layout_user, registry, unit="m")
+    return layout.to_soil_layout("mm")
+
+
+def filter_input_table_field_on_thickness(
+    bottom_of_soil_layout_user: float,
+    soil_layers_from_table_input: List[dict],
+    registry: SoilRegistry,
+    min_layer_thickness: float,
+    soil_layout_original: Optional[dict] = None,
+) -> List[dict]:
+    """Returns the rows of the soil layout table without the layers that are thinner than the minimum thickness.
+
+    The original soil layout is filtered for every step of `MIN_LAYER_THICKNESS_LADDER` at once and cached per
+    original layout, so filtering the table after a classification or a reset only looks up the result. A table that
+    was edited or filtered before is filtered on the requested minimum thickness only.
+
+    :param bottom_of_soil_layout_user: Bottom of soil layout in [m]
+    :param soil_layers_from_table_input: Rows with the soil name and top of layer [m]
+    :param registry: Registry with the soils of the classification table, see `Classification.soil_registry`
+    :param min_layer_thickness: Minimum layer thickness in [mm]
+    :param soil_layout_original: Serialized original soil layout in [mm], see `get_soil_layout_results`
+    """
+    layout = LayoutArrays.from_table(
+        soil_layers_from_table_input, bottom_of_soil_layout_user, registry, unit="m"
+    ).to_unit("mm")
+    if soil_layout_original is None:
+        return layout.filter_layers_on_thickness(min_layer_thickness).to_table_rows()
+
+    def create() -> ThicknessFilterLadder:
+        original_rows = convert_serialized_soil_layout_to_table_rows(soil_layout_original, unit="mm")
+        original = LayoutArrays.from_table(original_rows, bottom_of_soil_layout_user, registry, unit="m")
+        minimum, maximum, step = MIN_LAYER_THICKNESS_LADDER
+        return ThicknessFilterLadder.from_layout(original.to_unit("mm"), np.arange(minimum, maximum + step / 2, step))
+
+    key = (
+        "thickness_filter_ladder",
+        content_hash(bottom_of_soil_layout_user, soil_layout_original, registry.names),
+    )
+    ladder = PARAMS_CACHE.get_or_create(key, create)
+    if layout.is_close(ladder.layout):
+        return ladder.get(min_layer_thickness).to_table_rows()
+    return layout.filter_layers_on_thickness(min_layer_thickness).to_table_rows()
 
 
 def convert_soil_layout_to_input_table_field(soil_layout: SoilLayout) -> List[dict]:
@@ -101,6 +127,71 @@ def convert_soil_layout_to_input_table_field(soil_layout: SoilLayout) -> List[di
     ]
 
 
+def convert_classification_to_soil_layout(
+    elevation: Sequence[float], soil_indices: Sequence[int], soils: Sequence[Soil]
+) -> SoilLayout:
+    """Creates a SoilLayout from the classified samples, by merging consecutive samples of the same soil into a layer.
+
+    :param elevation: Elevation of each sample in [mm], ordered from top to bottom
+    :param soil_indices: Index into `soils` for each sample
+    :param soils: Soils that are referred to by the indices
+    :return: SoilLayout in [mm]
+    """
+    elevation = np.asarray(elevation, dtype=np.float64)
+    soil_indices = np.asarray(soil_indices)
+    if elevation.size == 0:
+        raise UserError("The CPT has no valid measurements to classify")
+    # run-length encoding: a layer starts at every sample of which the soil differs from the sample above
+    starts = np.flatnonzero(np.concatenate(([True], soil_indices[1:] != soil_indices[:-1])))
+    tops = elevation[starts]
+    bottoms = np.append(tops[1:], elevation[-1])
+    layers = tops > bottoms  # a run that only consists of the last sample has no thickness
+    return SoilLayout(
+        [
+            SoilLayer(soils[soil_index], top, bottom)
+            for soil_index, top, bottom in zip(
+                soil_indices[starts][layers].tolist(), tops[layers].tolist(), bottoms[layers].tolist()
+            )
+        ]
+    )
+
+
+def _get_soil_names_at(soil_layout: SoilLayout, depths: np.ndarray) -> np.ndarray:
+    """Returns the soil name at each depth, an empty string below the soil layout."""
+    bottoms = np.array([layer.bottom_of_layer for layer in soil_layout.layers])
+    names = np.array([layer.soil.name for layer in soil_layout.layers] + [""])
+    # layers are ordered from top to bottom, so the bottoms are descending
+    return names[np.searchsorted(-bottoms, -depths, side="right")]
+
+
+def compare_soil_layouts(soil_layout: SoilLayout, reference_soil_layout: SoilLayout, step: float = 10) -> float:
+    """Returns the fraction of the depth of the reference over which both soil layouts have the same soil.
+
+    The soil layouts are compared on the soil names, at depth intervals of `step` (in the unit of the layouts). This
+    can be used to verify a classification against a reference classification of the same CPT.
+    """
+    depths = np.arange(reference_soil_layout.top, reference_soil_layout.bottom, -step)
+    if depths.size == 0:
+        return 1.0
+    return float(np.mean(_get_soil_names_at(soil_layout, depths) == _get_soil_names_at(reference_soil_layout, depths)))
+
+
+def get_soil_layout_results(soil_layout_obj: SoilLayout) -> dict:
+    """Returns the params of the original and the (filtered) interpreted soil layout of a classified CPT.
+
+    :param soil_layout_obj: SoilLayout in [mm] as result of the classification
+    """
+    soils = {layer.soil.properties.ui_name: layer.soil for layer in soil_layout_obj.layers}
+    layout = LayoutArrays.from_soil_layout(soil_layout_obj, SoilRegistry.from_mapping(soils), unit="mm")
+    # the original soil layout is stored filtered on the default minimum thickness, which keeps the params small
+    soil_layout_filtered = layout.filter_layers_on_thickness(DEFAULT_MIN_LAYER_THICKNESS)
+    return {
+        "soil_layout_original": soil_layout_filtered.to_soil_layout("mm").serialize(),
+        "bottom_of_soil_layout_user": ceil(soil_layout_obj.bottom) / 1e3,
+        "soil_layout": soil_layout_filtered.to_table_rows(),
+    }
+
+
 def convert_to_color(rgb: Union[str, tuple]) -> Color:
     """Simple conversion function that always returns a Color object"""
     if isinstance(rgb, tuple):
@@ -137,22 +228,45 @@ def _update_color_string(classification_table: List[dict]) -> List[dict]:
     return classification_table
 
 
+def _prepare_classification_table(method: str, classification_table: List[dict]) -> Tuple[List[dict], SoilRegistry]:
+    """Returns the cleaned up table and the registry of its soils, without altering the rows of the input"""
+    table = [dict(row) for row in classification_table]
+    table = _update_color_string(table) if method == "robertson" else _update_classification_table(table)
+    soil_mapping = {}
+    for row in table:
+        properties = deepcopy(row)
+        if method == "robertson":
+            del properties["color"]
+        soil_mapping[row["ui_name"]] = Soil(row["name"], convert_to_color(row["color"]), properties=properties)
+    return table, SoilRegistry.from_mapping(soil_mapping)
+
+
 class Classification:
     """This class handles all logic related to selecting the correct method and table for classification of CPTData.
 
-    It also provides the correct soil mapping needs for the visualizations of the soil layers.
+    It also provides the correct soil mapping needs for the visualizations of the soil layers. The cleaned up table
+    and the Soil objects are created once per classification table, and shared by all instances with the same table.
     """
 
     def __init__(self, classification_params: Munch):
-        self._method = classification_params.method
-        self._table = unmunchify(classification_params.get(self._method))
+        self._method = classification_params["method"]
+        self._raw_table = classification_params.get(self._method)
+        self.key = content_hash(self._method, self._raw_table)
+
+    def _get_prepared_table(self) -> Tuple[List[dict], SoilRegistry]:
+        return SOIL_REGISTRIES.get_or_create(
+            self.key, lambda: _prepare_classification_table(self._method, unmunchify(self._raw_table))
+        )
 
     @property
     def table(self) -> List[dict]:
         """Returns a cleaned up table that can be used for the Classification methods"""
-        if self._method == "robertson":
-            return _update_color_string(self._table)
-        return _update_classification_table(self._table)
+        return [dict(row) for row in self._get_prepared_table()[0]]
+
+    @property
+    def soil_registry(self) -> SoilRegistry:
+        """Returns the Soil objects of the table with their index, shared by all instances with the same table"""
+        return self._get_prepared_table()[1]
 
     def method(self, ground_water_level) -> Union[TableMethod, RobertsonMethod]:
         """Returns the appropriate _ClassificationMethod for the CPTData.classify() function"""
@@ -183,21 +297,16 @@ class Classification:
     @property
     def soil_mapping(self) -> dict:
         """Returns a mapping between the soil name visible in the UI and the Soil object used in the logic"""
-        soil_mapping = {}
-        for soil in self.table:
-            ui_name = soil["ui_name"]
-            properties = deepcopy(soil)
-            if self._method == "robertson":
-                del properties["color"]
-            soil_mapping[ui_name] = Soil(soil["name"], convert_to_color(soil["color"]), properties=properties)
-        return soil_mapping
+        registry = self.soil_registry
+        return dict(zip(registry.names, registry.soils))
 
     def classify_cpt_file(self, cpt_file: GEFFile, saved_ground_water_level=None) -> dict:
         """Classify an uploaded CPT File based on the selected _ClassificationMethod"""
 
         try:
             # Parse the GEF file content
-            cpt_data_object = cpt_file.parse(additional_columns=ADDITIONAL_COLUMNS, return_gef_data_obj=True)
+            with stage("parse"):
+                cpt_data_object = cpt_file.parse(additional_columns=ADDITIONAL_COLUMNS, return_gef_data_obj=True)
 
             # Get the water level from user input, or calculate it from GEF
             if saved_ground_water_level is not None:
@@ -206,28 +315,92 @@ class Classification:
                 ground_water_level = get_water_level(cpt_data_object)
 
             # Classify the CPTData object to get a SoilLayout
-            soil_layout_obj = cpt_data_object.classify(
-                method=self.method(ground_water_level), return_soil_layout_obj=True
-            )
+            with stage("classification"):
+                soil_layout_obj = cpt_data_object.classify(
+                    method=self.method(ground_water_level), return_soil_layout_obj=True
+                )
 
         except GEFParsingException as e:
             raise UserError(f"CPT Parsing: {str(e)}")
         except GEFClassificationError as e:
             raise UserError(f"CPT Classification: {str(e)}")
 
-        soil_layout_filtered = soil_layout_obj.filter_layers_on_thickness(
-            min_layer_thickness=DEFAULT_MIN_LAYER_THICKNESS,
-            merge_adjacent_same_soil_layers=True,
-        )
-        soil_layout_filtered_in_m = convert_soil_layout_from_mm_to_meter(soil_layout_filtered)
-
         # Serialize the parsed CPT File content and update it with the new soil layout
-        cpt_dict = cpt_data_object.serialize()
-        cpt_dict["soil_layout_original"] = soil_layout_obj.serialize()
-        cpt_dict["bottom_of_soil_layout_user"] = ceil(soil_layout_obj.bottom) / 1e3
-        cpt_dict["soil_layout"] = convert_soil_layout_to_input_table_field(soil_layout_filtered_in_m)
+        with stage("serialize"):
+            cpt_dict = cpt_data_object.serialize()
+            # the void values of the GEF file are stored as missing values, and removed with the incomplete rows
+            signal_voids = read_header(iter(cpt_file.file_content.splitlines())).signal_voids
+            cpt_dict["measurement_data"] = encode_measurement_data(
+                cpt_dict["measurement_data"], signal_voids=signal_voids
+            )
+        with stage("layout_conversion"):
+            cpt_dict.update(get_soil_layout_results(soil_layout_obj))
         cpt_dict["ground_water_level"] = ground_water_level
         cpt_dict["x_rd"] = cpt_dict["headers"]["x_y_coordinates"][0] if "x_y_coordinates" in cpt_dict["headers"] else 0
         cpt_dict["y_rd"] = cpt_dict["headers"]["x_y_coordinates"][1] if "x_y_coordinates" in cpt_dict["headers"] else 0
         cpt_dict["gef"] = {"cpt_data": {"min_layer_thicknes": DEFAULT_MIN_LAYER_THICKNESS}}
         return cpt_dict
+
+    def classify_streamed_gef(self, streamed_gef: StreamedGEF, saved_ground_water_level=None) -> dict:
+        """Classify a GEF file read by `gef_reader.read_gef` in-process, without the GEF parser of the SDK.
+
+        Returns the same params as `classify_cpt_file`, with the headers that the app uses. The phreatic level is read
+        from the header, or 1 m below the ground level, as in `get_water_level`.
+        """
+        header = streamed_gef.header
+        ground_level = header.ground_level
+        if saved_ground_water_level is not None:
+            ground_water_level = saved_ground_water_level
+        elif header.water_level is not None:
+            ground_water_level = header.water_level
+        else:
+            ground_water_level = ground_level - 1
+        measurement_data = streamed_gef.to_measurement_data()
+        with stage("classification"):
+            soil_layout = self.classify_measurement_data(measurement_data.drop_incomplete_rows(), ground_water_level)
+
+        x_y_coordinates = header.x_y_coordinates
+        headers = {
+            "name": header.name,
+            "ground_level_wrt_reference": ground_level * 1e3,
+            "ground_level_wrt_reference_m": ground_level,
+            "height_system": header.height_system,
+        }
+        if x_y_coordinates is not None:
+            headers["x_y_coordinates"] = list(x_y_coordinates)
+        cpt_dict = {"measurement_data": measurement_data.encode(), "headers": headers}
+        with stage("layout_conversion"):
+            cpt_dict.update(get_soil_layout_results(soil_layout))
+        cpt_dict["ground_water_level"] = ground_water_level
+        cpt_dict["x_rd"], cpt_dict["y_rd"] = x_y_coordinates or (0, 0)
+        cpt_dict["gef"] = {"cpt_data": {"min_layer_thicknes": DEFAULT_MIN_LAYER_THICKNESS}}
+        return cpt_dict
+
+    def classify_measurement_data(self, measurement_data: MeasurementData, ground_water_level: float) -> SoilLayout:
+        """Classify the stored measurement data of a CPT in-process, without parsing the GEF file again.
+
+        :param measurement_data: Measurement data without missing values, ordered from top to bottom
+        :param ground_water_level: Phreatic level in [m]
+        :return: SoilLayout in [mm]
+        """
+        if self._method == "robertson":
+            zones = classify_robertson_zones(
+                measurement_data.qc, measurement_data.Rf, measurement_data.elevation / 1e3, ground_water_level
+            )
+            zone_soils = get_zone_soils(self.table, self.soil_mapping)
+            return convert_classification_to_soil_layout(measurement_data.elevation, zones, zone_soils)
+        if self._method == "table":
+            table = self.table
+            row_indices = classify_with_table(
+                table,
+                qc=measurement_data.qc,
+                rf=measurement_data.Rf,
+                elevation=measurement_data.elevation / 1e3,
+                ground_water_level=ground_water_level,
+            )
+            if np.all(row_indices == NO_MATCH):
+                raise UserError("CPT Classification: none of the measurements match a row of the classification table")
+            soils = self.soil_mapping
+            row_soils = [soils[row["ui_name"]] for row in table]
+            return convert_classification_to_soil_layout(measurement_data.elevation, row_indices, row_soils)
+        raise UserError(f"Reclassification with the {self._method} method has not yet been implemented")
@@ -0,0 +1,116 @@
+"""Vertical total and effective stress profiles from a soil layout and a phreatic level.
+
+The total stress at every layer boundary is computed once with a cumulative sum over the layer thicknesses, with the
+phreatic level inserted as an extra boundary so that the stress is linear between consecutive boundaries. The stress at
+any elevation is then a linear interpolation between the two surrounding boundaries.
+"""
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+from viktor.geo import SoilLayout
+
+from .cache import PARAMS_CACHE
+
+UNIT_WEIGHT_WATER = 10  # [kN/m3]
+
+
+@dataclass(frozen=True)
+class StressProfile:
+    """Vertical stresses along a soil column.
+
+    `boundaries` are the elevations [m] of the layer boundaries (including the phreatic level when it lies within the
+    soil column) ordered from top to bottom, and `total_stress` the vertical total stress [kPa] at each boundary.
+    """
+
+    boundaries: np.ndarray
+    total_stress: np.ndarray
+    ground_water_level: float
+
+    @classmethod
+    def from_layers(
+        cls,
+        tops: Sequence[float],
+        bottoms: Sequence[float],
+        gamma_dry: Sequence[float],
+        gamma_wet: Sequence[float],
+        ground_water_level: float,
+    ) -> "StressProfile":
+        """Computes the profile of contiguous layers, ordered from top to bottom.
+
+        :param tops: Top of each layer in [m]
+        :param bottoms: Bottom of each layer in [m]
+        :param gamma_dry: Unit weight above the phreatic level of each layer in [kN/m3]
+        :param gamma_wet: Unit weight below the phreatic level of each layer in [kN/m3]
+        :param ground_water_level: Phreatic level in [m]
+        """
+        tops, bottoms = np.asarray(tops, dtype=np.float64), np.asarray(bottoms, dtype=np.float64)
+        gamma_dry, gamma_wet = np.asarray(gamma_dry, dtype=np.float64), np.asarray(gamma_wet, dtype=np.float64)
+
+        # split every layer at the phreatic level, into a (possibly empty) dry part and wet part
+        split = np.clip(ground_water_level, bottoms, tops)
+        weight_per_layer = gamma_dry * (tops - split) + gamma_wet * (split - bottoms)
+        boundaries = np.concatenate((tops[:1], bottoms))
+        total_stress = np.concatenate(([0.0], np.cumsum(weight_per_layer)))
+
+        within_column = boundaries[-1] < ground_water_level < boundaries[0] if boundaries.size > 1 else False
+        if within_column and not np.isin(ground_water_level, boundaries):
+            position = np.searchsorted(-boundaries, -ground_water_level)
+            layer = position - 1
+            stress_at_water_level = total_stress[layer] + gamma_dry[layer] * (tops[layer] - ground_water_level)
+            boundaries = np.insert(boundaries, position, ground_water_level)
+            total_stress = np.insert(total_stress, position, stress_at_water_level)
+        return cls(boundaries=boundaries, total_stress=total_stress, ground_water_level=ground_water_level)
+
+    def total_stress_at(self, elevation: Sequence[float]) -> np.ndarray:
+        """Vertical total stress [kPa] at the elevations [m]; constant extrapolation outside the soil column"""
+        # np.interp needs ascending x-values, the boundaries are descending
+        return np.interp(np.asarray(elevation, dtype=np.float64), self.boundaries[::-1], self.total_stress[::-1])
+
+    def pore_pressure_at(self, elevation: Sequence[float]) -> np.ndarray:
+        """Hydrostatic pore pressure [kPa] at the elevations [m]"""
+        return UNIT_WEIGHT_WATER * np.maximum(self.ground_water_level - np.asarray(elevation, dtype=np.float64), 0)
+
+    def effective_stress_at(self, elevation: Sequence[float]) -> np.ndarray:
+        """Vertical effective stress [kPa] at the elevations [m]"""
+        return self.total_stress_at(elevation) - self.pore_pressure_at(elevation)
+
+    @property
+    def nbytes(self) -> int:
+        return self.boundaries.nbytes + self.total_stress.nbytes
+
+
+def get_sample_stress_profile(
+    elevation: np.ndarray, gamma_dry: np.ndarray, gamma_wet: np.ndarray, ground_water_level: float
+) -> StressProfile:
+    """Returns the profile for CPT samples, where each sample represents the soil between the midpoints to its
+    neighbours.
+
+    :param elevation: Elevation of each sample in [m], ordered from top to bottom
+    """
+    midpoints = (elevation[1:] + elevation[:-1]) / 2
+    tops = np.concatenate((elevation[:1], midpoints))
+    bottoms = np.concatenate((midpoints, elevation[-1:]))
+    return StressProfile.from_layers(tops, bottoms, gamma_dry, gamma_wet, ground_water_level)
+
+
+
+def get_stress_profile(soil_layout: SoilLayout, ground_water_level: float, soil_layout_key: str) -> StressProfile:
+    """Returns the stress profile of a SoilLayout in [mm], cached per soil layout and phreatic level.
+
+    The unit weights are taken from the `gamma_dry` and `gamma_wet` properties of the soils.
+
+    :param soil_layout_key: Content hash of the params the soil layout is created from, see `CPTKeys.soil_layout_user`
+    """
+
+    def create() -> StressProfile:
+        layers = soil_layout.layers
+        return StressProfile.from_layers(
+            tops=np.array([layer.top_of_layer for layer in layers]) / 1e3,
+            bottoms=np.array([layer.bottom_of_layer for layer in layers]) / 1e3,
+            gamma_dry=[layer.soil.properties.get("gamma_dry") or 0 for layer in layers],
+            gamma_wet=[layer.soil.properties.get("gamma_wet") or 0 for layer in layers],
+            ground_water_level=ground_water_level,
+        )
+
+    return PARAMS_CACHE.get_or_create(("stress_profile", soil_layout_key, float(ground_water_level)), create)
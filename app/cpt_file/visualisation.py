@@ -1,31 +1,156 @@
+from functools import cached_property
 from math import floor
-import math
+from typing import List, Optional, Tuple
+
 import numpy as np
 from munch import Munch, unmunchify
 from plotly import graph_objects as go
 from plotly.subplots import make_subplots
-from viktor.geo import GEFData, SoilLayout
+from viktor import UserError
+from viktor.geo import SoilLayout
 
+from .cache import PARAMS_CACHE, content_hash
+from .constants import MAX_SLIDER_HEATMAP_POINTS, PILE_DIAMETER_RANGE, PILE_LENGTH_RANGE
 from .soil_layout_conversion_functions import (
     Classification,
     convert_input_table_field_to_soil_layout,
-    filter_nones_from_params_dict,
+)
+from .damage import Buildings, DamageAssessment, screen_buildings
+from .decimation import DEFAULT_TARGET_POINTS, decimate_indices
+from .figure_templates import FigureTemplate, get_figure_template
+from .instrumentation import stage
+from .measurement_data import MeasurementData
+from .koppejan import PILE_CLASS_FACTORS, calculate_koppejan_base_resistance
+from .layer_statistics import STATISTIC_SIGNALS, LayerStatistics, calculate_layer_statistics
+from .lcpc import LCPCSoilProfile, get_pile_category
+from .pile_capacity import (
+    BearingCapacityProfile,
+    PileCapacity,
+    PileDesignSweep,
+    calculate_bearing_capacity_profile,
+    solve_required_tip_level,
+    sweep_pile_designs,
+)
+from .stress_profile import StressProfile, get_stress_profile
+from .settlement import (
+    SettlementCube,
+    TransverseTrough,
+    calculate_longitudinal_settlement,
+    get_layer_trough_width_parameters,
+    get_surface_grid,
+    get_weighted_trough_width_parameter,
 )
 
-def visualise_cpt(cpt_params: Munch):
 
-    # parse input file and user input
-    classification = Classification(cpt_params.classification)
-    cpt_params = unmunchify(cpt_params)
-    parsed_cpt = GEFData(filter_nones_from_params_dict(cpt_params))
-    soil_layout_original = SoilLayout.from_dict(cpt_params["soil_layout_original"])
-    soil_layout_user = convert_input_table_field_to_soil_layout(
-        bottom_of_soil_layout_user=cpt_params["bottom_of_soil_layout_user"],
-        soil_layers_from_table_input=cpt_params["soil_layout"],
-        soils=classification.soil_mapping,
+class CPTKeys:
+    """Content hashes of the params of a CPT, used in the keys of the cached objects.
+
+    Every hash is calculated on first use, so one instance per request hashes each part of the params at most once.
+    """
+
+    def __init__(self, cpt_params: Munch):
+        self._cpt_params = cpt_params
+
+    @cached_property
+    def measurement_data(self) -> str:
+        return content_hash(self._cpt_params["measurement_data"])
+
+    @cached_property
+    def soil_layout_original(self) -> str:
+        return content_hash(self._cpt_params["soil_layout_original"])
+
+    @cached_property
+    def soil_layout_user(self) -> str:
+        """Hash of the classification table, the bottom and the table rows of the interpreted soil layout"""
+        classification_key = Classification(self._cpt_params["classification"]).key
+        return content_hash(
+            classification_key, self._cpt_params["bottom_of_soil_layout_user"], self._cpt_params["soil_layout"]
+        )
+
+
+def get_measurement_data(cpt_params: Munch, keys: Optional[CPTKeys] = None) -> MeasurementData:
+    """Returns the complete rows of the measurement data, cached on the stored measurement data."""
+
+    def decode_measurement_data() -> MeasurementData:
+        with stage("decode_measurement_data"):
+            return MeasurementData.from_params(cpt_params).drop_incomplete_rows()
+
+    keys = keys or CPTKeys(cpt_params)
+    return PARAMS_CACHE.get_or_create(("measurement_data", keys.measurement_data), decode_measurement_data)
+
+
+def get_soil_layout_user(cpt_params: Munch, keys: Optional[CPTKeys] = None) -> SoilLayout:
+    """Returns the interpreted soil layout, cached on the classification table and the soil layout table."""
+
+    def convert_soil_layout_user() -> SoilLayout:
+        with stage("layout_conversion"):
+            return convert_input_table_field_to_soil_layout(
+                bottom_of_soil_layout_user=cpt_params["bottom_of_soil_layout_user"],
+                soil_layers_from_table_input=unmunchify(cpt_params["soil_layout"]),
+                soils=Classification(cpt_params["classification"]).soil_mapping,
+            )
+
+    keys = keys or CPTKeys(cpt_params)
+    return PARAMS_CACHE.get_or_create(("soil_layout_user", keys.soil_layout_user), convert_soil_layout_user)
+
+
+def get_parsed_cpt_data(
+    cpt_params: Munch, keys: Optional[CPTKeys] = None
+) -> Tuple[MeasurementData, SoilLayout, SoilLayout]:
+    """Returns the measurement data and the original and user soil layouts of the CPT.
+
+    The objects are cached on a content hash of the params they are created from, so they are only rebuilt when the
+    measurement data, the classification table or the soil layout table have changed. The returned objects are shared
+    between calls and should not be altered.
+
+    :param keys: Content hashes of the params, which are calculated if not given
+    """
+
+    def convert_soil_layout_original() -> SoilLayout:
+        with stage("layout_conversion"):
+            return SoilLayout.from_dict(unmunchify(cpt_params["soil_layout_original"]))
+
+    keys = keys or CPTKeys(cpt_params)
+    soil_layout_original = PARAMS_CACHE.get_or_create(
+        ("soil_layout_original", keys.soil_layout_original), convert_soil_layout_original
     )
+    return get_measurement_data(cpt_params, keys), soil_layout_original, get_soil_layout_user(cpt_params, keys)
+
+
+def get_user_stress_profile(cpt_params: Munch, keys: Optional[CPTKeys] = None) -> StressProfile:
+    """Returns the vertical stresses along the interpreted soil layout, cached on the soil layout table and the
+    phreatic level, so that the views share one profile."""
+    keys = keys or CPTKeys(cpt_params)
+    soil_layout_user = get_soil_layout_user(cpt_params, keys)
+    return get_stress_profile(soil_layout_user, cpt_params["ground_water_level"], keys.soil_layout_user)
+
+
+def get_layer_statistics(cpt_params: Munch, keys: Optional[CPTKeys] = None) -> LayerStatistics:
+    """Returns the statistics of the measurements per layer of the interpreted soil layout.
+
+    The statistics are cached on the measurement data and the soil layout table, so they are only calculated again
+    when the layout changes.
+    """
+    keys = keys or CPTKeys(cpt_params)
 
-    # Create plotly figure
+    def create() -> LayerStatistics:
+        parsed_cpt, soil_layout_user = get_measurement_data(cpt_params, keys), get_soil_layout_user(cpt_params, keys)
+        with stage("layer_statistics"):
+            layers = soil_layout_user.layers
+            return calculate_layer_statistics(
+                elevation=parsed_cpt.elevation * 1e-3,
+                signals={signal: parsed_cpt[signal] for signal in STATISTIC_SIGNALS if signal in parsed_cpt},
+                tops=[layer.top_of_layer * 1e-3 for layer in layers],
+                bottoms=[layer.bottom_of_layer * 1e-3 for layer in layers],
+                names=[layer.soil.properties.ui_name for layer in layers],
+            )
+
+    key = ("layer_statistics", keys.measurement_data, keys.soil_layout_user)
+    return PARAMS_CACHE.get_or_create(key, create)
+
+
+def build_cpt_figure_template() -> FigureTemplate:
+    """Builds the layout of the CPT interpretation view, with the phreatic level in every subplot at level 0"""
     fig = make_subplots(
         rows=1,
         cols=3,
@@ -34,76 +159,76 @@ def visualise_cpt(cpt_params: Munch):
         column_widths=[3.5, 1.5, 2],
         subplot_titles=("Cone Resistance", "Friction ratio", "Soil Layout")
     )
+    fig.add_hline(
+        y=0,
+        line=dict(color="Blue", dash="dash", width=1),
+        row="all",
+        col="all",
+        exclude_empty_subplots=False,
+    )
+    update_fig_layout(fig)
+    return FigureTemplate.from_figure(fig, rows=1, cols=3)
 
-    # add left side of the figure: Qc and Rf plot
-    fig.add_trace(  # Add the qc curve
-        go.Scatter(
+
+def get_depth_axes_updates(template: FigureTemplate, parsed_cpt: MeasurementData) -> dict:
+    """Returns the layout updates that start the ticks of the depth axes of all subplots at the bottom of the CPT"""
+    tick0 = floor(parsed_cpt.elevation[-1] / 1e3) - 5
+    return {yaxis: {"tick0": tick0} for _, yaxis in template.axes.values()}
+
+
+def visualise_cpt(
+    cpt_params: Munch, target_points: int = DEFAULT_TARGET_POINTS, keys: Optional[CPTKeys] = None
+) -> dict:
+    """Returns the figure of the CPT interpretation view as dict, see `figure_templates.figure_to_json`"""
+    # parse input file and user input
+    keys = keys or CPTKeys(cpt_params)
+    parsed_cpt, soil_layout_original, soil_layout_user = get_parsed_cpt_data(cpt_params, keys)
+    layer_statistics = get_layer_statistics(cpt_params, keys)
+    with stage("unmunchify"):
+        cpt_params = unmunchify(cpt_params)
+    elevation = parsed_cpt.elevation * 1e-3
+    qc_indices = decimate_indices(elevation, parsed_cpt.qc, target_points=target_points)
+    rf_indices = decimate_indices(elevation, parsed_cpt.Rf, target_points=target_points)
+
+    template = get_figure_template("cpt", build_cpt_figure_template)
+    traces = [
+        template.trace(  # the qc curve
+            1,
+            1,
+            type="scatter",
             name="Cone Resistance",
-            x=parsed_cpt.qc,
-            y=[el * 1e-3 for el in parsed_cpt.elevation],
+            x=parsed_cpt.qc[qc_indices],
+            y=elevation[qc_indices],
             mode="lines",
             line=dict(color="mediumblue", width=1),
             legendgroup="Cone Resistance",
         ),
-        row=1,
-        col=1,
-    )
-
-    fig.add_trace(  # Add the Rf curve
-        go.Scatter(
+        template.trace(  # the Rf curve
+            1,
+            2,
+            type="scatter",
             name="Friction ratio",
-            x=[rfval * 100 if rfval else rfval for rfval in parsed_cpt.Rf],
-            y=[el * 1e-3 if el else el for el in parsed_cpt.elevation],
+            x=parsed_cpt.Rf[rf_indices] * 100,
+            y=elevation[rf_indices],
             mode="lines",
             line=dict(color="red", width=1),
             legendgroup="Friction ratio",
         ),
-        row=1,
-        col=2,
-    )
-
-    # add the bars on the right side of the plot
-    add_soil_layout_to_fig(fig, soil_layout_original, soil_layout_user)
-
-    # plot phreatic level
-    fig.add_hline(
-        y=cpt_params["ground_water_level"],
-        line=dict(color="Blue", dash="dash", width=1),
-        row="all",
-        col="all",
-    )
+        # the bars on the right side of the plot
+        *get_soil_layout_traces(template, soil_layout_original, soil_layout_user, layer_statistics),
+    ]
 
-    update_fig_layout(fig, parsed_cpt)
-    return fig
-
-def visualise_pile(cpt_params: Munch, PILE_params: Munch):
-    # parse input file and user input
-    classification = Classification(cpt_params.classification)
-    PILE_params = unmunchify(PILE_params)
-    cpt_params = unmunchify(cpt_params)
-
-    load = PILE_params["Load"]
+    # the phreatic level
+    ground_water_level = cpt_params["ground_water_level"]
+    layout_updates = get_depth_axes_updates(template, parsed_cpt)
+    layout_updates["shapes"] = [
+        {**shape, "y0": ground_water_level, "y1": ground_water_level} for shape in template.layout["shapes"]
+    ]
+    return template.create_figure(traces, layout_updates)
 
-    parsed_cpt = GEFData(filter_nones_from_params_dict(cpt_params))
-    soil_layout_original = SoilLayout.from_dict(cpt_params["soil_layout_original"])
-    soil_layout_user = convert_input_table_field_to_soil_layout(
-        bottom_of_soil_layout_user=cpt_params["bottom_of_soil_layout_user"],
-        soil_layers_from_table_input=cpt_params["soil_layout"],
-        soils=classification.soil_mapping,
-    )
-
-    qc = [q for q in parsed_cpt.qc]
-    Shaft = [138 * (1 - math.exp(-0.21)) * q for q in parsed_cpt.qc]
-    # window_size = 1.5 * cpt_params.PILE.Diameter*100
-    window_size = 150
-    Base = [sum(qc[i:i + window_size]) / window_size for i in range(len(qc) - window_size + 1)]
-    Overall = Shaft + Base
-
-    # closest_bearing_strength = min(parsed_results["Bearing Strength GT1B"], key=lambda x: abs(x - max_rz))
-    # index_closest_bearing_strength = parsed_results["Bearing Strength GT1B"].index(closest_bearing_strength)
-    # required_pile_tip_level = parsed_results["Depth"][index_closest_bearing_strength]
 
-    # Create plotly figure
+def build_pile_figure_template() -> FigureTemplate:
+    """Builds the layout of the pile design view"""
     fig = make_subplots(
         rows=1,
         cols=3,
@@ -112,74 +237,464 @@ def visualise_pile(cpt_params: Munch, PILE_params: Munch):
         column_widths=[0.3, 0.3, 0.3],
         subplot_titles=("Ultimate Shaft Resistance", "Ultimate Base Resistance", "Overall Pile Capacity"),
     )
+    update_pile_fig_layout(fig)
+    return FigureTemplate.from_figure(fig, rows=1, cols=3)
 
-    fig.add_trace(  # Add the shaft
-        go.Scatter(
+
+def visualise_pile(
+    cpt_params: Munch,
+    PILE_params: Munch,
+    target_points: int = DEFAULT_TARGET_POINTS,
+    keys: Optional[CPTKeys] = None,
+) -> dict:
+    """Returns the figure of the pile design view as dict, see `figure_templates.figure_to_json`"""
+    # parse input file and user input
+    keys = keys or CPTKeys(cpt_params)
+    parsed_cpt = get_measurement_data(cpt_params, keys)
+    with stage("unmunchify"):
+        PILE_params = unmunchify(PILE_params)
+        cpt_params = unmunchify(cpt_params)
+
+    load = PILE_params["Load"]
+
+    capacity, profile = get_pile_capacity(cpt_params, PILE_params, keys)
+    required_pile_tip_level = solve_required_tip_level(profile, load)
+    indices = decimate_indices(capacity.elevation, capacity.shaft, capacity.base, target_points=target_points)
+    profile_indices = decimate_indices(profile.elevation, profile.total, target_points=target_points)
+
+    template = get_figure_template("pile", build_pile_figure_template)
+    traces = [
+        template.trace(  # the shaft
+            1,
+            1,
+            type="scatter",
             name="Ultimate Shaft Resistance",
-            x=Shaft,
-            y=[el * 1e-3 for el in parsed_cpt.elevation],
+            x=capacity.shaft[indices],
+            y=capacity.elevation[indices],
             mode="lines",
             line=dict(color="mediumblue", width=1),
             legendgroup="Ultimate Shaft Resistance",
         ),
-        row=1,
-        col=1,
-    )
-
-    fig.add_trace(  # Add base
-        go.Scatter(
-            name="Ultimate Base Resistance",
-            x=Base,
-            y=[el * 1e-3 for el in parsed_cpt.elevation],
+        template.trace(  # the base
+            1,
+            2,
+            type="scatter",
+            name="Ultimate Base Resistance (Koppejan)"
+            if PILE_params.get("base_method") == "koppejan"
+            else "Ultimate Base Resistance",
+            x=capacity.base[indices],
+            y=capacity.elevation[indices],
             mode="lines",
             line=dict(color="red", width=1),
             legendgroup="Ultimate Base Resistance",
         ),
-        row=1,
-        col=2,
-    )
-
-    fig.add_trace(  # Add base
-        go.Scatter(
+        template.trace(  # the bearing capacity per tip level
+            1,
+            3,
+            type="scatter",
             name="Overall pile capacity",
-            x=Overall,
-            y=[el * 1e-3 for el in parsed_cpt.elevation],
+            x=profile.total[profile_indices],
+            y=profile.elevation[profile_indices],
             mode="lines",
             line=dict(color="orange", width=1),
             legendgroup="Overall pile capacity",
         ),
-        row=1,
-        col=3,
-    )
-
-    fig.add_trace(
-        go.Scatter(
+        template.trace(
+            1,
+            3,
+            type="scatter",
             name="Reaction Load",
-            x=cpt_params["Load"] * np.ones(100),
-            y=np.linspace(min(el * 1e-3 for el in parsed_cpt.elevation), 0, 100),
+            x=load * np.ones(100),
+            y=np.linspace(capacity.elevation.min(), get_surface_level(cpt_params, keys), 100),
             mode="lines",
             line=dict(color="black", width=1),
             legendgroup="Overall pile capacity",
         ),
-        row=1,
-        col=3,
+    ]
+    if np.isfinite(required_pile_tip_level):
+        traces.append(
+            template.trace(
+                1,
+                3,
+                type="scatter",
+                name="Required Pile Tip Level",
+                x=np.linspace(0, np.nanmax(profile.total), 100),
+                y=required_pile_tip_level * np.ones(100),
+                mode="lines",
+                line=dict(color="black", width=2),
+            )
+        )
+    return template.create_figure(traces, get_depth_axes_updates(template, parsed_cpt))
+
+
+def get_slider_values(slider_range: Tuple[float, float, float]) -> np.ndarray:
+    """Returns all values of a slider with the given (min, max, step)"""
+    minimum, maximum, step = slider_range
+    return np.round(np.arange(minimum, maximum + step / 2, step), 6)
+
+
+def get_surface_level(cpt_params: Munch, keys: Optional[CPTKeys] = None) -> float:
+    """Returns the top of the interpreted soil layout in [m], or the top of the CPT if the layout is empty"""
+    soil_layout = cpt_params.get("soil_layout")
+    if soil_layout:
+        return soil_layout[0]["top_of_layer"]
+    return get_measurement_data(cpt_params, keys).elevation[0] / 1e3
+
+
+def get_lcpc_soil_profile(cpt_params: Munch, keys: CPTKeys) -> LCPCSoilProfile:
+    """Returns the soil group and f_sol per sample of the CPT, cached per CPT and interpreted soil layout."""
+
+    def create() -> LCPCSoilProfile:
+        parsed_cpt, soil_layout_user = get_measurement_data(cpt_params, keys), get_soil_layout_user(cpt_params, keys)
+        return LCPCSoilProfile.from_cpt(parsed_cpt.qc, parsed_cpt.elevation * 1e-3, soil_layout_user)
+
+    key = ("lcpc_soil_profile", keys.measurement_data, keys.soil_layout_user)
+    return PARAMS_CACHE.get_or_create(key, create)
+
+
+def get_unit_base_resistance(cpt_params: Munch, PILE_params: Munch, diameter: float, keys: CPTKeys) -> np.ndarray:
+    """Returns the unit base resistance [MPa] per sample as tip level with the selected base resistance method.
+
+    The Koppejan base resistance is cached per CPT, diameter and pile class, the NF P94-262 base resistance is derived
+    from the cached soil profile.
+    """
+    # the samples of the soil profile, so that the base resistance matches the shaft resistance per sample
+    soil_profile = get_lcpc_soil_profile(cpt_params, keys)
+    if PILE_params.get("base_method") == "koppejan":
+        pile_class_factor = PILE_CLASS_FACTORS[PILE_params["method"]]
+        key = ("koppejan", keys.measurement_data, diameter, pile_class_factor)
+        return PARAMS_CACHE.get_or_create(
+            key,
+            lambda: calculate_koppejan_base_resistance(
+                soil_profile.qc, soil_profile.elevation, diameter, pile_class_factor
+            ),
+        )
+    return soil_profile.unit_base_resistance(get_pile_category(PILE_params), diameter)
+
+
+def get_pile_capacity(
+    cpt_params: Munch, PILE_params: Munch, keys: Optional[CPTKeys] = None
+) -> Tuple[PileCapacity, BearingCapacityProfile]:
+    """Returns the unit resistances per sample and the bearing capacity per tip level of the selected pile.
+
+    The shaft resistance of a pile category is a lookup into the cached soil profile of the CPT, the base resistance
+    follows from the selected base resistance method.
+    """
+    keys = keys or CPTKeys(cpt_params)
+    with stage("pile_capacity"):
+        soil_profile = get_lcpc_soil_profile(cpt_params, keys)
+        diameter = PILE_params["Diameter"]
+        shaft = soil_profile.unit_shaft_resistance(get_pile_category(PILE_params))
+        base = get_unit_base_resistance(cpt_params, PILE_params, diameter, keys)
+        capacity = PileCapacity(elevation=soil_profile.elevation, shaft=shaft, base=base, total=shaft + base)
+        profile = calculate_bearing_capacity_profile(
+            capacity.elevation, capacity.shaft, capacity.base, diameter, get_surface_level(cpt_params, keys)
+        )
+    return capacity, profile
+
+
+def get_pile_design_sweep(cpt_params: Munch, PILE_params: Munch, keys: Optional[CPTKeys] = None) -> PileDesignSweep:
+    """Returns the capacity of all pile diameters and lengths of the sliders for the selected pile category.
+
+    The sweep is cached per CPT, interpreted soil layout, pile category and base resistance method, so moving the
+    load, diameter or length slider only marks other designs.
+    """
+    keys = keys or CPTKeys(cpt_params)
+    category = get_pile_category(PILE_params)
+    base_method = PILE_params.get("base_method")
+    surface_level = get_surface_level(cpt_params, keys)
+
+    def create() -> PileDesignSweep:
+        soil_profile = get_lcpc_soil_profile(cpt_params, keys)
+        diameters = get_slider_values(PILE_DIAMETER_RANGE)
+        return sweep_pile_designs(
+            elevation=soil_profile.elevation,
+            shaft=soil_profile.unit_shaft_resistance(category),
+            base_table=np.array(
+                [get_unit_base_resistance(cpt_params, PILE_params, diameter, keys) for diameter in diameters]
+            ),
+            diameters=diameters,
+            lengths=get_slider_values(PILE_LENGTH_RANGE),
+            surface_level=surface_level,
+        )
+
+    key = (
+        "pile_design_sweep",
+        keys.measurement_data,
+        keys.soil_layout_user,
+        # the category determines the pile class, and with it the pile class factor of the Koppejan method
+        category,
+        base_method,
+        surface_level,
+    )
+    return PARAMS_CACHE.get_or_create(key, create)
+
+
+def visualise_pile_design_sweep(cpt_params: Munch, PILE_params: Munch, keys: Optional[CPTKeys] = None):
+    """Heatmap of the capacity of all pile designs, with the designs that meet the required load marked."""
+    with stage("pile_design_sweep"):
+        sweep = get_pile_design_sweep(cpt_params, PILE_params, keys)
+    with stage("figure_build"):
+        load = PILE_params["Load"]
+        meets_load = sweep.meets(load)
+
+        fig = go.Figure()
+        fig.add_trace(
+            go.Heatmap(
+                name="Pile capacity",
+                x=sweep.lengths,
+                y=sweep.diameters,
+                z=sweep.total,
+                colorscale="Viridis",
+                colorbar=dict(title="Capacity [MN]"),
+                customdata=np.where(meets_load, "meets the load", "does not meet the load"),
+                hovertemplate="Length: %{x:.1f} m<br>Diameter: %{y:.1f} m<br>Capacity: %{z:.1f} MN<br>"
+                "%{customdata}<extra></extra>",
+            )
+        )
+        # the designs that meet the load are marked with a dot
+        diameter_index, length_index = np.nonzero(meets_load)
+        fig.add_trace(
+            go.Scatter(
+                name=f"Capacity >= {load} MN",
+                x=sweep.lengths[length_index],
+                y=sweep.diameters[diameter_index],
+                mode="markers",
+                marker=dict(color="white", size=3),
+                hoverinfo="skip",
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                name="Selected design",
+                x=[PILE_params["Length"]],
+                y=[PILE_params["Diameter"]],
+                mode="markers",
+                marker=dict(color="red", size=12, symbol="x"),
+            )
+        )
+        fig.update_layout(
+            template="plotly_white",
+            legend=dict(orientation="h", y=-0.15),
+            xaxis=dict(title_text="Pile length [m]"),
+            yaxis=dict(title_text="Pile diameter [m]", dtick=PILE_DIAMETER_RANGE[2]),
+        )
+    return fig
+
+
+def get_transverse_trough(cpt_params: Munch, tunnel_params: Munch, keys: CPTKeys) -> TransverseTrough:
+    """Returns the transverse settlement trough of the tunnel, with K from the interpreted soil layout."""
+    soil_layout_user = get_soil_layout_user(cpt_params, keys)
+    layers = soil_layout_user.layers
+    surface_level = get_surface_level(cpt_params, keys)
+    trough_width_parameter = get_weighted_trough_width_parameter(
+        tops=np.array([layer.top_of_layer for layer in layers]) / 1e3,
+        bottoms=np.array([layer.bottom_of_layer for layer in layers]) / 1e3,
+        layer_k=get_layer_trough_width_parameters(soil_layout_user),
+        surface_level=surface_level,
+        axis_level=tunnel_params["axis_level"],
+    )
+    return TransverseTrough(
+        axis_depth=surface_level - tunnel_params["axis_level"],
+        diameter=tunnel_params["diameter"],
+        volume_loss=tunnel_params["volume_loss"] / 100,
+        trough_width_parameter=float(trough_width_parameter),
+    )
+
+
+def visualise_tunnel_settlement(
+    cpt_params: Munch,
+    tunnel_params: Munch,
+    target_points: int = DEFAULT_TARGET_POINTS,
+    keys: Optional[CPTKeys] = None,
+):
+    """Transverse settlement trough above the tunnel, and the cross-section with the soil layers and the tunnel."""
+    keys = keys or CPTKeys(cpt_params)
+    soil_layout_user = get_soil_layout_user(cpt_params, keys)
+    with stage("settlement"):
+        trough = get_transverse_trough(cpt_params, tunnel_params, keys)
+        offsets = get_surface_grid(tunnel_params["half_width"], tunnel_params["grid_spacing"])
+        settlement = trough.settlement(offsets) * 1e3
+    indices = decimate_indices(offsets, settlement, target_points=target_points)
+    surface_level = get_surface_level(cpt_params, keys)
+    axis_level, radius = tunnel_params["axis_level"], tunnel_params["diameter"] / 2
+
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.08,
+        row_heights=[0.4, 0.6],
+        subplot_titles=(
+            f"Transverse settlement trough (K = {trough.trough_width_parameter:.2f}, i = {trough.trough_width:.1f} m, "
+            f"S_max = {trough.max_settlement * 1e3:.1f} mm)",
+            "Cross-section",
+        ),
     )
     fig.add_trace(
         go.Scatter(
-            name="Required Pile Tip Level",
-            x=np.linspace(0, max(Overall), 100),
-            y=cpt_params["ground_water_level"] * np.ones(100),
+            name="Settlement",
+            x=offsets[indices],
+            y=settlement[indices],
             mode="lines",
-            line=dict(color="black", width=2),
+            line=dict(color="mediumblue", width=2),
+            hovertemplate="Offset: %{x:.1f} m<br>Settlement: %{y:.2f} mm<extra></extra>",
         ),
         row=1,
-        col=3,
+        col=1,
     )
-    update_pile_fig_layout(fig, parsed_cpt)
+    for side in (-1, 1):  # the inflection points
+        fig.add_vline(x=side * trough.trough_width, line=dict(color="grey", dash="dot", width=1), row=1, col=1)
+
+    # the soil layers above the tunnel axis with their trough width parameter
+    half_width = tunnel_params["half_width"]
+    layer_k = get_layer_trough_width_parameters(soil_layout_user)
+    for layer, k in zip(soil_layout_user.layers, layer_k):
+        top, bottom = min(layer.top_of_layer / 1e3, surface_level), layer.bottom_of_layer / 1e3
+        if top <= bottom:
+            continue
+        fig.add_trace(
+            go.Scatter(
+                x=[-half_width, half_width, half_width, -half_width, -half_width],
+                y=[top, top, bottom, bottom, top],
+                fill="toself",
+                fillcolor=f"rgb{layer.soil.color.rgb}",
+                line=dict(width=0),
+                mode="lines",
+                name=layer.soil.properties.ui_name,
+                legendgroup=layer.soil.properties.ui_name,
+                showlegend=False,
+                hoveron="fills",
+                text=f"{layer.soil.properties.ui_name}<br>Top: {top:.2f} m<br>Bottom: {bottom:.2f} m<br>K = {k:.2f}",
+                hoverinfo="text",
+            ),
+            row=2,
+            col=1,
+        )
+    fig.add_shape(
+        type="circle",
+        x0=-radius,
+        x1=radius,
+        y0=axis_level - radius,
+        y1=axis_level + radius,
+        line=dict(color="black", width=2),
+        fillcolor="white",
+        row=2,
+        col=1,
+    )
+
+    fig.update_layout(template="plotly_white", showlegend=False)
+    fig.update_annotations(font_size=12)
+    fig.update_xaxes(title_text="Offset from the tunnel axis [m]", row=2, col=1)
+    fig.update_yaxes(title_text="Settlement [mm]", autorange="reversed", row=1, col=1)
+    fig.update_yaxes(
+        title_text="Level [m NAP]",
+        range=[min(axis_level - 2 * radius, soil_layout_user.bottom / 1e3), surface_level + 1],
+        scaleanchor="x2",
+        row=2,
+        col=1,
+    )
+    return fig
+
+
+def get_settlement_cube(cpt_params: Munch, tunnel_params: Munch, keys: CPTKeys) -> SettlementCube:
+    """Returns the settlement of the surface grid per face position, cached per trough and grid."""
+    trough = get_transverse_trough(cpt_params, tunnel_params, keys)
+    tunnel_start, face_end = tunnel_params["tunnel_start"], tunnel_params["face_end"]
+    if face_end <= tunnel_start:
+        raise UserError("The last face position must be beyond the tunnel start")
+    number_of_steps = int(tunnel_params["number_of_steps"])
+    margin, chainage_spacing = tunnel_params["chainage_margin"], tunnel_params["chainage_spacing"]
+    half_width, grid_spacing = tunnel_params["half_width"], tunnel_params["grid_spacing"]
+
+    def calculate() -> SettlementCube:
+        with stage("settlement_cube"):
+            number_of_chainages = int(round((face_end - tunnel_start + 2 * margin) / chainage_spacing)) + 1
+            return calculate_longitudinal_settlement(
+                trough,
+                tunnel_start=tunnel_start,
+                face_positions=np.linspace(tunnel_start, face_end, number_of_steps + 1)[1:],
+                chainages=np.linspace(tunnel_start - margin, face_end + margin, number_of_chainages),
+                offsets=get_surface_grid(half_width, grid_spacing),
+            )
+
+    key = (
+        "settlement_cube",
+        trough,
+        (tunnel_start, face_end, number_of_steps, margin, chainage_spacing, half_width, grid_spacing),
+    )
+    return PARAMS_CACHE.get_or_create(key, calculate)
+
+
+def get_damage_assessment(
+    cpt_params: Munch, tunnel_params: Munch, keys: Optional[CPTKeys] = None
+) -> Tuple[Buildings, DamageAssessment]:
+    """Returns the buildings of the table and their damage assessment with the face at its last position."""
+    buildings = Buildings.from_table(unmunchify(tunnel_params.get("buildings") or []))
+    trough = get_transverse_trough(cpt_params, tunnel_params, keys or CPTKeys(cpt_params))
+    with stage("damage_screening"):
+        assessment = screen_buildings(buildings, trough, tunnel_params["tunnel_start"], tunnel_params["face_end"])
+    return buildings, assessment
+
+
+def visualise_longitudinal_settlement(cpt_params: Munch, tunnel_params: Munch, keys: Optional[CPTKeys] = None):
+    """Heatmap of the surface settlement with a slider over the face positions."""
+    cube = get_settlement_cube(cpt_params, tunnel_params, keys or CPTKeys(cpt_params))
+    with stage("figure_build"):
+        # every frame holds a full heatmap, so the grid is thinned out to limit the size of the figure
+        chainage_stride = max(1, int(np.ceil(cube.chainages.size / MAX_SLIDER_HEATMAP_POINTS)))
+        offset_stride = max(1, int(np.ceil(cube.offsets.size / MAX_SLIDER_HEATMAP_POINTS)))
+        chainages, offsets = cube.chainages[::chainage_stride], cube.offsets[::offset_stride]
+        settlement = cube.settlement[:, ::chainage_stride, ::offset_stride] * 1e3
+        max_settlement = float(settlement.max()) or 1.0
+
+        def get_frame_data(step: int) -> list:
+            face = cube.face_positions[step]
+            return [
+                go.Heatmap(
+                    x=chainages,
+                    y=offsets,
+                    z=settlement[step].T,
+                    zmin=0,
+                    zmax=max_settlement,
+                    colorscale="Viridis",
+                    reversescale=True,
+                    colorbar=dict(title="Settlement [mm]"),
+                    hovertemplate="Chainage: %{x:.1f} m<br>Offset: %{y:.1f} m<br>Settlement: %{z:.2f} mm"
+                    "<extra></extra>",
+                ),
+                go.Scatter(
+                    name="Face",
+                    x=[face, face],
+                    y=[offsets[0], offsets[-1]],
+                    mode="lines",
+                    line=dict(color="red", width=2),
+                    hovertemplate=f"Face at chainage {face:.1f} m<extra></extra>",
+                ),
+            ]
+
+        last_step = cube.face_positions.size - 1
+        fig = go.Figure(
+            data=get_frame_data(last_step),
+            frames=[go.Frame(data=get_frame_data(step), name=str(step)) for step in range(cube.face_positions.size)],
+        )
+        animation = dict(mode="immediate", frame=dict(duration=0, redraw=True), transition=dict(duration=0))
+        slider_steps = [
+            dict(label=f"{face:.1f}", method="animate", args=[[str(step)], animation])
+            for step, face in enumerate(cube.face_positions)
+        ]
+        fig.update_layout(
+            template="plotly_white",
+            showlegend=False,
+            sliders=[dict(active=last_step, currentvalue=dict(prefix="Face at chainage [m]: "), steps=slider_steps)],
+            xaxis=dict(title_text="Chainage [m]"),
+            yaxis=dict(title_text="Offset from the tunnel axis [m]"),
+        )
     return fig
 
-def update_pile_fig_layout(fig, parsed_cpt):
-    """Updates layout of the figure and formats the grids"""
+
+def update_pile_fig_layout(fig):
+    """Updates layout of the figure and formats the grids; the ticks of the depth axes start per CPT"""
     fig.update_layout(barmode="stack", template="plotly_white", legend=dict(x=1.15, y=0.5))
     fig.update_annotations(font_size=12)
     # Format axes and grids per subplot
@@ -218,7 +733,7 @@ def update_pile_fig_layout(fig, parsed_cpt):
         # range=[9.9, 0],
         # tick0=0,
         # dtick=5,
-        title_text="Overall pile capactiy [MPa]",
+        title_text="Bearing capacity [MN]",
         title_font=dict(color="black"),
     )
 
@@ -228,7 +743,6 @@ def update_pile_fig_layout(fig, parsed_cpt):
         col=1,
         **standard_grid_options,
         title_text="Depth [m]",
-        tick0=floor(parsed_cpt.elevation[-1] / 1e3) - 5,
         dtick=5,
     )  # for Qc
 
@@ -237,7 +751,6 @@ def update_pile_fig_layout(fig, parsed_cpt):
         col=2,
         **standard_line_options,
         **standard_grid_options,  # for Rf
-        tick0=floor(parsed_cpt.elevation[-1] / 1e3) - 5,
         dtick=5,
     )
 
@@ -245,15 +758,14 @@ def update_pile_fig_layout(fig, parsed_cpt):
         row=1,
         col=3,
         **standard_line_options,  # for soil layouts
-        tick0=floor(parsed_cpt.elevation[-1] / 1e3) - 5,
         dtick=1,
         showticklabels=True,
         side="right",
     )
 
 
-def update_fig_layout(fig, parsed_cpt):
-    """Updates layout of the figure and formats the grids"""
+def update_fig_layout(fig):
+    """Updates layout of the figure and formats the grids; the ticks of the depth axes start per CPT"""
     fig.update_layout(barmode="stack", template="plotly_white", legend=dict(x=1.15, y=0.5))
     fig.update_annotations(font_size=12)
     # Format axes and grids per subplot
@@ -291,7 +803,6 @@ def update_fig_layout(fig, parsed_cpt):
         col=1,
         **standard_grid_options,
         title_text="Depth [m] w.r.t. NAP",
-        tick0=floor(parsed_cpt.elevation[-1] / 1e3) - 5,
         dtick=1,
     )  # for Qc
 
@@ -300,7 +811,6 @@ def update_fig_layout(fig, parsed_cpt):
         col=2,
         **standard_line_options,
         **standard_grid_options,  # for Rf
-        tick0=floor(parsed_cpt.elevation[-1] / 1e3) - 5,
         dtick=1,
     )
 
@@ -308,43 +818,62 @@ def update_fig_layout(fig, parsed_cpt):
         row=1,
         col=3,
         **standard_line_options,  # for soil layouts
-        tick0=floor(parsed_cpt.elevation[-1] / 1e3) - 5,
         dtick=1,
         showticklabels=True,
         side="right",
     )
 
 
-def add_soil_layout_to_fig(fig, soil_layout_original, soil_layout_user):
-    """Add bars for each soil type separately in order to be able to set legend labels"""
-    unique_soil_types = {
+def get_soil_layout_traces(
+    template: FigureTemplate,
+    soil_layout_original: SoilLayout,
+    soil_layout_user: SoilLayout,
+    layer_statistics: Optional[LayerStatistics] = None,
+) -> List[dict]:
+    """Returns bars for each soil type separately in order to be able to set legend labels
+
+    :param template: Template of the CPT interpretation view; the bars are in the third subplot
+    :param layer_statistics: Statistics per layer of the interpreted soil layout, added to the hover text
+    """
+    traces = []
+    # in order of appearance, so that the order of the traces does not depend on the hash seed
+    unique_soil_types = dict.fromkeys(
         layer.soil.properties.ui_name for layer in [*soil_layout_original.layers, *soil_layout_user.layers]
-    }
+    )
     for ui_name in unique_soil_types:
         original_layers = [layer for layer in soil_layout_original.layers if layer.soil.properties.ui_name == ui_name]
-        interpreted_layers = [layer for layer in soil_layout_user.layers if layer.soil.properties.ui_name == ui_name]
+        interpreted_indices = [
+            index for index, layer in enumerate(soil_layout_user.layers) if layer.soil.properties.ui_name == ui_name
+        ]
+        interpreted_layers = [soil_layout_user.layers[index] for index in interpreted_indices]
         soil_type_layers = [
             *original_layers,
             *interpreted_layers,
         ]  # have a list of all soils used in both figures
+        hover_text = [
+            f"Soil Type: {layer.soil.properties.ui_name}<br>"
+            f"Top of layer: {layer.top_of_layer * 1e-3:.2f}<br>"
+            f"Bottom of layer: {layer.bottom_of_layer * 1e-3:.2f}"
+            for layer in soil_type_layers
+        ]
+        if layer_statistics is not None:
+            for position, index in enumerate(interpreted_indices, start=len(original_layers)):
+                hover_text[position] += "<br>" + layer_statistics.get_hover_text(index)
 
         # add the bar plots to the figures
-        fig.add_trace(
-            go.Bar(
+        traces.append(
+            template.trace(
+                1,
+                3,
+                type="bar",
                 name=ui_name,
                 x=["Original"] * len(original_layers) + ["Interpreted"] * len(interpreted_layers),
                 y=[-layer.thickness * 1e-3 for layer in soil_type_layers],
                 width=0.5,
-                marker_color=[f"rgb{layer.soil.color.rgb}" for layer in soil_type_layers],
-                hovertext=[
-                    f"Soil Type: {layer.soil.properties.ui_name}<br>"
-                    f"Top of layer: {layer.top_of_layer * 1e-3:.2f}<br>"
-                    f"Bottom of layer: {layer.bottom_of_layer * 1e-3:.2f}"
-                    for layer in soil_type_layers
-                ],
+                marker=dict(color=[f"rgb{layer.soil.color.rgb}" for layer in soil_type_layers]),
+                hovertext=hover_text,
                 hoverinfo="text",
                 base=[layer.top_of_layer * 1e-3 for layer in soil_type_layers],
-            ),
-            row=1,
-            col=3,
+            )
         )
+    return traces
@@ -0,0 +1,285 @@
+"""Benchmarks of the stages of the CPT app on synthetic GEF files.
+
+Every stage is timed on synthetic GEF files of several sizes (see `synthetic_gef.py`), for both classification
+methods. Stages that need the VIKTOR platform (the GEFFile parser and the classification of the SDK) are reported as
+skipped when they cannot run. Results can be saved as a baseline, and compared with a baseline to detect regressions:
+
+    python -m benchmarks.run_benchmarks --rows 1000 5000 --save-baseline baseline.json
+    python -m benchmarks.run_benchmarks --rows 1000 5000 --baseline baseline.json --threshold 0.2
+"""
+import argparse
+import copy
+import io
+import json
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from munch import Munch, munchify
+
+from app.cpt_file.cache import PARAMS_CACHE
+from app.cpt_file.classification_table import COMPILED_TABLES
+from app.cpt_file.constants import ADDITIONAL_COLUMNS, DEFAULT_CLASSIFICATION_TABLE, DEFAULT_ROBERTSON_TABLE
+from app.cpt_file.controller import CPTFileController
+from app.cpt_file.gef_reader import read_gef
+from app.cpt_file.soil_layout_conversion_functions import Classification, get_soil_layout_results
+from app.cpt_file.figure_templates import figure_to_json
+from app.cpt_file.visualisation import visualise_cpt, visualise_pile
+
+from .synthetic_gef import generate_gef
+
+DEFAULT_ROWS = [1000, 5000, 20000]
+DEFAULT_METHODS = ["robertson", "table"]
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_VOID_FRACTION = 0.01
+DEFAULT_EXTRA_COLUMNS = 0
+GROUND_WATER_LEVEL = -1.0
+PILE_PARAMS = {"Diameter": 1, "Length": 10, "Load": 30, "method": "Bore", "bore_category": "No support"}
+
+
+class Skipped(Exception):
+    """Raised by a stage that cannot run in the current environment"""
+
+
+def get_classification_params(method: str) -> Munch:
+    return munchify(
+        {
+            "method": method,
+            "robertson": copy.deepcopy(DEFAULT_ROBERTSON_TABLE),
+            "table": copy.deepcopy(DEFAULT_CLASSIFICATION_TABLE),
+        }
+    )
+
+
+def get_params(gef_content: str, method: str) -> Munch:
+    """Returns the params of a classified CPT entity, classified with the native classifiers of the app."""
+    streamed_gef = read_gef(io.StringIO(gef_content))
+    measurement_data = streamed_gef.to_measurement_data().drop_incomplete_rows()
+    classification = Classification(get_classification_params(method))
+    soil_layout = classification.classify_measurement_data(measurement_data, GROUND_WATER_LEVEL)
+    ground_level = streamed_gef.header.ground_level
+    params = {
+        "measurement_data": measurement_data.encode(),
+        "headers": {
+            "name": "synthetic",
+            "ground_level_wrt_reference": ground_level * 1e3,
+            "ground_level_wrt_reference_m": ground_level,
+            "height_system": "NAP",
+            "x_y_coordinates": [119638.0, 482310.0],
+        },
+        "ground_water_level": GROUND_WATER_LEVEL,
+        "classification": get_classification_params(method),
+        "cpt": {"min_layer_thickness": 200},
+        "PILE": PILE_PARAMS,
+    }
+    params.update(get_soil_layout_results(soil_layout))
+    return munchify(params)
+
+
+def _parse_with_sdk(gef_content: str, method: str, params: Munch) -> None:
+    from viktor.geo import GEFFile  # pylint: disable=import-outside-toplevel
+
+    try:
+        GEFFile(gef_content).parse(additional_columns=ADDITIONAL_COLUMNS, return_gef_data_obj=True)
+    except KeyError as e:  # the SDK parser runs on the VIKTOR platform
+        raise Skipped(f"needs the VIKTOR platform ({e})")
+
+
+def _classify_with_sdk(gef_content: str, method: str, params: Munch) -> None:
+    from viktor.geo import GEFFile  # pylint: disable=import-outside-toplevel
+
+    try:
+        Classification(get_classification_params(method)).classify_cpt_file(GEFFile(gef_content))
+    except KeyError as e:
+        raise Skipped(f"needs the VIKTOR platform ({e})")
+
+
+def _parse_streaming(gef_content: str, method: str, params: Munch) -> None:
+    read_gef(io.StringIO(gef_content)).to_measurement_data().drop_incomplete_rows()
+
+
+def _classify_native(gef_content: str, method: str, params: Munch) -> None:
+    COMPILED_TABLES.clear()
+    get_params(gef_content, method)
+
+
+def _filter(gef_content: str, method: str, params: Munch) -> None:
+    # the filtered layouts of every minimum thickness are cached per original layout after the first run
+    PARAMS_CACHE.clear()
+    CPTFileController.filter_soil_layout_on_min_layer_thickness(params)
+
+
+def _visualise_cpt(gef_content: str, method: str, params: Munch) -> None:
+    PARAMS_CACHE.clear()
+    visualise_cpt(params)
+
+
+def _visualise_pile(gef_content: str, method: str, params: Munch) -> None:
+    PARAMS_CACHE.clear()
+    visualise_pile(params, params.PILE)
+
+
+def _to_json(gef_content: str, method: str, params: Munch) -> None:
+    # the parsed data is cached by the previous stages, so this mostly measures building and serializing the figures
+    figure_to_json(visualise_cpt(params))
+    figure_to_json(visualise_pile(params, params.PILE))
+
+
+STAGES: Dict[str, Callable[[str, str, Munch], None]] = {
+    "parse": _parse_with_sdk,
+    "parse_streaming": _parse_streaming,
+    "classify": _classify_with_sdk,
+    "classify_native": _classify_native,
+    "filter": _filter,
+    "visualise_cpt": _visualise_cpt,
+    "visualise_pile": _visualise_pile,
+    "to_json": _to_json,
+}
+
+
+def time_stage(stage: Callable[[str, str, Munch], None], gef_content: str, method: str, params: Munch, repeat: int):
+    """Returns the min and median wall time [s] of a stage over `repeat` runs after a warm-up run, or the reason it was
+    skipped."""
+    timings = []
+    for run in range(repeat + 1):
+        start = time.perf_counter()
+        try:
+            stage(gef_content, method, params)
+        except Skipped as e:
+            return {"skipped": str(e)}
+        if run > 0:
+            timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings)}
+
+
+def get_case_name(
+    method: str, number_of_rows: int, void_fraction: float = DEFAULT_VOID_FRACTION, extra_columns: int = 0
+) -> str:
+    """Returns '<method>-<rows>', with the void fraction and the number of extra columns if they are not the default,
+    so that a baseline is only compared with results of the same GEF files."""
+    name = f"{method}-{number_of_rows}"
+    if void_fraction != DEFAULT_VOID_FRACTION:
+        name += f"-v{void_fraction:g}"
+    if extra_columns != DEFAULT_EXTRA_COLUMNS:
+        name += f"-x{extra_columns}"
+    return name
+
+
+def run_benchmarks(
+    rows: List[int],
+    methods: List[str],
+    stages: List[str],
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = 0,
+    void_fraction: float = DEFAULT_VOID_FRACTION,
+    extra_columns: int = DEFAULT_EXTRA_COLUMNS,
+) -> Dict[str, dict]:
+    """Returns the timings per case (see `get_case_name`) and stage."""
+    results = {}
+    for number_of_rows in rows:
+        gef_content = generate_gef(
+            number_of_rows=number_of_rows,
+            number_of_extra_columns=extra_columns,
+            void_fraction=void_fraction,
+            seed=seed,
+        )
+        for method in methods:
+            params = get_params(gef_content, method)
+            results[get_case_name(method, number_of_rows, void_fraction, extra_columns)] = {
+                name: time_stage(STAGES[name], gef_content, method, params, repeat) for name in stages
+            }
+    return results
+
+
+def compare_with_baseline(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Returns a description of every stage of which the median is more than `threshold` slower than the baseline."""
+    regressions = []
+    for case, stages in results.items():
+        for stage, timing in stages.items():
+            reference = baseline.get(case, {}).get(stage, {})
+            if "median" not in timing or not reference.get("median"):
+                continue
+            ratio = timing["median"] / reference["median"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{case} {stage}: {timing['median'] * 1e3:.1f} ms vs {reference['median'] * 1e3:.1f} ms "
+                    f"({(ratio - 1) * 100:+.0f} %)"
+                )
+    return regressions
+
+
+def format_table(results: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None) -> str:
+    """Returns the results as a text table, with the change compared to the baseline if given."""
+    lines = [f"{'case':<28}{'stage':<18}{'min [ms]':>10}{'median [ms]':>13}{'change':>10}"]
+    for case, stages in results.items():
+        for stage, timing in stages.items():
+            if "skipped" in timing:
+                lines.append(f"{case:<28}{stage:<18}  skipped: {timing['skipped']}")
+                continue
+            change = ""
+            reference = (baseline or {}).get(case, {}).get(stage, {})
+            if reference.get("median"):
+                change = f"{(timing['median'] / reference['median'] - 1) * 100:+.0f} %"
+            lines.append(
+                f"{case:<28}{stage:<18}{timing['min'] * 1e3:>10.1f}{timing['median'] * 1e3:>13.1f}{change:>10}"
+            )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the CPT app on synthetic GEF files.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="number of rows per GEF file")
+    parser.add_argument("--methods", nargs="+", choices=DEFAULT_METHODS, default=DEFAULT_METHODS)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--void-fraction",
+        type=float,
+        default=DEFAULT_VOID_FRACTION,
+        help="fraction of the measured values that is void (default 0.01)",
+    )
+    parser.add_argument(
+        "--extra-columns", type=int, default=DEFAULT_EXTRA_COLUMNS, help="number of unused columns per GEF file"
+    )
+    parser.add_argument("--json", action="store_true", help="print the results as JSON instead of a table")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to a baseline file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare the results with a baseline file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown of the median above which a stage is a regression (default 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.rows,
+        args.methods,
+        args.stages,
+        repeat=args.repeat,
+        seed=args.seed,
+        void_fraction=args.void_fraction,
+        extra_columns=args.extra_columns,
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    print(json.dumps(results, indent=2) if args.json else format_table(results, baseline))
+    if baseline is None:
+        return 0
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Generator of synthetic GEF-CPT files, based on the sample GEF file of the app.
+
+The header of the sample file is reused, with the number of rows and columns adjusted. The signals are resampled from
+the sample file with some noise, extra columns are added as noise, and a fraction of the values is replaced by the
+column void.
+"""
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.cpt_file.gef_reader import read_gef
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "app" / "cpt_file" / "sample_gef.GEF"
+VOID_VALUE = -9999.0
+MEASURED_COLUMNS = ["qc", "fs", "u2", "inclination", "Rf"]  # columns 2 to 6 of the template
+
+
+def _get_template_header() -> List[str]:
+    lines = []
+    with TEMPLATE_PATH.open(encoding="ISO-8859-1") as f:
+        for line in f:
+            lines.append(line.rstrip("\r\n"))
+            if line.startswith("#EOH"):
+                return lines
+    raise ValueError("Template GEF file has no end of header")
+
+
+def generate_gef(
+    number_of_rows: int = 5000,
+    number_of_extra_columns: int = 0,
+    void_fraction: float = 0.0,
+    spacing: float = 0.01,
+    seed: int = 0,
+) -> str:
+    """Returns the content of a synthetic GEF file.
+
+    :param number_of_rows: Number of data rows
+    :param number_of_extra_columns: Number of columns added after the columns of the template
+    :param void_fraction: Fraction of the measured values that is replaced by the column void
+    :param spacing: Distance between the rows in [m]
+    :param seed: Seed of the random generator, for reproducible files
+    """
+    rng = np.random.default_rng(seed)
+    template = read_gef(TEMPLATE_PATH).columns
+
+    # resample the template signals to the requested length, and add 5 % noise
+    source_positions = np.linspace(0, template["qc"].size - 1, number_of_rows)
+    columns = [np.arange(number_of_rows) * spacing]
+    for name in MEASURED_COLUMNS:
+        signal = np.nan_to_num(template[name][np.round(source_positions).astype(int)])
+        columns.append(np.abs(signal * (1 + 0.05 * rng.standard_normal(number_of_rows))))
+    columns.extend(rng.random(number_of_rows) for _ in range(number_of_extra_columns))
+    data = np.column_stack(columns)
+
+    voids = rng.random((number_of_rows, data.shape[1] - 1)) < void_fraction
+    data[:, 1:][voids] = VOID_VALUE
+
+    number_of_columns = data.shape[1]
+    header = []
+    for line in _get_template_header():
+        if line.startswith(("#COLUMN=", "#LASTSCAN=", "#EOH")):
+            continue
+        header.append(line)
+    header.append(f"#COLUMN= {number_of_columns}")
+    for column in range(7, number_of_columns + 1):
+        header.append(f"#COLUMNINFO= {column}, -, extra kolom {column}, {100 + column}")
+        header.append(f"#COLUMNVOID= {column}, {VOID_VALUE:f}")
+    header.append(f"#LASTSCAN= {number_of_rows}")
+    header.append("#EOH=")
+
+    rows = [" ".join(f"{value:.4e}" for value in row) for row in data]
+    return "\n".join(header + rows) + "\n"
+
+
+def write_gef(path: Path, **kwargs) -> Path:
+    """Writes a synthetic GEF file, see `generate_gef` for the arguments."""
+    path.write_text(generate_gef(**kwargs), encoding="ISO-8859-1")
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic GEF file.")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--extra-columns", type=int, default=0)
+    parser.add_argument("--void-fraction", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_gef(
+        args.output,
+        number_of_rows=args.rows,
+        number_of_extra_columns=args.extra_columns,
+        void_fraction=args.void_fraction,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
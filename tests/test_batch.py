@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from app.cpt_file.batch import DEFAULT_TABLES, PLATFORM_ENVIRONMENT_VARIABLE, classify_file, main
+from app.cpt_file.measurement_data import MeasurementData
+
+SAMPLE_GEF = Path(__file__).resolve().parents[1] / "app" / "cpt_file" / "sample_gef.GEF"
+
+
+class TestBatch(unittest.TestCase):
+    def test_native_classification(self):
+        for method in ("robertson", "table"):
+            with self.subTest(method=method):
+                result = classify_file(SAMPLE_GEF, method, DEFAULT_TABLES[method], native=True)
+                self.assertEqual(result["status"], "ok", result["error"])
+                cpt_dict = result["result"]
+                self.assertEqual(result["number_of_samples"], 4323)  # the data rows, #LASTSCAN says 5146
+                self.assertEqual(cpt_dict["headers"]["name"], "DKM002")
+                self.assertEqual(cpt_dict["headers"]["height_system"], "NAP")
+                self.assertEqual((cpt_dict["x_rd"], cpt_dict["y_rd"]), (119638.0, 482310.0))
+                self.assertEqual(cpt_dict["ground_water_level"], -1.23)
+                self.assertTrue(cpt_dict["soil_layout"])
+                elevation = MeasurementData.from_stored(cpt_dict["measurement_data"]).elevation
+                self.assertAlmostEqual(elevation[0], -700.0, places=3)
+
+    def test_stops_without_platform(self):
+        environment = {key: value for key, value in os.environ.items() if key != PLATFORM_ENVIRONMENT_VARIABLE}
+        with mock.patch.dict(os.environ, environment, clear=True), mock.patch("sys.stderr"):
+            self.assertEqual(main([str(SAMPLE_GEF)]), 2)
+
+    def test_native_main(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch("sys.stderr"):
+            output = Path(directory) / "results.json"
+            self.assertEqual(main([str(SAMPLE_GEF), "--native", "--workers", "1", "--output", str(output)]), 0)
+            self.assertTrue(output.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
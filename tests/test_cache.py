@@ -0,0 +1,52 @@
+import sys
+import unittest
+
+import numpy as np
+from viktor import Color
+from viktor.geo import Soil, SoilLayer, SoilLayout
+
+from app.cpt_file.cache import LRUCache, estimate_size
+
+SOIL = Soil("clay", Color(1, 1, 1), properties={"ui_name": "clay", "gamma_dry": 16, "gamma_wet": 17})
+
+
+class TestEstimateSize(unittest.TestCase):
+    def test_arrays_use_nbytes(self):
+        self.assertEqual(estimate_size(np.zeros(1000)), 8000)
+        self.assertGreaterEqual(estimate_size((np.zeros(10), np.zeros(20))), 240)
+
+    def test_soil_layout_is_estimated_deeply(self):
+        soil_layout = SoilLayout([SoilLayer(SOIL, -i * 1000.0, -(i + 1) * 1000.0) for i in range(50)])
+        size = estimate_size(soil_layout)
+        self.assertGreater(size, 50 * sys.getsizeof(soil_layout.layers[0]))
+        # the soil is shared by all layers, and counted once
+        self.assertLess(size, 50 * estimate_size(SOIL))
+
+    def test_cycles(self):
+        first, second = {}, {}
+        first["other"], second["other"] = second, first
+        self.assertEqual(estimate_size(first), 2 * sys.getsizeof({"other": None}) + sys.getsizeof("other"))
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_entry_bound(self):
+        cache = LRUCache("test", max_entries=3)
+        for key in range(5):
+            cache.put(key, key, size=1)
+        self.assertEqual([key in cache for key in range(5)], [False, False, True, True, True])
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_memory_bound_evicts_least_recently_used(self):
+        cache = LRUCache("test", max_bytes=100)
+        cache.put("a", None, size=40)
+        cache.put("b", None, size=40)
+        cache.get("a")
+        cache.put("c", None, size=40)
+        self.assertEqual(("a" in cache, "b" in cache, "c" in cache), (True, False, True))
+        cache.put("d", None, size=101)
+        self.assertNotIn("d", cache)
+        self.assertEqual(cache.size, 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
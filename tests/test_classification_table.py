@@ -0,0 +1,88 @@
+import json
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from app.cpt_file import classification_table
+from app.cpt_file.classification_table import NO_MATCH, classify_with_table, compile_classification_table
+from app.cpt_file.constants import DEFAULT_CLASSIFICATION_TABLE
+
+CASES_PATH = Path(__file__).resolve().parent / "fixtures" / "classification_table_cases.json"
+
+
+def _matches(row: dict, signal: str, value: float) -> bool:
+    minimum, maximum = row.get(f"{signal}_min"), row.get(f"{signal}_max")
+    return (minimum is None or minimum <= value) and (maximum is None or value < maximum)
+
+
+def _classify_row_by_row(table, qc, rf, qc_norm=None):
+    """The first matching row per sample, by comparing every sample with every row"""
+    rows = []
+    for qc_value, rf_value, qc_norm_value in zip(qc, rf, qc_norm if qc_norm is not None else [None] * len(qc)):
+        for index, row in enumerate(table):
+            if (
+                _matches(row, "qc", qc_value)
+                and _matches(row, "rf", rf_value)
+                and (qc_norm_value is None or _matches(row, "qc_norm", qc_norm_value))
+            ):
+                rows.append(index)
+                break
+        else:
+            rows.append(NO_MATCH)
+    return np.array(rows)
+
+
+class TestClassificationTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cases = json.loads(CASES_PATH.read_text(encoding="utf-8"))
+        cls.table = cls.cases["table"]
+
+    def test_compiled_table(self):
+        compiled_table = compile_classification_table(self.table)
+        for case in self.cases["compiled_cases"]:
+            with self.subTest(case["description"]):
+                qc_norm = None if case["qc_norm"] is None else [case["qc_norm"]]
+                self.assertEqual(compiled_table.classify([case["qc"]], [case["rf"]], qc_norm)[0], case["row"])
+
+    def test_classify_with_table(self):
+        for case in self.cases["series_cases"]:
+            with self.subTest(case["description"]), mock.patch.object(
+                classification_table,
+                "get_sample_stress_profile",
+                wraps=classification_table.get_sample_stress_profile,
+            ) as get_sample_stress_profile:
+                rows = classify_with_table(
+                    self.table,
+                    np.array(case["qc"], dtype=float),
+                    np.array(case["rf"], dtype=float),
+                    np.array(case["elevation"], dtype=float),
+                    case["ground_water_level"],
+                )
+                self.assertEqual(rows.tolist(), case["rows"])
+                if "iterations" in case:
+                    self.assertEqual(get_sample_stress_profile.call_count, case["iterations"])
+
+    def test_default_table_matches_row_by_row(self):
+        table = DEFAULT_CLASSIFICATION_TABLE
+        compiled_table = compile_classification_table(table)
+        rng = np.random.default_rng(8)
+        # random values, and values on the limits of the rows
+        limits = {
+            signal: [row[f"{signal}_{bound}"] for row in table for bound in ("min", "max")]
+            for signal in ("qc", "qc_norm", "rf")
+        }
+        limits = {signal: [limit for limit in values if limit is not None] for signal, values in limits.items()}
+        size = 20000
+        qc = np.where(rng.random(size) < 0.3, rng.choice(limits["qc"], size), rng.uniform(0, 3, size))
+        rf = np.where(rng.random(size) < 0.3, rng.choice(limits["rf"], size), rng.uniform(0, 10, size))
+        qc_norm = np.where(rng.random(size) < 0.3, rng.choice(limits["qc_norm"], size), rng.uniform(0, 30, size))
+        expected = _classify_row_by_row(table, qc, rf, qc_norm)
+        np.testing.assert_array_equal(compiled_table.classify(qc, rf, qc_norm), expected)
+        np.testing.assert_array_equal(compiled_table.classify(qc, rf), _classify_row_by_row(table, qc, rf))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import math
+import unittest
+
+import numpy as np
+
+from app.cpt_file.damage import DAMAGE_CATEGORIES, Buildings, get_influence_zone, screen_buildings
+from app.cpt_file.settlement import TransverseTrough
+
+# D = 6 m, z0 = 20 m and K = 0.5, so i = 10 m; the tunnel passes the buildings completely
+DIAMETER, AXIS_DEPTH, TROUGH_WIDTH = 6, 20, 10
+TUNNEL_START, FACE = -1000, 1000
+
+
+def _get_trough(volume_loss):
+    return TransverseTrough(
+        axis_depth=AXIS_DEPTH, diameter=DIAMETER, volume_loss=volume_loss, trough_width_parameter=0.5
+    )
+
+
+def _hand_calculation(volume_loss):
+    """Tensile strain of a building of 20 m across the tunnel axis and 5 m high, which sags symmetrically.
+
+    The chord between the ends at +-10 m is level, so the largest deviation is at the axis: S_max (1 - exp(-1/2)). The
+    ends move towards each other, so the horizontal strain is compressive and does not count.
+    """
+    max_settlement = volume_loss * math.pi * DIAMETER**2 / 4 / (math.sqrt(2 * math.pi) * TROUGH_WIDTH)
+    length, height = 20, 5
+    deflection_ratio = max_settlement * (1 - math.exp(-0.5)) / length
+    # sagging: the neutral axis is in the middle, I = H^3 / 12 and t = H / 2
+    inertia, extreme_fibre = height**3 / 12, height / 2
+    bending_strain = deflection_ratio / (
+        length / (12 * extreme_fibre) + 3 * inertia * 2.6 / (2 * extreme_fibre * length * height)
+    )
+    shear_strain = deflection_ratio / (1 + height * length**2 / (18 * inertia * 2.6))
+    return max_settlement, deflection_ratio, max(bending_strain, shear_strain)
+
+
+class TestScreenBuildings(unittest.TestCase):
+    def setUp(self):
+        rows = [
+            {"name": "Across", "offset_start": -10, "offset_end": 10},
+            {"name": "Outside", "offset_start": 200, "offset_end": 220},
+        ]
+        footprint = {"chainage_start": 0, "chainage_end": 10, "height": 5}
+        self.buildings = Buildings.from_table([{**row, **footprint} for row in rows])
+
+    def test_hand_calculation(self):
+        # V_L = 2 %: S_max = 22.56 mm, deflection ratio 4.438e-4, bending strain 5.353e-4 and shear strain 8.70e-5
+        for volume_loss, expected_category, expected_strain in (
+            (0.005, "Negligible", 1.338e-4),
+            (0.02, "Very slight", 5.353e-4),
+            (0.04, "Slight", 1.0706e-3),
+        ):
+            with self.subTest(volume_loss=volume_loss):
+                max_settlement, deflection_ratio, tensile_strain = _hand_calculation(volume_loss)
+                self.assertAlmostEqual(tensile_strain, expected_strain, delta=1e-7)
+                assessment = screen_buildings(self.buildings, _get_trough(volume_loss), TUNNEL_START, FACE)
+                self.assertTrue(assessment.evaluated[0])
+                self.assertAlmostEqual(assessment.max_settlement[0], max_settlement, places=12)
+                self.assertAlmostEqual(assessment.deflection_ratio[0], deflection_ratio, places=12)
+                self.assertFalse(assessment.hogging[0])
+                self.assertEqual(assessment.horizontal_strain[0], 0)
+                self.assertAlmostEqual(assessment.tensile_strain[0], tensile_strain, places=12)
+                self.assertEqual(DAMAGE_CATEGORIES[assessment.category[0]], expected_category)
+
+    def test_building_outside_the_trough(self):
+        trough = _get_trough(0.04)
+        # the settlement is 1 mm at i sqrt(2 ln(S_max / 1 mm)) = 26.5 m from the axis
+        _, _, max_offset = get_influence_zone(trough, TUNNEL_START, FACE)
+        self.assertAlmostEqual(max_offset, TROUGH_WIDTH * math.sqrt(2 * math.log(trough.max_settlement / 1e-3)))
+        assessment = screen_buildings(self.buildings, trough, TUNNEL_START, FACE)
+        self.assertFalse(assessment.evaluated[1])
+        self.assertEqual(assessment.category[1], 0)
+        self.assertEqual(assessment.max_settlement[1], 0)
+        # before the tunnel reaches the buildings, none of them is evaluated
+        assessment = screen_buildings(self.buildings, trough, 100, 200)
+        np.testing.assert_array_equal(assessment.evaluated, [False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
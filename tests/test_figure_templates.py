@@ -0,0 +1,68 @@
+import json
+import math
+import os
+import unittest
+from pathlib import Path
+
+from benchmarks.run_benchmarks import get_params
+from benchmarks.synthetic_gef import generate_gef
+
+from app.cpt_file.controller import CPTFileController
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "fixtures" / "figure_templates_golden.json"
+NUMBER_OF_ROWS = 300
+RELATIVE_TOLERANCE = 1e-6
+
+
+def _get_figures() -> dict:
+    """JSON of the "CPT interpretation" and "Pile Design" views of a synthetic CPT, per method"""
+    controller = CPTFileController()
+    figures = {}
+    for method in ("robertson", "table"):
+        params = get_params(generate_gef(NUMBER_OF_ROWS), method)
+        figures[f"{method}_cpt"] = json.loads(controller.visualize_cpt(controller, params=params).figure)
+        for base_method in ("lcpc", "koppejan"):
+            params.PILE.base_method = base_method
+            figures[f"{method}_pile_{base_method}"] = json.loads(
+                controller.visualize_pile(controller, params=params).figure
+            )
+    return figures
+
+
+class TestFigureTemplates(unittest.TestCase):
+    """The figures are compared with the golden output; regenerate it with `UPDATE_GOLDEN=1` after an intended
+    change of the views."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.figures = _get_figures()
+        if os.environ.get("UPDATE_GOLDEN"):
+            GOLDEN_PATH.write_text(json.dumps(cls.figures, indent=1, sort_keys=True), encoding="utf-8")
+
+    def assert_json_equal(self, actual, expected, path="figure"):
+        if isinstance(expected, dict):
+            self.assertIsInstance(actual, dict, path)
+            self.assertEqual(sorted(actual), sorted(expected), path)
+            for key, value in expected.items():
+                self.assert_json_equal(actual[key], value, f"{path}.{key}")
+        elif isinstance(expected, list):
+            self.assertIsInstance(actual, list, path)
+            self.assertEqual(len(actual), len(expected), path)
+            for index, (actual_item, expected_item) in enumerate(zip(actual, expected)):
+                self.assert_json_equal(actual_item, expected_item, f"{path}[{index}]")
+        elif isinstance(expected, float) and not isinstance(actual, bool) and isinstance(actual, (int, float)):
+            is_close = math.isclose(actual, expected, rel_tol=RELATIVE_TOLERANCE, abs_tol=1e-12)
+            self.assertTrue(is_close, f"{path}: {actual} != {expected}")
+        else:
+            self.assertEqual(actual, expected, path)
+
+    def test_views_match_golden_output(self):
+        golden = json.loads(GOLDEN_PATH.read_text(encoding="utf-8"))
+        self.assertEqual(sorted(self.figures), sorted(golden))
+        for name, figure in golden.items():
+            with self.subTest(view=name):
+                self.assert_json_equal(self.figures[name], figure, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
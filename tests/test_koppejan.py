@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+
+from app.cpt_file.koppejan import (
+    MAX_BASE_RESISTANCE,
+    MAX_TRAJECTORY_FACTOR,
+    MIN_TRAJECTORY_FACTOR,
+    UPPER_TRAJECTORY_FACTOR,
+    RangeMinimum,
+    calculate_koppejan_base_resistance,
+    get_prefix_minimum_sums,
+    get_previous_smaller_or_equal,
+)
+
+
+def _brute_force_base_resistance(qc, elevation, diameter, pile_class_factor):
+    """Koppejan base resistance per tip level, by evaluating every trajectory sample by sample"""
+    depth = -elevation
+    base_resistance = np.full(qc.size, np.nan)
+    for tip in range(qc.size):
+        bottoms = [e for e in range(tip, qc.size) if depth[e] >= depth[tip] + MIN_TRAJECTORY_FACTOR * diameter]
+        if not bottoms:
+            continue
+        bottoms = [e for e in bottoms if depth[e] <= depth[tip] + MAX_TRAJECTORY_FACTOR * diameter] or bottoms[:1]
+        top = next(j for j in range(qc.size) if depth[j] >= depth[tip] - UPPER_TRAJECTORY_FACTOR * diameter)
+        lowest = np.inf
+        for bottom in bottoms:
+            mean_i = np.mean(qc[tip : bottom + 1])
+            # every value of path II is the minimum of qc from that sample down to the bottom
+            path_ii = np.minimum.accumulate(qc[tip : bottom + 1][::-1])[::-1]
+            # path III continues upwards from the tip, starting at the last value of path II
+            path_iii = np.minimum.accumulate(np.minimum(qc[top : tip + 1][::-1], path_ii[0]))
+            lowest = min(lowest, 0.5 * ((mean_i + np.mean(path_ii)) / 2 + np.mean(path_iii)))
+        base_resistance[tip] = min(pile_class_factor * lowest, MAX_BASE_RESISTANCE)
+    return base_resistance
+
+
+class TestKoppejan(unittest.TestCase):
+    def test_matches_brute_force_with_uneven_spacing(self):
+        rng = np.random.default_rng(16)
+        for trial in range(40):
+            size = int(rng.integers(2, 150))
+            elevation = -np.cumsum(rng.uniform(0.005, 0.08, size))
+            # rounded values, so that the minimum paths have ties
+            qc = np.round(rng.lognormal(1.5, 0.7, size), int(rng.choice([0, 1, 3])))
+            diameter = float(rng.choice([0.1, 0.3, 0.6, 1.2]))
+            with self.subTest(trial=trial, size=size, diameter=diameter):
+                np.testing.assert_allclose(
+                    calculate_koppejan_base_resistance(qc, elevation, diameter, 0.8),
+                    _brute_force_base_resistance(qc, elevation, diameter, 0.8),
+                    rtol=1e-12,
+                )
+
+    def test_range_minimum(self):
+        rng = np.random.default_rng(8)
+        values = rng.integers(0, 10, 257).astype(np.float64)
+        start = rng.integers(0, values.size, 2000)
+        end = np.minimum(start + rng.integers(0, 100, start.size), values.size - 1)
+        expected = [first + np.argmin(values[first : last + 1]) for first, last in zip(start, end)]
+        np.testing.assert_array_equal(RangeMinimum(values).argmin(start, end), expected)
+
+    def test_previous_smaller_or_equal_and_prefix_minimum_sums(self):
+        rng = np.random.default_rng(40)
+        for values in (
+            rng.integers(0, 5, 300).astype(np.float64),
+            np.sort(rng.random(129)),
+            np.sort(rng.random(129))[::-1].copy(),
+            np.array([]),
+            np.array([3.0]),
+        ):
+            previous = get_previous_smaller_or_equal(values)
+            expected_previous = [
+                max((j for j in range(i) if values[j] <= values[i]), default=-1) for i in range(values.size)
+            ]
+            np.testing.assert_array_equal(previous, expected_previous)
+            expected_sums = [sum(min(values[j : k + 1]) for j in range(k + 1)) for k in range(values.size)] + [0]
+            np.testing.assert_allclose(get_prefix_minimum_sums(values, previous), expected_sums, rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
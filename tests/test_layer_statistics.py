@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from app.cpt_file.layer_statistics import LOWER_PERCENTILE, calculate_layer_statistics
+
+
+def _brute_force_statistics(elevation, values, tops, bottoms):
+    """(count, mean, percentile, minimum, maximum) per layer with a mask per layer"""
+    statistics = []
+    for layer, (top, bottom) in enumerate(zip(tops, bottoms)):
+        is_lowest = layer == len(tops) - 1
+        in_layer = (elevation <= top) & ((elevation > bottom) | (is_lowest & (elevation == bottom)))
+        layer_values = values[in_layer & np.isfinite(values)]
+        if layer_values.size == 0:
+            statistics.append((0, np.nan, np.nan, np.nan, np.nan))
+            continue
+        statistics.append(
+            (
+                layer_values.size,
+                np.mean(layer_values),
+                np.percentile(layer_values, LOWER_PERCENTILE),
+                np.min(layer_values),
+                np.max(layer_values),
+            )
+        )
+    return np.array(statistics, dtype=np.float64).reshape(-1, 5)
+
+
+class TestLayerStatistics(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(24)
+        for trial in range(300):
+            size = int(rng.integers(1, 300))
+            elevation = -np.sort(rng.uniform(0, 20, size))
+            number_of_layers = int(rng.integers(1, 8))
+            # the layout can start above or below the first sample and end above or below the last sample
+            boundaries = np.r_[rng.uniform(-1, 1), -np.sort(rng.uniform(0, 25, number_of_layers))]
+            tops, bottoms = boundaries[:-1], boundaries[1:]
+            values = rng.uniform(0, 30, size)
+            values[rng.random(size) < 0.2] = np.nan
+            statistics = calculate_layer_statistics(elevation, {"qc": values}, tops, bottoms, ["soil"] * len(tops))
+            calculated = np.column_stack(
+                (
+                    statistics.count,
+                    statistics.mean["qc"],
+                    statistics.percentile["qc"],
+                    statistics.minimum["qc"],
+                    statistics.maximum["qc"],
+                )
+            )
+            with self.subTest(trial=trial):
+                np.testing.assert_allclose(calculated, _brute_force_statistics(elevation, values, tops, bottoms))
+
+    def test_layer_boundaries(self):
+        elevation = np.array([-1.0, -2.0, -3.0, -4.0, -5.0])
+        values = np.array([1.0, 2.0, np.nan, 4.0, 5.0])
+        statistics = calculate_layer_statistics(
+            elevation,
+            {"qc": values},
+            tops=[0.0, -2.0, -2.5, -3.5],
+            bottoms=[-2.0, -2.5, -3.5, -5.0],
+            names=["A", "B", "C", "D"],
+        )
+        # a sample on a boundary belongs to the layer below it, and the lowest layer includes its bottom
+        np.testing.assert_array_equal(statistics.count, [1, 1, 0, 2])
+        np.testing.assert_array_equal(statistics.maximum["qc"], [1.0, 2.0, np.nan, 5.0])
+        # layer C only holds a NaN sample
+        self.assertTrue(np.isnan(statistics.mean["qc"][2]))
+        self.assertEqual(statistics.get_hover_text(2), "Samples: 0")
+
+    def test_no_samples(self):
+        statistics = calculate_layer_statistics(np.array([]), {"qc": np.array([])}, [0.0], [-1.0], ["A"])
+        np.testing.assert_array_equal(statistics.count, [0])
+        self.assertTrue(np.isnan(statistics.percentile["qc"][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import unittest.mock
+
+import numpy as np
+from viktor import Color
+from viktor.geo import Soil, SoilLayer, SoilLayout
+
+from app.cpt_file.lcpc import PEAK_CLIPPING_FACTOR, LCPCSoilProfile, clipped_window_average
+
+
+def _brute_force_clipped_mean(values, elevation, above, below):
+    result = np.empty(values.size)
+    for sample, level in enumerate(elevation):
+        window = values[(elevation <= level + above) & (elevation >= level - below)]
+        result[sample] = np.mean(np.minimum(window, PEAK_CLIPPING_FACTOR * window.mean()))
+    return result
+
+
+def _random_cpt(rng, size):
+    elevation = -np.cumsum(rng.uniform(0.005, 0.05, size))
+    qc = rng.lognormal(1, 0.8, size)
+    return qc, elevation
+
+
+class TestClippedWindowAverage(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(15)
+        for size, above, below in ((1, 0.5, 1.5), (50, 0.5, 1.5), (800, 0.75, 2.25), (800, 2.0, 6.0)):
+            qc, elevation = _random_cpt(rng, size)
+            with self.subTest(size=size, above=above):
+                np.testing.assert_allclose(
+                    clipped_window_average(qc, elevation, above, below),
+                    _brute_force_clipped_mean(qc, elevation, above, below),
+                    rtol=1e-12,
+                )
+
+    def test_matches_brute_force_in_chunks(self):
+        qc, elevation = _random_cpt(np.random.default_rng(16), 500)
+        with unittest.mock.patch("app.cpt_file.lcpc.MAX_WINDOW_ELEMENTS", 64):
+            clipped = clipped_window_average(qc, elevation, 0.5, 1.5)
+        np.testing.assert_allclose(clipped, _brute_force_clipped_mean(qc, elevation, 0.5, 1.5), rtol=1e-12)
+
+    def test_peak_is_clipped(self):
+        elevation = -np.arange(400) * 0.02
+        qc = np.full(400, 10.0)
+        qc[200] = 60.0  # a gravel lens of one sample
+        clipped = clipped_window_average(qc, elevation, 0.5, 1.5)
+        plain_mean = (99 * 10 + 60) / 100
+        self.assertAlmostEqual(clipped[180], (99 * 10 + PEAK_CLIPPING_FACTOR * plain_mean) / 100)
+        self.assertLess(clipped[180], plain_mean)
+
+
+class TestLCPCSoilProfile(unittest.TestCase):
+    def test_samples_without_qc_are_left_out(self):
+        soil_layout = SoilLayout([SoilLayer(Soil("Sand, clean", Color(255, 225, 178)), 0, -10000)])
+        qc = np.array([1.0, np.nan, 3.0, 4.0])
+        elevation = np.array([-1.0, -2.0, -3.0, -4.0])
+        profile = LCPCSoilProfile.from_cpt(qc, elevation, soil_layout)
+        np.testing.assert_array_equal(profile.qc, [1.0, 3.0, 4.0])
+        np.testing.assert_array_equal(profile.elevation, [-1.0, -3.0, -4.0])
+        self.assertTrue(np.all(np.isfinite(profile.unit_base_resistance(1, 0.6))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import io
+import unittest
+
+import numpy as np
+
+from app.cpt_file.gef_reader import read_gef_header
+from app.cpt_file.measurement_data import MeasurementData, encode_measurement_data
+
+GEF_HEADER = """#GEFID= 1, 1, 0
+#COLUMN= 3
+#COLUMNINFO= 1, m, sondeerlengte, 1
+#COLUMNINFO= 2, MPa, Puntdruk, 2
+#COLUMNINFO= 3, %, Wrijvingsgetal, 4
+#COLUMNVOID= 2, -999.000000
+#COLUMNVOID= 3, 9999.000000
+#EOH=
+"""
+
+
+class TestVoidValues(unittest.TestCase):
+    def test_column_voids_are_dropped(self):
+        signal_voids = read_gef_header(io.StringIO(GEF_HEADER)).signal_voids
+        self.assertEqual(signal_voids["qc"], -999.0)
+        self.assertAlmostEqual(signal_voids["Rf"], 99.99)
+
+        measurement_data = {
+            "elevation": [-100.0, -200.0, -300.0, -400.0, -500.0],
+            "qc": [1.0, -999.0, 3.0, None, 5.0],
+            "Rf": [0.01, 0.02, 99.99, 0.04, 0.05],
+        }
+        stored = encode_measurement_data(measurement_data, signal_voids=signal_voids)
+        complete = MeasurementData.from_stored(stored).drop_incomplete_rows()
+
+        np.testing.assert_array_equal(complete.elevation, [-100.0, -500.0])
+        np.testing.assert_allclose(complete.qc, [1.0, 5.0])
+        np.testing.assert_allclose(complete.Rf, [0.01, 0.05], rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
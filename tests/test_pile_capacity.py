@@ -0,0 +1,94 @@
+import unittest
+
+import numpy as np
+
+from app.cpt_file.pile_capacity import (
+    BearingCapacityProfile,
+    calculate_bearing_capacity_profile,
+    solve_required_tip_level,
+    sweep_pile_designs,
+)
+
+
+def _get_cpt(number_of_samples=400, seed=13):
+    rng = np.random.default_rng(seed)
+    elevation = -0.5 - np.cumsum(rng.uniform(0.01, 0.05, number_of_samples))
+    shaft = rng.uniform(0, 0.2, number_of_samples)
+    return elevation, shaft
+
+
+class TestSweepPileDesigns(unittest.TestCase):
+    def test_matches_capacity_per_design(self):
+        elevation, shaft = _get_cpt()
+        diameters = np.array([0.2, 0.35, 0.5, 0.8])
+        base_table = np.random.default_rng(5).uniform(1, 15, (diameters.size, elevation.size))
+        surface_level = -1.0
+        # tips between and at the samples, and below the bottom of the CPT
+        lengths = np.concatenate(
+            (
+                np.linspace(0.5, surface_level - elevation[-1], 37),
+                surface_level - elevation[50:53],
+                [surface_level - elevation[-1] + 0.5],
+            )
+        )
+        sweep = sweep_pile_designs(elevation, shaft, base_table, diameters, lengths, surface_level)
+
+        tip_elevation = surface_level - lengths
+        for row, diameter in enumerate(diameters):
+            profile = calculate_bearing_capacity_profile(elevation, shaft, base_table[row], diameter, surface_level)
+            for name in ("shaft", "base", "total"):
+                expected = np.interp(tip_elevation, profile.elevation[::-1], getattr(profile, name)[::-1])
+                expected[tip_elevation < elevation[-1]] = np.nan
+                np.testing.assert_allclose(getattr(sweep, name)[row], expected, rtol=1e-9, atol=1e-12)
+        self.assertTrue(np.isnan(sweep.total[:, -1]).all())
+
+    def test_single_row(self):
+        elevation, shaft = _get_cpt(50)
+        base = np.linspace(1, 5, elevation.size)
+        sweep = sweep_pile_designs(elevation, shaft, base[np.newaxis, :], [0.4], [0.5, 1.0], -0.5)
+        self.assertEqual(sweep.total.shape, (1, 2))
+        self.assertTrue(np.isfinite(sweep.total).all())
+
+
+def _get_profile(total):
+    total = np.asarray(total, dtype=np.float64)
+    elevation = -1.0 - np.arange(total.size)
+    return BearingCapacityProfile(elevation=elevation, shaft=total / 2, base=total / 2, total=total)
+
+
+class TestSolveRequiredTipLevel(unittest.TestCase):
+    def setUp(self):
+        # non-monotonic: the capacity decreases from -2 to -3 m
+        self.profile = _get_profile([1, 3, 2, 5])
+
+    def test_load_never_reached(self):
+        self.assertTrue(np.isnan(solve_required_tip_level(self.profile, 5.01)))
+        self.assertTrue(np.isnan(solve_required_tip_level(_get_profile([]), 1)))
+        self.assertTrue(np.isnan(solve_required_tip_level(_get_profile([np.nan, np.nan]), 1)))
+
+    def test_load_reached_at_sample(self):
+        self.assertEqual(solve_required_tip_level(self.profile, 3), -2)
+        self.assertEqual(solve_required_tip_level(self.profile, 5), -4)
+        # reached at the first sample below the surface level
+        self.assertEqual(solve_required_tip_level(self.profile, 0.5), -1)
+
+    def test_non_monotonic_profile(self):
+        # the first level that reaches the load, not the level after the decrease
+        self.assertAlmostEqual(float(solve_required_tip_level(self.profile, 2.5)), -1.75)
+        # 4 MN is only reached below -3 m, interpolated between 2 MN at -3 m and 5 MN at -4 m
+        self.assertAlmostEqual(float(solve_required_tip_level(self.profile, 4)), -3 - 2 / 3)
+        # no interpolation from a sample without capacity
+        self.assertEqual(solve_required_tip_level(_get_profile([1, np.nan, 3]), 2), -3)
+
+    def test_array_of_loads(self):
+        loads = np.array([[0.5, 2.5, 3], [4, 5, 6]])
+        tip_levels = solve_required_tip_level(self.profile, loads)
+        self.assertEqual(tip_levels.shape, loads.shape)
+        expected = [[-1, -1.75, -2], [-3 - 2 / 3, -4, np.nan]]
+        np.testing.assert_allclose(tip_levels, expected)
+        for load, tip_level in zip(loads.ravel(), tip_levels.ravel()):
+            np.testing.assert_allclose(solve_required_tip_level(self.profile, load), tip_level)
+
+
+if __name__ == "__main__":
+    unittest.main()
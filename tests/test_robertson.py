@@ -0,0 +1,110 @@
+import json
+import unittest
+from pathlib import Path
+
+import numpy as np
+from munch import munchify
+
+from app.cpt_file.constants import DEFAULT_ROBERTSON_TABLE
+from app.cpt_file.gef_reader import read_gef
+from app.cpt_file.robertson import (
+    GRID_RESOLUTION,
+    LOG_FR_RANGE,
+    LOG_QT_RANGE,
+    UNKNOWN_ZONE,
+    classify_robertson_zones,
+    get_normalised_signals,
+    get_robertson_zones,
+    get_zone_grid,
+)
+from app.cpt_file.soil_layout_arrays import LayoutArrays
+from app.cpt_file.soil_layout_conversion_functions import Classification
+
+SAMPLE_GEF = Path(__file__).resolve().parent.parent / "app" / "cpt_file" / "sample_gef.GEF"
+PLATFORM_SOIL_LAYOUT = Path(__file__).resolve().parent / "fixtures" / "sample_gef_robertson_platform.json"
+
+
+def _get_soil_at(layout: LayoutArrays, elevation: np.ndarray) -> np.ndarray:
+    """Soil index of the layout at every elevation; the layers extend up and down to the samples outside it"""
+    index = np.searchsorted(-layout.boundaries, -elevation, side="right") - 1
+    return layout.soil_indices[np.clip(index, 0, len(layout) - 1)]
+
+
+class TestRobertson(unittest.TestCase):
+    """The RobertsonMethod of the SDK classifies on the platform, so it cannot be run here to create a fixture.
+
+    The native classification is therefore tested exactly against the analytic chart on every sample of
+    sample_gef.GEF, and compared with the platform layout of the fixture, where every difference is documented.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.reference = json.loads(PLATFORM_SOIL_LAYOUT.read_text())
+        cls.measurement_data = read_gef(SAMPLE_GEF).to_measurement_data().drop_incomplete_rows()
+
+    def test_differences_with_platform_on_sample_gef(self):
+        reference, measurement_data = self.reference, self.measurement_data
+        classification = Classification(munchify({"method": "robertson", "robertson": DEFAULT_ROBERTSON_TABLE}))
+        soil_layout = classification.classify_measurement_data(measurement_data, reference["ground_water_level"])
+        registry = classification.soil_registry
+        native = LayoutArrays.from_soil_layout(soil_layout, registry, unit="mm")
+        native = native.filter_layers_on_thickness(reference["min_layer_thickness"]).to_unit("m")
+        platform = LayoutArrays.from_table(
+            reference["soil_layout"], measurement_data.elevation[-1] / 1e3, registry, unit="m"
+        )
+
+        # the runs of samples with the same pair of different soils
+        elevation = measurement_data.elevation / 1e3
+        native_soils, platform_soils = _get_soil_at(native, elevation), _get_soil_at(platform, elevation)
+        pairs = np.where(native_soils != platform_soils, native_soils * len(registry.names) + platform_soils, -1)
+        differences = []
+        for run in np.split(np.arange(elevation.size), np.flatnonzero(np.diff(pairs)) + 1):
+            if pairs[run[0]] >= 0:
+                differences.append(
+                    {
+                        "top": round(float(elevation[run[0]]), 2),
+                        "bottom": round(float(elevation[run[-1]]), 2),
+                        "samples": run.size,
+                        "native": registry.names[native_soils[run[0]]],
+                        "platform": registry.names[platform_soils[run[0]]],
+                    }
+                )
+        tolerated = [
+            {key: value for key, value in difference.items() if key != "reason"}
+            for difference in reference["tolerated_differences"]
+        ]
+        self.assertEqual(differences, tolerated)
+
+    def test_sample_gef_matches_chart(self):
+        qc, rf, elevation = self.measurement_data.qc, self.measurement_data.Rf, self.measurement_data.elevation / 1e3
+        zones = classify_robertson_zones(qc, rf, elevation, self.reference["ground_water_level"])
+        valid = np.isfinite(qc) & np.isfinite(rf) & (qc > 0) & (rf > 0)
+        ground_water_level = self.reference["ground_water_level"]
+        fr, qt = get_normalised_signals(qc[valid], rf[valid] * 100, elevation[valid], ground_water_level)
+        # the samples outside the chart are classified at its edge
+        expected = get_robertson_zones(np.clip(np.log10(fr), *LOG_FR_RANGE), np.clip(np.log10(qt), *LOG_QT_RANGE))
+        np.testing.assert_array_equal(zones[valid], expected)
+        np.testing.assert_array_equal(zones[~valid], UNKNOWN_ZONE)
+
+    def test_zone_grid_matches_chart(self):
+        rng = np.random.default_rng(7)
+        log_fr = rng.uniform(*LOG_FR_RANGE, size=10000)
+        log_qt = rng.uniform(*LOG_QT_RANGE, size=10000)
+        cell_size = np.diff(LOG_FR_RANGE) / GRID_RESOLUTION, np.diff(LOG_QT_RANGE) / GRID_RESOLUTION
+        cell_fr = ((log_fr - LOG_FR_RANGE[0]) / cell_size[0]).astype(int)
+        cell_qt = ((log_qt - LOG_QT_RANGE[0]) / cell_size[1]).astype(int)
+        grid_zones = get_zone_grid()[cell_fr, cell_qt]
+        exact_zones = get_robertson_zones(log_fr, log_qt)
+        # a point can only differ from its cell if a zone boundary passes within one cell of the point
+        different = np.flatnonzero(grid_zones != exact_zones)
+        neighbourhood = [
+            get_robertson_zones(log_fr[different] + step_fr * cell_size[0], log_qt[different] + step_qt * cell_size[1])
+            for step_fr in (-1, 0, 1)
+            for step_qt in (-1, 0, 1)
+        ]
+        self.assertTrue(np.all(np.any(np.array(neighbourhood) == grid_zones[different], axis=0)))
+        self.assertLess(different.size, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import math
+import unittest
+from unittest import mock
+
+import numpy as np
+from viktor import UserError
+
+from app.cpt_file import settlement
+from app.cpt_file.settlement import (
+    TransverseTrough,
+    calculate_longitudinal_settlement,
+    get_surface_grid,
+    get_weighted_trough_width_parameter,
+    normal_cdf,
+)
+
+
+class TestNormalCdf(unittest.TestCase):
+    def test_matches_math_erfc(self):
+        values = np.linspace(-12, 12, 24001)
+        expected = [0.5 * math.erfc(-value / math.sqrt(2)) for value in values]
+        np.testing.assert_allclose(normal_cdf(values), expected, rtol=0, atol=1e-7)
+
+    def test_tails(self):
+        values = np.linspace(-40, 40, 8001)
+        cdf = normal_cdf(values)
+        self.assertTrue(np.all(np.diff(cdf) >= 0))
+        self.assertEqual(cdf[0], 0.0)
+        self.assertEqual(cdf[-1], 1.0)
+        # the lower tail does not cancel to 0 or below, as 1 + erf(x) would
+        lower_tail = values[(values > -8) & (values < -5)]
+        np.testing.assert_allclose(
+            normal_cdf(lower_tail), [0.5 * math.erfc(-value / math.sqrt(2)) for value in lower_tail], rtol=0.02
+        )
+
+
+class TestTransverseTrough(unittest.TestCase):
+    def setUp(self):
+        # D = 6 m, V_L = 1 %, z0 = 20 m and K = 0.5, so i = 10 m
+        self.trough = TransverseTrough(axis_depth=20, diameter=6, volume_loss=0.01, trough_width_parameter=0.5)
+
+    def test_hand_calculation(self):
+        # V = 0.01 pi 6^2 / 4 = 0.09 pi, S_max = V / (sqrt(2 pi) 10)
+        self.assertAlmostEqual(self.trough.trough_width, 10)
+        self.assertAlmostEqual(self.trough.trough_volume, 0.2827433, places=7)
+        self.assertAlmostEqual(self.trough.max_settlement, 0.0112798, places=7)
+        self.assertAlmostEqual(float(self.trough.settlement(0)), self.trough.max_settlement)
+        # at the inflection point S = S_max exp(-1 / 2)
+        self.assertAlmostEqual(float(self.trough.settlement(10)), 0.0112798 * 0.6065307, places=7)
+
+    def test_volume_of_the_trough(self):
+        offsets = np.linspace(-100, 100, 20001)
+        volume = np.trapz(self.trough.settlement(offsets), offsets)
+        self.assertAlmostEqual(volume, self.trough.trough_volume, places=9)
+
+    def test_tunnel_above_surface(self):
+        with self.assertRaises(UserError):
+            TransverseTrough(axis_depth=2, diameter=6, volume_loss=0.01, trough_width_parameter=0.5)
+
+
+class TestWeightedTroughWidthParameter(unittest.TestCase):
+    tops, bottoms = np.array([0, -4, -10]), np.array([-4, -10, -15])
+    layer_k = np.array([0.5, 0.35, 0.4])
+
+    def test_thickness_weighting(self):
+        # the top layer extends up to the surface at 1 m: 5 m of K = 0.5 and 4 m of K = 0.35 above the axis at -8 m
+        k = get_weighted_trough_width_parameter(self.tops, self.bottoms, self.layer_k, 1, -8)
+        self.assertAlmostEqual(float(k), (5 * 0.5 + 4 * 0.35) / 9)
+
+    def test_axis_below_layout(self):
+        # the bottom layer extends down to the axis at -20 m
+        k = get_weighted_trough_width_parameter(self.tops, self.bottoms, self.layer_k, 1, np.array([-8, -20]))
+        np.testing.assert_allclose(k, [(5 * 0.5 + 4 * 0.35) / 9, (5 * 0.5 + 6 * 0.35 + 10 * 0.4) / 21])
+
+    def test_axis_above_surface(self):
+        with self.assertRaises(UserError):
+            get_weighted_trough_width_parameter(self.tops, self.bottoms, self.layer_k, 1, 2)
+
+
+class TestLongitudinalSettlement(unittest.TestCase):
+    def setUp(self):
+        self.trough = TransverseTrough(axis_depth=20, diameter=6, volume_loss=0.01, trough_width_parameter=0.5)
+
+    def test_matches_closed_form(self):
+        face_positions, chainages, offsets = [10, 35, 60], np.linspace(-50, 150, 41), np.linspace(-40, 40, 17)
+        cube = calculate_longitudinal_settlement(self.trough, 0, face_positions, chainages, offsets)
+        self.assertEqual(cube.settlement.shape, (3, 41, 17))
+
+        def phi(value):
+            return 0.5 * math.erfc(-value / math.sqrt(2))
+
+        i = self.trough.trough_width
+        for step, face in enumerate(face_positions):
+            for x_index, x in enumerate(chainages):
+                factor = phi(x / i) - phi((x - face) / i)
+                expected = self.trough.settlement(offsets) * factor
+                np.testing.assert_allclose(cube.settlement[step, x_index], expected, rtol=1e-5, atol=1e-9)
+
+    def test_cube_size_guard(self):
+        with mock.patch.object(settlement, "MAX_CUBE_SIZE", 100):
+            calculate_longitudinal_settlement(self.trough, 0, [10] * 4, np.zeros(5), np.zeros(5))
+            with self.assertRaises(UserError):
+                calculate_longitudinal_settlement(self.trough, 0, [10] * 5, np.zeros(5), np.zeros(5))
+
+
+class TestSurfaceGrid(unittest.TestCase):
+    def test_grid(self):
+        np.testing.assert_allclose(get_surface_grid(1, 0.5), [-1, -0.5, 0, 0.5, 1])
+
+    def test_size_guard(self):
+        with mock.patch.object(settlement, "MAX_SURFACE_GRID_SIZE", 5):
+            self.assertEqual(get_surface_grid(1, 0.5).size, 5)
+            with self.assertRaises(UserError):
+                get_surface_grid(1, 0.4)
+        with self.assertRaises(UserError):
+            get_surface_grid(1e6, 0.01)
+        with self.assertRaises(UserError):
+            get_surface_grid(1, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import math
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from viktor import UserError
+
+from app.cpt_file.site_database import SiteDatabase, points_in_polygon
+
+
+def _brute_force_nearest(locations, x, y, k):
+    return sorted(locations, key=lambda c: (math.hypot(c.x - x, c.y - y), c.id))[:k]
+
+
+class SiteDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = SiteDatabase(Path(self.directory.name) / "sites.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _add_cpts(self, site, coordinates):
+        for number, (x, y) in enumerate(coordinates):
+            self.database.add_cpt(site, f"CPT-{number}", {"x_rd": float(x), "y_rd": float(y)})
+
+
+class TestGetNearest(SiteDatabaseTestCase):
+    def test_empty_database(self):
+        self.assertEqual(self.database.get_nearest(100000, 400000, k=3), [])
+
+    def test_query_point_far_from_site(self):
+        self._add_cpts("A", [(100000 + 10 * i, 400000 + 5 * i) for i in range(5)])
+        nearest = self.database.get_nearest(110000, 400000, k=2)
+        self.assertEqual([c.name for c in nearest], ["CPT-4", "CPT-3"])
+        self.assertEqual(len(self.database.get_nearest(-500000, 900000, k=10)), 5)
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(17)
+        self._add_cpts("A", rng.uniform((100000, 400000), (103000, 401000), size=(200, 2)))
+        self._add_cpts("B", rng.uniform((150000, 450000), (150500, 450500), size=(50, 2)))
+        for site in (None, "A", "B"):
+            locations = self.database.get_locations(site)
+            for x, y in rng.uniform((90000, 390000), (160000, 460000), size=(25, 2)):
+                for k in (1, 3, 60):
+                    with self.subTest(site=site, x=x, y=y, k=k):
+                        self.assertEqual(
+                            self.database.get_nearest(x, y, k=k, site=site), _brute_force_nearest(locations, x, y, k)
+                        )
+
+
+class TestGetWithinPolygon(SiteDatabaseTestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(71)
+        self._add_cpts("A", rng.uniform((100000, 400000), (101000, 401000), size=(300, 2)))
+        self._add_cpts("B", rng.uniform((100500, 400500), (101500, 401500), size=(100, 2)))
+        polygons = {
+            "triangle": [(100000, 400000), (101000, 400200), (100300, 401000)],
+            # concave, so that the bounding box holds CPTs outside the polygon
+            "concave": [(100100, 400100), (101400, 400100), (100800, 400700), (101400, 401400), (100100, 401400)],
+            "outside": [(90000, 390000), (90100, 390000), (90000, 390100)],
+        }
+        for site in (None, "A", "B"):
+            locations = self.database.get_locations(site)
+            x, y = np.array([c.x for c in locations]), np.array([c.y for c in locations])
+            for name, polygon in polygons.items():
+                with self.subTest(site=site, polygon=name):
+                    inside = points_in_polygon(x, y, polygon)
+                    expected = [c for c, is_inside in zip(locations, inside) if is_inside]
+                    self.assertEqual(self.database.get_within_polygon(polygon, site=site), expected)
+        self.assertGreater(len(self.database.get_within_polygon(polygons["concave"])), 0)
+
+    def test_square_around_known_points(self):
+        self._add_cpts("A", [(0, 0), (10, 10), (20, 5), (-1, 3)])
+        inside = self.database.get_within_polygon([(-0.5, -0.5), (15, -0.5), (15, 15), (-0.5, 15)])
+        self.assertEqual([c.name for c in inside], ["CPT-0", "CPT-1"])
+
+    def test_too_few_points(self):
+        with self.assertRaises(UserError):
+            self.database.get_within_polygon([(0, 0), (1, 1)])
+
+
+class TestBounds(SiteDatabaseTestCase):
+    def test_bounds_follow_the_cpts(self):
+        self._add_cpts("A", [(0, 0), (10, 20)])
+        self._add_cpts("B", [(100, -5)])
+        self.assertEqual(self.database._get_bounds("A"), (0, 10, 0, 20))
+        self.assertEqual(self.database._get_bounds(None), (0, 100, -5, 20))
+        # replacing the CPT on the boundary shrinks the bounds
+        self.database.add_cpt("A", "CPT-1", {"x_rd": 5.0, "y_rd": 5.0})
+        self.assertEqual(self.database._get_bounds("A"), (0, 5, 0, 5))
+        self.database.remove_cpt(self.database.get_locations("B")[0].id)
+        self.assertIsNone(self.database._get_bounds("B"))
+        self.assertEqual(self.database._get_bounds(None), (0, 5, 0, 5))
+        self.assertEqual([c.name for c in self.database.get_nearest(100, 0, k=1)], ["CPT-1"])
+
+    def test_bounds_of_existing_database(self):
+        self._add_cpts("A", [(0, 0), (10, 20)])
+        with self.database._connect() as connection:
+            connection.execute("DROP TABLE site_bounds")
+        self.assertEqual(SiteDatabase(self.database.path)._get_bounds("A"), (0, 10, 0, 20))
+
+
+if __name__ == "__main__":
+    unittest.main()
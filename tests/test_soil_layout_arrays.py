@@ -0,0 +1,120 @@
+import random
+import unittest
+
+from viktor import Color
+from viktor.geo import Soil, SoilLayer, SoilLayout
+
+from app.cpt_file.cache import PARAMS_CACHE
+from app.cpt_file.soil_layout_arrays import (
+    LayoutArrays,
+    SoilRegistry,
+    ThicknessFilterLadder,
+    convert_serialized_soil_layout_to_table_rows,
+)
+from app.cpt_file.soil_layout_conversion_functions import filter_input_table_field_on_thickness
+
+SOIL_NAMES = "ABCDE"
+SOILS = {name: Soil(name, Color(1, 1, 1), properties={"ui_name": name}) for name in SOIL_NAMES}
+REGISTRY = SoilRegistry.from_mapping(SOILS)
+THICKNESSES = [0, 50, 100, 150, 200, 250, 300, 400, 1000]
+
+
+def _create_soil_layout(layers):
+    """SoilLayout in [mm] from (soil name, thickness) per layer, with the top at 0"""
+    soil_layers, top = [], 0.0
+    for name, thickness in layers:
+        soil_layers.append(SoilLayer(SOILS[name], top, top - thickness))
+        top -= thickness
+    return SoilLayout(soil_layers)
+
+
+def _get_layers(soil_layout):
+    return [(layer.soil.name, layer.top_of_layer, layer.bottom_of_layer) for layer in soil_layout.layers]
+
+
+def _random_layers(rng):
+    soils = SOIL_NAMES[: rng.randint(1, len(SOIL_NAMES))]
+    thicknesses = [20, 50, 80, 100, 120, 150, 200, 250, 300, 600, 1000, rng.uniform(1, 500)]
+    return [(rng.choice(soils), rng.choice(thicknesses)) for _ in range(rng.randint(1, 9))]
+
+
+class TestFilterLayersOnThickness(unittest.TestCase):
+    def test_matches_sdk_on_random_layouts(self):
+        rng = random.Random(22)
+        compared, mismatches = 0, []
+        for _ in range(1000):
+            layers = _random_layers(rng)
+            arrays = LayoutArrays.from_soil_layout(_create_soil_layout(layers), REGISTRY, "mm")
+            ladder = ThicknessFilterLadder.from_layout(arrays, THICKNESSES)
+            for thickness in THICKNESSES:
+                for merge in (True, False):
+                    try:
+                        expected = _get_layers(
+                            _create_soil_layout(layers).filter_layers_on_thickness(
+                                thickness, merge_adjacent_same_soil_layers=merge
+                            )
+                        )
+                    except IndexError:  # all layers are thinner than the minimum, see test_all_layers_thin
+                        continue
+                    filtered = arrays.filter_layers_on_thickness(thickness, merge).to_soil_layout("mm")
+                    if _get_layers(filtered) != expected:
+                        mismatches.append((layers, thickness, merge))
+                    if merge and _get_layers(ladder.get(thickness).to_soil_layout("mm")) != expected:
+                        mismatches.append((layers, thickness, "ladder"))
+                    compared += 1
+        self.assertEqual(mismatches, [])
+        self.assertGreater(compared, 15000)
+
+    def test_all_layers_thin(self):
+        layers = [("A", 50), ("B", 80), ("A", 20)]
+        with self.assertRaises(IndexError):
+            _create_soil_layout(layers).filter_layers_on_thickness(200)
+        # the layers become one layer with the soil of the largest total thickness
+        arrays = LayoutArrays.from_soil_layout(_create_soil_layout(layers), REGISTRY, "mm")
+        for merge in (True, False):
+            filtered = arrays.filter_layers_on_thickness(200, merge).to_soil_layout("mm")
+            self.assertEqual(_get_layers(filtered), [("B", 0.0, -150.0)])
+
+    def test_input_is_not_altered(self):
+        soil_layout = _create_soil_layout([("A", 50), ("B", 500), ("C", 80)])
+        arrays = LayoutArrays.from_soil_layout(soil_layout, REGISTRY, "mm")
+        arrays.filter_layers_on_thickness(200)
+        self.assertEqual(_get_layers(arrays.to_soil_layout("mm")), _get_layers(soil_layout))
+
+
+class TestFilterInputTableField(unittest.TestCase):
+    def setUp(self):
+        self.soil_layout = _create_soil_layout([("A", 500), ("B", 150), ("C", 700), ("D", 250), ("A", 400)])
+        self.original = self.soil_layout.serialize()
+        self.rows = convert_serialized_soil_layout_to_table_rows(self.original, unit="mm")
+        self.bottom = self.soil_layout.bottom / 1e3
+
+    def _filter(self, rows, min_layer_thickness):
+        return filter_input_table_field_on_thickness(self.bottom, rows, REGISTRY, min_layer_thickness, self.original)
+
+    def _expected(self, min_layer_thickness):
+        arrays = LayoutArrays.from_soil_layout(self.soil_layout, REGISTRY, "mm")
+        return arrays.filter_layers_on_thickness(min_layer_thickness).to_table_rows()
+
+    def test_ladder_is_cached_on_the_original_layout(self):
+        PARAMS_CACHE.clear()
+        hits, misses = PARAMS_CACHE.hits, PARAMS_CACHE.misses
+        for min_layer_thickness in (200, 300, 0, 200):
+            self.assertEqual(self._filter(self.rows, min_layer_thickness), self._expected(min_layer_thickness))
+        self.assertEqual((PARAMS_CACHE.hits - hits, PARAMS_CACHE.misses - misses), (3, 1))
+
+    def test_filtered_table_is_not_restored(self):
+        filtered_rows = self._filter(self.rows, 300)
+        self.assertEqual([row["name"] for row in filtered_rows], ["A", "C", "A"])
+        # another press filters the table itself, so the removed layers stay removed
+        self.assertEqual(self._filter(filtered_rows, 100), filtered_rows)
+
+    def test_edited_table_is_filtered(self):
+        edited_rows = [dict(row) for row in self.rows]
+        edited_rows[1]["name"] = "E"
+        filtered_rows = self._filter(edited_rows, 200)
+        self.assertEqual([row["name"] for row in filtered_rows], ["A", "C", "D", "A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+from benchmarks.run_benchmarks import get_params
+from benchmarks.synthetic_gef import generate_gef
+from viktor import Color
+from viktor.geo import Soil, SoilLayer, SoilLayout
+
+from app.cpt_file.cache import PARAMS_CACHE
+from app.cpt_file.stress_profile import StressProfile, get_stress_profile
+from app.cpt_file.visualisation import CPTKeys, get_user_stress_profile
+
+CLAY = Soil("clay", Color(1, 1, 1), properties={"ui_name": "clay", "gamma_dry": 16, "gamma_wet": 17})
+SAND = Soil("sand", Color(1, 1, 1), properties={"ui_name": "sand", "gamma_dry": 18, "gamma_wet": 20})
+
+
+class TestStressProfile(unittest.TestCase):
+    def test_hand_calculation(self):
+        # 2 m clay on 3 m sand, phreatic level 1 m below the surface at 0
+        profile = StressProfile.from_layers([0, -2], [-2, -5], [16, 18], [17, 20], ground_water_level=-1)
+        np.testing.assert_allclose(profile.boundaries, [0, -1, -2, -5])
+        np.testing.assert_allclose(profile.total_stress, [0, 16, 33, 93])
+        np.testing.assert_allclose(profile.effective_stress_at([-0.5, -2, -5, -6]), [8, 23, 53, 53 - 10])
+
+    def test_cached_per_soil_layout_and_phreatic_level(self):
+        soil_layout = SoilLayout([SoilLayer(CLAY, 0, -2000), SoilLayer(SAND, -2000, -5000)])
+        PARAMS_CACHE.clear()
+        profile = get_stress_profile(soil_layout, -1, "layout")
+        self.assertIs(get_stress_profile(soil_layout, -1.0, "layout"), profile)
+        self.assertEqual(float(profile.total_stress_at(-5)), 93)
+        self.assertIsNot(get_stress_profile(soil_layout, -3, "layout"), profile)
+
+    def test_shared_between_views(self):
+        params = get_params(generate_gef(300), "table")
+        PARAMS_CACHE.clear()
+        profile = get_user_stress_profile(params, CPTKeys(params))
+        misses = PARAMS_CACHE.misses
+        self.assertIs(get_user_stress_profile(params, CPTKeys(params)), profile)
+        self.assertEqual(PARAMS_CACHE.misses, misses)
+        self.assertAlmostEqual(profile.boundaries[0], params.soil_layout[0]["top_of_layer"])
+
+
+if __name__ == "__main__":
+    unittest.main()